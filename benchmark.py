@@ -0,0 +1,313 @@
+"""
+Throughput benchmark for the environment, the training loop and whole sweeps.
+
+Measures:
+  - env.step / env.reset rate per layout, grid size and engine (steps/s, resets/s)
+  - Training.run_training rate in single_env and multiple_env mode (episodes/s, steps/s),
+    also with the python and jit episode kernels on the tabular engine
+  - run_simulation.run_sweep wall time at 1, 2, 4 and N cores (s)
+  - peak RSS of the parent and of the workers of a sweep as seeds, episodes and grid size scale (MB)
+  - Pool start-up time per start method, with and without preloading (s)
+
+Results are written as JSON and compared with a stored baseline: any metric
+worse than the baseline by more than the tolerance is flagged as a regression
+(exit code 1). Usage:
+
+    python benchmark.py [--config config.yaml] [--baseline benchmarks/baseline.json] [--save-baseline]
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import tempfile
+import time
+import numpy as np
+from configManager import ConfigManager
+from tabular import make_environment, ENGINE_MINIGRID, ENGINE_TABULAR
+import run_simulation
+import memory
+import preload
+import kernel
+import layout_generator
+from human import Human
+from training import Training
+
+BENCHMARK_DIR = "benchmarks"
+LAYOUTS = ["v1","v2","v3","v4", layout_generator.PROCEDURAL] # procedural: any --grid-sizes (e.g. 50 100)
+GRID_SIZES = [16, 20, 24, 32]
+ENGINES = [ENGINE_MINIGRID, ENGINE_TABULAR]
+DEFAULT_TOLERANCE = 0.10 # relative slowdown flagged as a regression
+
+# Benchmark workload (overrides of the loaded config)
+ENV_STEPS = 20000
+TRAINING_EPISODES = 50
+SWEEP_SEEDS = 8
+SWEEP_EPISODES = 50
+MEMORY_SEEDS = [1, 2, 4, 8]         # scaled one at a time from the first value of the other two
+MEMORY_EPISODES = [50, 200, 800]
+MEMORY_GRID_SIZES = [16, 24, 32]
+STARTUP_WORKERS = 8
+
+RATE = "higher_is_better"
+TIME = "lower_is_better"
+SIZE = TIME
+
+
+def _metric(value, unit, direction=RATE):
+    return {"value": value, "unit": unit, "direction": direction}
+
+
+def bench_environment(params, layouts=LAYOUTS, grid_sizes=GRID_SIZES, engines=ENGINES, n_steps=ENV_STEPS):
+    """Raw step and reset rate with uniformly random student actions."""
+    results = {}
+    rng = np.random.default_rng(0)
+    for engine in engines:
+        for layout in layouts:
+            for grid_size in grid_sizes:
+                env_params = dict(params, **{ConfigManager.ENGINE: engine, ConfigManager.LAYOUT_V: layout,
+                                             ConfigManager.GRID_SIZE: grid_size, ConfigManager.RENDER_MODE: None})
+                try:
+                    env = make_environment(env_params)
+                    env.reset()
+
+                    actions = rng.integers(0, env.NR_OF_ROBOT_ACTIONS, n_steps)
+                    start = time.perf_counter()
+                    for action in actions:
+                        _, _, terminated, truncated, _ = env.step(action)
+                        if terminated or truncated:
+                            env.reset()
+                    step_rate = n_steps / (time.perf_counter() - start)
+
+                    n_resets = max(n_steps // 100, 1)
+                    start = time.perf_counter()
+                    for _ in range(n_resets):
+                        env.reset()
+                    reset_rate = n_resets / (time.perf_counter() - start)
+                    env.close()
+                except (AssertionError, IndexError) as e: # hard-coded layout offsets do not fit every grid size
+                    print(f"  skip {engine} {layout} grid {grid_size}: {e!r}")
+                    continue
+
+                results[f"env.step.{engine}.{layout}.{grid_size}"] = _metric(step_rate, "steps/s")
+                results[f"env.reset.{engine}.{layout}.{grid_size}"] = _metric(reset_rate, "resets/s")
+                print(f"  {engine:>8} {layout} grid {grid_size:>3}: {step_rate:10.0f} steps/s {reset_rate:10.0f} resets/s")
+    return results
+
+
+def bench_training(params, engines=ENGINES, n_episodes=TRAINING_EPISODES):
+    """Training.run_training rate in single_env and multiple_env mode, one seed in this process."""
+    results = {}
+    # The episode kernels (kernel.py) run only on the tabular engine; the jit one is compiled before timing
+    variants = [(engine, None) for engine in engines]
+    if ENGINE_TABULAR in engines:
+        variants += [(ENGINE_TABULAR, name) for name in kernel.KERNELS]
+        kernel.get_kernel(kernel.KERNEL_JIT)
+    for engine, episode_kernel in variants:
+        name = engine if episode_kernel is None else f"{engine}_kernel_{episode_kernel}"
+        for mode in ("single_env", "multiple_env"):
+            train_params = dict(params, **{ConfigManager.ENGINE: engine, ConfigManager.SIM_MODE: mode,
+                                           ConfigManager.N_EPISODES_SINGLE_ENV: n_episodes,
+                                           ConfigManager.N_EPISODES_MULTIPLE_ENV: max(n_episodes // 10, 1),
+                                           ConfigManager.RENDER_MODE: None, ConfigManager.EPISODE_KERNEL: episode_kernel})
+            if episode_kernel == kernel.KERNEL_JIT:
+                warm_up = dict(train_params, **{ConfigManager.N_EPISODES_SINGLE_ENV: 1, ConfigManager.N_EPISODES_MULTIPLE_ENV: 1})
+                run_simulation.run_training_with_seed(0, params=warm_up)
+            np.random.seed(0)
+            start = time.perf_counter()
+            if mode == "single_env":
+                trainer = run_simulation.run_training_with_seed(0, params=train_params)
+            else:
+                trainer = run_simulation.run_training_over_multiple_envs(0, environments=run_simulation.ENVIRONMENTS, params=train_params)
+            elapsed = time.perf_counter() - start
+
+            episodes = len(trainer.student_competence)
+            results[f"training.{mode}.{name}.episodes"] = _metric(episodes / elapsed, "episodes/s")
+            print(f"  {name:>8} {mode:>12}: {episodes / elapsed:8.1f} episodes/s")
+    return results
+
+
+def bench_sweep(params, cores=None, n_seeds=SWEEP_SEEDS, n_episodes=SWEEP_EPISODES):
+    """End-to-end run_simulation.run_sweep wall time (training, aggregation and output) per core count."""
+    cpu_count = multiprocessing.cpu_count()
+    cores = cores or sorted({c for c in (1, 2, 4, cpu_count) if c <= cpu_count})
+    sweep_params = dict(params, **{ConfigManager.NR_OF_SEEDS: n_seeds, ConfigManager.N_EPISODES_SINGLE_ENV: n_episodes,
+                                   ConfigManager.N_EPISODES_MULTIPLE_ENV: max(n_episodes // 10, 1),
+                                   ConfigManager.RENDER_MODE: None})
+    results = {}
+    for n in cores:
+        output_dir = tempfile.mkdtemp(prefix="benchmark_sweep_")
+        try:
+            for sub_dir in ("Q_Tables", "plots", "raw_data", "statistics"):
+                os.makedirs(os.path.join(output_dir, sub_dir))
+            start = time.perf_counter()
+            run_simulation.run_sweep(sweep_params, output_dir, n)
+            elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        results[f"sweep.{sweep_params[ConfigManager.SIM_MODE]}.{sweep_params.get(ConfigManager.ENGINE, ENGINE_MINIGRID)}.cores_{n}"] = _metric(elapsed, "s", TIME)
+        print(f"  {n:>3} cores: {elapsed:8.2f} s")
+    return results
+
+
+def _memory_probe(params, num_processes, queue):
+    """Run one sweep in a fresh process (peak RSS never decreases) and report the parent and worker peaks."""
+    output_dir = tempfile.mkdtemp(prefix="benchmark_memory_")
+    try:
+        for sub_dir in ("Q_Tables", "plots", "raw_data", "statistics"):
+            os.makedirs(os.path.join(output_dir, sub_dir))
+        aggregator = run_simulation.run_sweep(params, output_dir, num_processes)
+        queue.put((memory.peak_rss_mb(), max(aggregator.peak_rss_mb)))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def bench_memory(params, seeds=MEMORY_SEEDS, episodes=MEMORY_EPISODES, grid_sizes=MEMORY_GRID_SIZES):
+    """Peak RSS of the parent and of the largest worker of a sweep, scaling seeds, episodes and grid size."""
+    configurations = [(n, episodes[0], grid_sizes[0]) for n in seeds]
+    configurations += [(seeds[0], n, grid_sizes[0]) for n in episodes[1:]]
+    configurations += [(seeds[0], episodes[0], n) for n in grid_sizes[1:]]
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for n_seeds, n_episodes, grid_size in configurations:
+        sweep_params = dict(params, **{ConfigManager.NR_OF_SEEDS: n_seeds, ConfigManager.N_EPISODES_SINGLE_ENV: n_episodes,
+                                       ConfigManager.N_EPISODES_MULTIPLE_ENV: max(n_episodes // 10, 1),
+                                       ConfigManager.GRID_SIZE: grid_size, ConfigManager.RENDER_MODE: None})
+        queue = ctx.Queue()
+        probe = ctx.Process(target=_memory_probe, args=(sweep_params, min(n_seeds, multiprocessing.cpu_count()), queue))
+        probe.start()
+        probe.join()
+        if probe.exitcode != 0 or queue.empty():
+            print(f"  skip seeds {n_seeds} episodes {n_episodes} grid {grid_size}: exit code {probe.exitcode}")
+            continue
+        parent_mb, worker_mb = queue.get()
+
+        name = f"seeds_{n_seeds}.episodes_{n_episodes}.grid_{grid_size}"
+        results[f"memory.parent.{name}"] = _metric(parent_mb, "MB", SIZE)
+        results[f"memory.worker.{name}"] = _metric(worker_mb, "MB", SIZE)
+        print(f"  seeds {n_seeds:>3} episodes {n_episodes:>5} grid {grid_size:>3}: parent {parent_mb:8.1f} MB worker {worker_mb:8.1f} MB")
+    return results
+
+
+def _startup_task(params):
+    """What a worker does before its first episode: build the environment, the human and the trainer."""
+    env = make_environment(params)
+    Training(params, env, Human(params))
+    env.close()
+    return os.getpid()
+
+
+def _startup_probe(params, n_workers, queue):
+    """Time from a cold process to n_workers workers ready to train (fresh process: no fork server yet)."""
+    layouts = [params[ConfigManager.LAYOUT_V]]
+    start = time.perf_counter()
+    ctx = preload.pool_context(params, layouts)
+    with ctx.Pool(n_workers) as pool:
+        pool.map(_startup_task, [params] * n_workers, chunksize=1)
+    queue.put(time.perf_counter() - start)
+
+
+def bench_startup(params, n_workers=STARTUP_WORKERS):
+    """Pool start-up time for each available start method, with and without preload."""
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    engine = params.get(ConfigManager.ENGINE, ENGINE_MINIGRID)
+    for method in multiprocessing.get_all_start_methods():
+        for preloaded in (False, True):
+            startup_params = dict(params, **{ConfigManager.START_METHOD: method, ConfigManager.PRELOAD: preloaded,
+                                             ConfigManager.RENDER_MODE: None, ConfigManager.PROGRESS: False})
+            queue = ctx.Queue()
+            probe = ctx.Process(target=_startup_probe, args=(startup_params, n_workers, queue))
+            probe.start()
+            probe.join()
+            if probe.exitcode != 0 or queue.empty():
+                print(f"  skip {method} preload {preloaded}: exit code {probe.exitcode}")
+                continue
+            elapsed = queue.get()
+            name = f"startup.{engine}.{method}.{'preload' if preloaded else 'cold'}.workers_{n_workers}"
+            results[name] = _metric(elapsed, "s", TIME)
+            print(f"  {method:>10} preload {str(preloaded):>5}: {elapsed:8.3f} s for {n_workers} workers")
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return the list of (name, baseline, current, relative change) that got worse by more than tolerance."""
+    regressions = []
+    for name, metric in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["value"], metric["value"]
+        if metric["direction"] == RATE:
+            change = (new - old) / old   # negative: slower
+        else:
+            change = (old - new) / old   # negative: slower
+        if change < -tolerance:
+            regressions.append((name, old, new, change))
+    return regressions
+
+
+def save_json(data, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Environment and training throughput benchmark")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results.json"))
+    parser.add_argument("--baseline", default=os.path.join(BENCHMARK_DIR, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--suites", nargs="+", default=["env", "training", "sweep"], choices=["env", "training", "sweep", "memory", "startup"])
+    parser.add_argument("--grid-sizes", nargs="+", type=int, default=GRID_SIZES)
+    parser.add_argument("--cores", nargs="+", type=int, default=None, help="core counts of the sweep suite (default: 1 2 4 N)")
+    args = parser.parse_args()
+
+    params = ConfigManager.load_config(args.config)
+
+    results = {}
+    if "env" in args.suites:
+        print("ENVIRONMENT")
+        results.update(bench_environment(params, grid_sizes=args.grid_sizes))
+    if "training" in args.suites:
+        print("TRAINING")
+        results.update(bench_training(params))
+    if "sweep" in args.suites:
+        print("SWEEP")
+        results.update(bench_sweep(params, args.cores))
+    if "memory" in args.suites:
+        print("MEMORY")
+        results.update(bench_memory(params))
+    if "startup" in args.suites:
+        print("STARTUP")
+        results.update(bench_startup(params))
+
+    report = {
+        "generated_on": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": multiprocessing.cpu_count()},
+        "results": results,
+    }
+    save_json(report, args.output)
+    print(f"Results saved to {args.output}")
+
+    exit_code = 0
+    if args.save_baseline:
+        save_json(report, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+        print(f"{len(regressions)} regression(s) against {args.baseline} (tolerance {args.tolerance:.0%})")
+        exit_code = 1 if regressions else 0
+    else:
+        print(f"No baseline found at {args.baseline} (use --save-baseline)")
+
+    raise SystemExit(exit_code)
@@ -0,0 +1,396 @@
+"""
+Multi-node sweeps: a coordinator distributing (config, seed) jobs to worker
+processes on any number of hosts, over multiprocessing.connection (TCP,
+HMAC authentication with a shared key, no outside dependencies).
+
+Coordinator (run_simulation.run_sweep with cluster_address set): listens on
+host:port, sends one job at a time to every connected worker, yields the
+results in seed order (as Pool.imap) and requeues the job of a worker that is
+lost (connection closed or no heartbeat for heartbeat_timeout seconds) up to
+max_retries times. It gives up (ClusterError) when no worker has been connected
+for idle_timeout seconds while jobs are waiting. The outputs are written by the
+coordinator under simulations/<name_of_sim>, exactly as with a local Pool.
+
+Workers: one job at a time per process; they stream back the compact
+TrainingResult, heartbeats and the live progress events of telemetry. The
+trajectory and snapshot files of a job (record_trajectories, snapshot_every)
+are written to a temporary directory of the worker and sent back with the
+result; the coordinator writes them to its trajectory_dir / snapshot_dir.
+
+    export TEACHRL_CLUSTER_AUTHKEY=<secret>      # same key on every host
+    python run_simulation.py --batch --set cluster_address=0.0.0.0:6000
+    python cluster.py worker --connect <coordinator host>:6000 --processes 8   # on each host
+
+The key authenticates both ends: connections are unpickled, never expose the
+port to untrusted networks.
+"""
+import argparse
+import collections
+import multiprocessing
+import os
+import queue as queue_module
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from multiprocessing.connection import Listener, Client, AuthenticationError
+
+ENV_AUTHKEY = "TEACHRL_CLUSTER_AUTHKEY"
+DEFAULT_PORT = 6000
+HEARTBEAT_INTERVAL = 5.0   # seconds between two heartbeats of a busy worker
+HEARTBEAT_TIMEOUT = 60.0   # a worker silent for this long is considered lost
+MAX_RETRIES = 3            # times a job is sent again after losing its worker
+CONNECT_TIMEOUT = 60.0     # seconds a worker keeps trying to reach the coordinator
+IDLE_TIMEOUT = 600.0       # seconds the coordinator waits with jobs pending and no worker connected
+
+# Messages (tuples, first item is the kind)
+HELLO = "hello"           # worker -> coordinator: (HELLO, host, pid)
+JOB = "job"               # coordinator -> worker: (JOB, job_id, params, seed, environments)
+STOP = "stop"             # coordinator -> worker: no more jobs
+RESULT = "result"         # worker -> coordinator: (RESULT, job_id, TrainingResult, {params key: {file name: bytes}})
+ERROR = "error"           # worker -> coordinator: (ERROR, job_id, traceback)
+HEARTBEAT = "heartbeat"   # worker -> coordinator: (HEARTBEAT,)
+PROGRESS = "progress"     # worker -> coordinator: (PROGRESS, telemetry.ProgressEvent)
+
+
+class ClusterError(RuntimeError):
+    pass
+
+
+def parse_address(text, default_port=DEFAULT_PORT):
+    """host:port (or host) -> (host, port)."""
+    host, sep, port = str(text).rpartition(":")
+    if not sep:
+        host, port = str(text), ""
+    return host or "0.0.0.0", int(port) if port else default_port
+
+
+def get_authkey():
+    key = os.environ.get(ENV_AUTHKEY)
+    if not key:
+        raise ClusterError(f"Set {ENV_AUTHKEY} to the same secret on the coordinator and on the workers")
+    return key.encode()
+
+
+class Coordinator:
+
+    """Serves jobs to the connected workers and collects their results (context manager).
+
+    progress_queue: queue receiving the telemetry events of the workers (None: dropped).
+    local_workers: worker processes started on this host, mainly for tests.
+    idle_timeout: seconds imap waits with no worker connected before raising ClusterError.
+    """
+
+    def __init__(self, address, authkey, max_retries=MAX_RETRIES, heartbeat_timeout=HEARTBEAT_TIMEOUT,
+                 progress_queue=None, local_workers=0, idle_timeout=IDLE_TIMEOUT):
+
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.authkey = authkey
+        self.max_retries = max_retries
+        self.heartbeat_timeout = heartbeat_timeout
+        self.progress_queue = progress_queue
+        self.idle_timeout = idle_timeout
+
+        self.cond = threading.Condition()
+        self.jobs = {}                         # job_id -> (params, seed, environments)
+        self.pending = collections.deque()     # job ids waiting for a worker
+        self.attempts = collections.Counter()  # job_id -> times sent
+        self.results = {}                      # job_id -> TrainingResult, until yielded
+        self.finished = set()                  # job ids done (result received)
+        self.failed = {}                       # job_id -> reason, after max_retries
+        self.closed = False
+        self.workers = 0                       # connected workers
+        self.idle_since = time.monotonic()     # when the last worker went away (or the start)
+
+        self._accept_thread = threading.Thread(target=self._accept_loop, name="ClusterAccept", daemon=True)
+        self._accept_thread.start()
+        self._local = [start_local_worker(self.address, authkey) for _ in range(local_workers)]
+        print(f"Cluster coordinator listening on {self.address[0]}:{self.address[1]}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def imap(self, params, seeds, environments):
+        """Run one job per seed on the workers, yield the results in seed order."""
+        with self.cond:
+            for seed in seeds:
+                job_id = len(self.jobs)
+                self.jobs[job_id] = (params, seed, environments)
+                self.pending.append(job_id)
+            self.cond.notify_all()
+            first, last = len(self.jobs) - len(seeds), len(self.jobs)
+
+        for job_id in range(first, last):
+            with self.cond:
+                while job_id not in self.results and job_id not in self.failed:
+                    if self.workers == 0 and time.monotonic() - self.idle_since > self.idle_timeout:
+                        raise ClusterError(f"No worker connected for {self.idle_timeout:.0f} s, "
+                                           f"{len(self.jobs) - len(self.finished)} job(s) left")
+                    self.cond.wait(1.0)
+                if job_id in self.failed:
+                    raise ClusterError(f"Job {job_id} (seed {self.jobs[job_id][1]}) failed: {self.failed[job_id]}")
+                result = self.results.pop(job_id)
+            yield result
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.listener.close() # unblocks accept()
+        for process in self._local:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    # --- worker connections ---------------------------------------------------------------
+
+    def _accept_loop(self):
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                print("Cluster: rejected a connection with a wrong authkey")
+                continue
+            except OSError: # listener closed
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="ClusterWorker", daemon=True).start()
+
+    def _next_job(self):
+        """Block until a job is pending; None when the coordinator is closed."""
+        with self.cond:
+            while not self.pending and not self.closed:
+                self.cond.wait(1.0)
+            if self.closed:
+                return None
+            job_id = self.pending.popleft()
+            self.attempts[job_id] += 1
+            return job_id
+
+    def _lost(self, job_id, reason):
+        with self.cond:
+            if job_id in self.finished:
+                return
+            if self.attempts[job_id] > self.max_retries:
+                self.failed[job_id] = reason
+            else:
+                print(f"Cluster: job {job_id} (seed {self.jobs[job_id][1]}) {reason}, retrying")
+                self.pending.appendleft(job_id)
+            self.cond.notify_all()
+
+    def _serve(self, conn):
+        try:
+            if not conn.poll(self.heartbeat_timeout):
+                raise TimeoutError("no hello")
+            _, host, pid = conn.recv()
+        except Exception: # EOFError, OSError, TimeoutError, or a hello that does not unpickle
+            conn.close()
+            return
+        print(f"Cluster: worker {host}:{pid} connected")
+        with self.cond:
+            self.workers += 1
+
+        job_id = None
+        try:
+            while True:
+                job_id = self._next_job()
+                if job_id is None:
+                    conn.send((STOP,))
+                    return
+                conn.send((JOB, job_id) + self.jobs[job_id])
+
+                while True:
+                    if not conn.poll(self.heartbeat_timeout):
+                        raise TimeoutError(f"no heartbeat for {self.heartbeat_timeout} s")
+                    message = conn.recv()
+                    if message[0] == HEARTBEAT:
+                        continue
+                    elif message[0] == PROGRESS:
+                        if self.progress_queue is not None:
+                            try:
+                                self.progress_queue.put_nowait(message[1])
+                            except queue_module.Full:
+                                pass
+                    elif message[0] == RESULT:
+                        _write_outputs(self.jobs[job_id][0], message[3])
+                        with self.cond:
+                            self.finished.add(job_id)
+                            self.results[job_id] = message[2]
+                            self.cond.notify_all()
+                        job_id = None
+                        break
+                    elif message[0] == ERROR:
+                        print(f"Cluster: job {job_id} raised on {host}:{pid}\n{message[2]}")
+                        self._lost(job_id, "raised an exception")
+                        job_id = None
+                        break
+        except (EOFError, OSError, TimeoutError) as e:
+            print(f"Cluster: lost worker {host}:{pid} ({e!r})")
+            if job_id is not None:
+                self._lost(job_id, f"lost its worker {host}:{pid}")
+        except Exception as e: # e.g. a message that does not unpickle (worker running different code)
+            print(f"Cluster: dropping worker {host}:{pid}, unreadable message ({e!r})")
+            if job_id is not None:
+                self._lost(job_id, f"failed on its worker {host}:{pid} ({e!r})")
+        finally:
+            conn.close()
+            with self.cond:
+                self.workers -= 1
+                if self.workers == 0:
+                    self.idle_since = time.monotonic()
+
+
+def _write_outputs(params, outputs):
+    """Write the files sent back by a worker to the directories of params (trajectory_dir, snapshot_dir)."""
+    for key, files in outputs.items():
+        if not files:
+            continue
+        os.makedirs(params[key], exist_ok=True)
+        for name, data in files.items():
+            with open(os.path.join(params[key], name), "wb") as f:
+                f.write(data)
+
+
+# --- worker side ------------------------------------------------------------------------------
+
+def _connect(address, authkey, timeout=CONNECT_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return Client(address, authkey=authkey)
+        except (ConnectionRefusedError, OSError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def _read_outputs(directories):
+    """{params key: {file name: bytes}} of the files written to the local directories of a job."""
+    outputs = {}
+    for key, directory in directories.items():
+        outputs[key] = {}
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                with open(os.path.join(directory, name), "rb") as f:
+                    outputs[key][name] = f.read()
+    return outputs
+
+
+def run_worker(address, authkey, connect_timeout=CONNECT_TIMEOUT):
+    """Connect to the coordinator and run its jobs until it sends STOP or goes away."""
+    import run_simulation
+    import telemetry
+    from configManager import ConfigManager
+
+    conn = _connect(address, authkey, connect_timeout)
+    conn.send((HELLO, socket.gethostname(), os.getpid()))
+
+    lock = threading.Lock() # the heartbeat thread and the main thread share the connection
+    events = queue_module.Queue(maxsize=1000)
+    busy = threading.Event()
+    stop = threading.Event()
+
+    def send(message):
+        with lock:
+            conn.send(message)
+
+    def heartbeat():
+        last = time.monotonic()
+        while not stop.is_set():
+            try:
+                event = events.get(timeout=0.2)
+                send((PROGRESS, event))
+            except queue_module.Empty:
+                pass
+            except OSError:
+                return
+            if busy.is_set() and time.monotonic() - last >= HEARTBEAT_INTERVAL:
+                try:
+                    send((HEARTBEAT,))
+                except OSError:
+                    return
+                last = time.monotonic()
+
+    thread = threading.Thread(target=heartbeat, name="ClusterHeartbeat", daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                print("Coordinator gone, worker exiting")
+                return
+            if message[0] == STOP:
+                return
+
+            _, job_id, params, seed, environments = message
+            progress = params.get(ConfigManager.PROGRESS, True)
+            telemetry.init_worker(events if progress else None, params.get(ConfigManager.PROGRESS_INTERVAL, telemetry.DEFAULT_INTERVAL))
+            busy.set()
+            try:
+                # Trajectories and snapshots go to a local temporary directory, sent back with the result
+                with tempfile.TemporaryDirectory(prefix="teachrl_job_") as tmp:
+                    params = dict(params)
+                    directories = {key: os.path.join(tmp, key) for key in (ConfigManager.TRAJECTORY_DIR, ConfigManager.SNAPSHOT_DIR)
+                                   if params.get(key)}
+                    params.update(directories)
+                    result = run_simulation.seed_task(params, environments)(seed)
+                    reply = (RESULT, job_id, result, _read_outputs(directories))
+            except Exception:
+                reply = (ERROR, job_id, traceback.format_exc())
+            finally:
+                busy.clear()
+            while not events.empty(): # progress events before the result
+                time.sleep(0.05)
+            send(reply)
+    finally:
+        stop.set()
+        thread.join()
+        conn.close()
+
+
+def _worker_process(address, authkey, connect_timeout):
+    run_worker(address, authkey, connect_timeout)
+
+
+def start_local_worker(address, authkey):
+    """Start a worker process on this host (same interpreter and module directory) connected to address."""
+    host, port = address
+    host = "127.0.0.1" if host in ("0.0.0.0", "") else host
+    env = dict(os.environ, **{ENV_AUTHKEY: authkey.decode()})
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), "worker", "--connect", f"{host}:{port}"], env=env)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Sweep worker: runs the (config, seed) jobs of a cluster coordinator")
+    parser.add_argument("role", choices=["worker"])
+    parser.add_argument("--connect", required=True, help="coordinator host:port")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes on this host (one job each at a time)")
+    parser.add_argument("--connect-timeout", type=float, default=CONNECT_TIMEOUT)
+    args = parser.parse_args()
+
+    try:
+        authkey = get_authkey()
+    except ClusterError as e:
+        print(e)
+        raise SystemExit(2)
+    address = parse_address(args.connect)
+
+    if args.processes == 1:
+        run_worker(address, authkey, args.connect_timeout)
+    else:
+        processes = [multiprocessing.Process(target=_worker_process, args=(address, authkey, args.connect_timeout))
+                     for _ in range(args.processes)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
@@ -27,8 +27,53 @@ class ConfigManager():
     EPS_S_DEFAULT = "eps_s_default"
     HUMAN_PREFERENCES = "human_preferences"
     ABSENCE_MUX = "absence_multiplier"
+    HUMAN_POPULATION = "human_population"
+    POPULATION_MODE = "population_mode"
     LAYOUT_V = "layout_version"
+    PROCEDURAL_LAYOUT = "procedural_layout"
     SIM_MODE = "sim_mode"
+    CURRICULUM = "curriculum"
+    CURRICULUM_ROUNDS = "curriculum_rounds"
+    CURRICULUM_WINDOW = "curriculum_window"
+    CURRICULUM_MASTERY = "curriculum_mastery"
+    CURRICULUM_REGRESSION = "curriculum_regression"
+    CURRICULUM_REVIEW = "curriculum_review"
+    ENGINE = "engine"
+    STUDENT_Q_INIT = "student_q_init"
+    PLANNING_STEPS = "planning_steps"
+    PLANNING_THRESHOLD = "planning_priority_threshold"
+    STUDENT_ALGORITHM = "student_algorithm"
+    EPISODE_KERNEL = "episode_kernel"
+    LAMBDA_S = "lambda_s"
+    N_STEP_S = "n_step_s"
+    PHASE_TIMING = "phase_timing"
+    PHASE_TIMING_BLOCK = "phase_timing_block"
+    PROFILER = "profiler"
+    PROFILER_INTERVAL = "profiler_interval"
+    MEMORY_BUDGET_MB = "memory_budget_mb"
+    PROGRESS = "progress"
+    VISITATION = "visitation"
+    VISITATION_BLOCK = "visitation_block"
+    RECORD_TRAJECTORIES = "record_trajectories"
+    EARLY_STOPPING = "early_stopping"
+    EARLY_STOPPING_WINDOW = "early_stopping_window"
+    EARLY_STOPPING_THRESHOLD = "early_stopping_threshold"
+    EARLY_STOPPING_TOLERANCE = "early_stopping_tolerance"
+    TRAJECTORY_CAPACITY = "trajectory_capacity"
+    TRAJECTORY_DIR = "trajectory_dir"
+    SNAPSHOT_EVERY = "snapshot_every"
+    SNAPSHOT_FULL_EVERY = "snapshot_full_every"
+    SNAPSHOT_DIR = "snapshot_dir"
+    PROGRESS_INTERVAL = "progress_interval"
+    PROGRESS_REFRESH = "progress_refresh"
+    START_METHOD = "start_method"
+    PRELOAD = "preload"
+    SHARED_LAYOUTS = "shared_layouts"
+    CLUSTER_ADDRESS = "cluster_address"
+    CLUSTER_LOCAL_WORKERS = "cluster_local_workers"
+    CLUSTER_MAX_RETRIES = "cluster_max_retries"
+    CLUSTER_HEARTBEAT_TIMEOUT = "cluster_heartbeat_timeout"
+    CLUSTER_IDLE_TIMEOUT = "cluster_idle_timeout"
     
     @staticmethod
     def load_config(config_path: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:  
@@ -65,7 +110,13 @@ class ConfigManager():
         except OSError as e:
             raise
     
-    def printALL(self,params):
+    @staticmethod
+    def store_params(params: Dict[str, Any], folder_path: str, filename: str = "config_effective.yaml"):
+        """Save the parameters actually used (config file plus overrides)."""
+        with open(os.path.join(folder_path, filename), "w") as f:
+            yaml.safe_dump(params, f, sort_keys=False)
+    
+    def printALL(self,params,confirm=True):
         
         print("\n" + "="*50)
         print("CONFIGURATION PARAMETERS")
@@ -80,12 +131,31 @@ class ConfigManager():
         print(f"  Number of episodes (multiple_env_mode): {params.get(self.N_EPISODES_MULTIPLE_ENV, 'N/A')}")
         print(f"  Seed: {params.get(self.SEED, 'N/A')}")
         print(f"  Simulation Mode: {params.get(self.SIM_MODE, 'N/A')}")
+        print(f"  Curriculum (multiple_env mode): {params.get(self.CURRICULUM, 'fixed')} ({params.get(self.CURRICULUM_ROUNDS, 7)} rounds; "
+              f"mastery {params.get(self.CURRICULUM_MASTERY, 0.9)}, regression {params.get(self.CURRICULUM_REGRESSION, 0.7)} "
+              f"over {params.get(self.CURRICULUM_WINDOW, 100)} episodes, review every {params.get(self.CURRICULUM_REVIEW, 4)} blocks)")
+        print(f"  Phase timing: {params.get(self.PHASE_TIMING, False)} (block of {params.get(self.PHASE_TIMING_BLOCK, 100)} episodes)")
+        print(f"  Profiler: {params.get(self.PROFILER) or 'off'}")
+        print(f"  Memory budget: {params.get(self.MEMORY_BUDGET_MB) or 'none'} (MB)")
+        print(f"  Worker start method: {params.get(self.START_METHOD) or 'default'} (preload: {params.get(self.PRELOAD, False)})")
+        print(f"  Cluster coordinator: {params.get(self.CLUSTER_ADDRESS) or 'off (local Pool)'}")
+        print(f"  State visitation: {params.get(self.VISITATION, False)} (snapshot every {params.get(self.VISITATION_BLOCK, 100)} episodes)")
+        print(f"  Trajectories: {'every ' + str(params[self.RECORD_TRAJECTORIES]) + ' episode(s)' if params.get(self.RECORD_TRAJECTORIES) else 'off'}"
+              f" (last {params.get(self.TRAJECTORY_CAPACITY) or 'all the'} steps of an episode)")
+        print(f"  Replay snapshots: {'every ' + str(params[self.SNAPSHOT_EVERY]) + ' episodes' if params.get(self.SNAPSHOT_EVERY) else 'off'}"
+              f" (full Q-tables every {params.get(self.SNAPSHOT_FULL_EVERY, 10)} snapshots)")
+        print(f"  Early stopping: {params.get(self.EARLY_STOPPING) or 'off'} (window {params.get(self.EARLY_STOPPING_WINDOW, 500)} episodes, "
+              f"competence >= {params.get(self.EARLY_STOPPING_THRESHOLD, 0.95)}, Q delta < {params.get(self.EARLY_STOPPING_TOLERANCE, 1e-4)})")
+        print(f"  Live progress: {params.get(self.PROGRESS, True)} (events every {params.get(self.PROGRESS_INTERVAL, 0.5)} s per worker)")
         
         # Environment parameters
         print("\n  ENVIRONMENT:")
         print(f"  Grid size: {params.get(self.GRID_SIZE, 'N/A')}")
         print(f"  Render mode: {params.get(self.RENDER_MODE, 'N/A')}")
         print(f"  Environment Layout: {params.get(self.LAYOUT_V, 'N/A')}")
+        print(f"  Procedural layout parameters: {params.get(self.PROCEDURAL_LAYOUT) or 'defaults'}")
+        print(f"  Engine: {params.get(self.ENGINE, 'minigrid')}")
+        print(f"  Shared layout tables (tabular engine): {params.get(self.SHARED_LAYOUTS, False)}")
         
         # Student parameters
         print("\n STUDENT HYPERPARAMETERS:")
@@ -96,15 +166,26 @@ class ConfigManager():
         print(f"  Alpha reward model: {params.get(self.ALPHA_REW_MODEL, 'N/A')}")
         print(f"  Epsilon mode: {params.get(self.EPS_S_MODE, 'N/A')}")
         print(f"  Epsilon default: {params.get(self.EPS_S_DEFAULT, 'N/A')}")
+        print(f"  Algorithm: {params.get(self.STUDENT_ALGORITHM, 'q_learning')}")
+        print(f"  Lambda (traces): {params.get(self.LAMBDA_S, 'N/A')}")
+        print(f"  N-step: {params.get(self.N_STEP_S, 'N/A')}")
+        print(f"  Q-table init: {params.get(self.STUDENT_Q_INIT, 'zeros')}")
+        print(f"  Planning steps per real step: {params.get(self.PLANNING_STEPS, 0)}")
+        print(f"  Planning priority threshold: {params.get(self.PLANNING_THRESHOLD, 0.0)}")
+        print(f"  Episode kernel: {params.get(self.EPISODE_KERNEL) or 'off'}")
         
         # Teacher parameters
         print("\n TEACHER HYPERPARAMETERS:")
         print(f"  Alpha (learning rate): {params.get(self.ALPHA_T, 'N/A')}")
         print(f"  Epsilon: {params.get(self.EPSILON_T, 'N/A')}")
+        print(f"  Color preferences: {params.get(self.HUMAN_PREFERENCES) or 'default model'}")
+        print(f"  Absence multiplier: {params.get(self.ABSENCE_MUX, 'N/A')}")
+        print(f"  Population of teachers: {len(params.get(self.HUMAN_POPULATION) or []) or 'off'} (mode: {params.get(self.POPULATION_MODE, 'pairs')})")
         
         print("="*50 + "\n")
         
-        while True:
+        # Batch runs start without asking
+        while confirm:
             response = input("Do you want to start simulation? (y/n): ").lower().strip()
             if response in ['y','yes']:
                 break
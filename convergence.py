@@ -0,0 +1,112 @@
+"""
+Convergence-based early stopping of Training.run_training.
+
+With early_stopping set, every run_training call (one layout) stops as soon as
+its criterion holds, checked at the end of each episode:
+  competence  moving-average competence over the last early_stopping_window
+              episodes >= early_stopping_threshold
+  policy      no change of the greedy action of any state over the last
+              early_stopping_window episodes (greedy.GreedyIndex.policy_changes)
+  q_delta     largest change of a Q-value over the last early_stopping_window
+              episodes < early_stopping_tolerance (compared once per window)
+A list of criteria stops when all of them hold. It is off with the interleaved
+curriculum, whose blocks are one episode long.
+
+The remaining episodes of the call are padded by repeating the metrics of the
+last window (pad_metrics), so every seed returns metrics of the full length and
+seed aggregation is unchanged; the first padded episode is recorded in
+Training.stop_episodes.
+"""
+import os
+import numpy as np
+
+COMPETENCE = "competence"
+POLICY = "policy"
+Q_DELTA = "q_delta"
+CRITERIA = (COMPETENCE, POLICY, Q_DELTA)
+
+DEFAULT_WINDOW = 500
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_TOLERANCE = 1e-4
+
+STOP_REPORT = "Early Stopping.txt"
+
+
+def criteria_of(value):
+    """early_stopping config value (None, a criterion or a list of criteria) -> tuple of criteria."""
+    if not value:
+        return ()
+    criteria = (value,) if isinstance(value, str) else tuple(value)
+    unknown = [c for c in criteria if c not in CRITERIA]
+    if unknown:
+        raise ValueError(f"Unknown early stopping criteria: {unknown} (expected {CRITERIA})")
+    return criteria
+
+
+class ConvergenceMonitor:
+
+    """Stopping test of one run_training call over one Q-table."""
+
+    def __init__(self, criteria, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD, tolerance=DEFAULT_TOLERANCE):
+
+        self.criteria = criteria
+        self.window = window
+        self.threshold = threshold
+        self.tolerance = tolerance
+        self.QTable = None
+        self.greedy = None
+        self.episodes = 0
+        self._policy_changes = 0 # greedy policy changes at the start of the current window
+        self._q = None           # Q-table at the start of the current window
+        self._stable = {POLICY: False, Q_DELTA: False}
+
+    def start(self, QTable, greedy):
+        """Begin a run_training call on QTable, with its greedy.GreedyIndex (the window restarts)."""
+        self.QTable = QTable
+        self.greedy = greedy
+        self.episodes = 0
+        self._stable = {POLICY: False, Q_DELTA: False}
+        self._snapshot()
+
+    def _snapshot(self):
+        self._policy_changes = self.greedy.policy_changes
+        if Q_DELTA in self.criteria:
+            self._q = self.QTable.copy()
+
+    def converged(self, student_competence):
+        """Called at the end of every episode; True when all the criteria hold."""
+        self.episodes += 1
+        if self.episodes % self.window == 0:
+            if POLICY in self.criteria:
+                self._stable[POLICY] = self.greedy.policy_changes == self._policy_changes
+            if Q_DELTA in self.criteria:
+                self._stable[Q_DELTA] = float(np.max(np.abs(self.QTable - self._q))) < self.tolerance
+            self._snapshot()
+        for criterion in self.criteria:
+            if criterion == COMPETENCE:
+                if self.episodes < self.window or np.mean(student_competence[-self.window:]) < self.threshold:
+                    return False
+            elif not self._stable[criterion]:
+                return False
+        return True
+
+
+def pad_metrics(metrics, remaining, window):
+    """Extend each list of metrics with remaining episodes, repeating the last window episodes in order."""
+    for values in metrics:
+        last = values[-window:]
+        values.extend(last[i % len(last)] for i in range(remaining))
+
+
+def store_stop_report(stop_episodes, episodes, output_dir, title=STOP_REPORT):
+    """Save where every seed stopped (list per seed of (layout, first padded episode, padded episodes))."""
+    total = episodes * len(stop_episodes)
+    padded = sum(stop[2] for seed_stops in stop_episodes for stop in seed_stops)
+    with open(os.path.join(output_dir, "statistics", title), "w") as f:
+        f.write(f"Early stopping: {padded} of {total} episodes padded ({100 * padded / max(total, 1):.1f}%)\n")
+        f.write("=" * 50 + "\n\n")
+        for seed, seed_stops in enumerate(stop_episodes):
+            if not seed_stops:
+                f.write(f"Seed {seed}: not stopped\n")
+            for layout, episode, nr_padded in seed_stops:
+                f.write(f"Seed {seed} {layout}: stopped at episode {episode} ({nr_padded} episodes padded)\n")
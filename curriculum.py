@@ -0,0 +1,128 @@
+"""
+Curriculum of the multiple_env mode: the layout the student trains on next, and for how many episodes.
+
+curriculum (config key):
+  fixed        the layouts in turn, n_episodes_multiple_env episodes each, for curriculum_rounds rounds (default)
+  interleaved  one episode per layout, in turn (early stopping is off: it is measured within a block)
+  competence   blocks of n_episodes_multiple_env episodes: the student stays on a layout until it is mastered
+               (competence over its last curriculum_window episodes on that layout >= curriculum_mastery),
+               then moves to the next layout not mastered yet. Every curriculum_review blocks, and whenever
+               all the layouts are mastered, the mastered layout trained least recently gets a review block;
+               if its competence has fallen below curriculum_regression it is trained again until mastered.
+
+Every policy spends the same budget, curriculum_rounds * layouts * n_episodes_multiple_env episodes
+per seed, so the per-episode metrics of the seeds keep the same length.
+"""
+import collections
+import os
+import numpy as np
+from configManager import ConfigManager
+
+FIXED = "fixed"
+INTERLEAVED = "interleaved"
+COMPETENCE = "competence"
+POLICIES = (FIXED, INTERLEAVED, COMPETENCE)
+
+DEFAULT_ROUNDS = 7 # 7000 episodes per layout with the blocks of 1000 episodes of the original schedule
+DEFAULT_WINDOW = 100
+DEFAULT_MASTERY = 0.9
+DEFAULT_REGRESSION = 0.7
+DEFAULT_REVIEW = 4
+
+CURRICULUM_REPORT = "Curriculum.txt"
+
+
+def budget(params, layouts):
+    """Training episodes of one seed in multiple_env mode."""
+    return params.get(ConfigManager.CURRICULUM_ROUNDS, DEFAULT_ROUNDS) * len(layouts) * params[ConfigManager.N_EPISODES_MULTIPLE_ENV]
+
+
+class CurriculumScheduler:
+
+    """Iterates over the (layout, episodes) blocks of one seed; record() feeds back the competence of each block."""
+
+    def __init__(self, layouts, policy=FIXED, block=1000, rounds=DEFAULT_ROUNDS, window=DEFAULT_WINDOW,
+                 mastery=DEFAULT_MASTERY, regression=DEFAULT_REGRESSION, review=DEFAULT_REVIEW):
+
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown curriculum: {policy} (expected {POLICIES})")
+        self.layouts = list(layouts)
+        self.policy = policy
+        self.block = block
+        self.budget = rounds * len(self.layouts) * block
+        self.mastery = mastery
+        self.regression = regression
+        self.review = review
+
+        self.history = {layout: collections.deque(maxlen=window) for layout in self.layouts} # last episodes on each layout
+        self.episodes = dict.fromkeys(self.layouts, 0) # episodes trained on each layout
+        self.mastered = dict.fromkeys(self.layouts, False)
+        self.last_trained = dict.fromkeys(self.layouts, -1) # block index
+        self.blocks = [] # (layout, episodes), consecutive blocks of a layout merged
+        self._current = 0
+
+    @classmethod
+    def from_config(cls, params, layouts):
+        return cls(layouts, params.get(ConfigManager.CURRICULUM, FIXED), params[ConfigManager.N_EPISODES_MULTIPLE_ENV],
+                   params.get(ConfigManager.CURRICULUM_ROUNDS, DEFAULT_ROUNDS), params.get(ConfigManager.CURRICULUM_WINDOW, DEFAULT_WINDOW),
+                   params.get(ConfigManager.CURRICULUM_MASTERY, DEFAULT_MASTERY),
+                   params.get(ConfigManager.CURRICULUM_REGRESSION, DEFAULT_REGRESSION),
+                   params.get(ConfigManager.CURRICULUM_REVIEW, DEFAULT_REVIEW))
+
+    def competence(self, layout):
+        history = self.history[layout]
+        return float(np.mean(history)) if history else 0.0
+
+    def __iter__(self):
+        remaining = self.budget
+        nr_of_blocks = 0
+        while remaining > 0:
+            if self.policy == FIXED:
+                layout, episodes = self.layouts[nr_of_blocks % len(self.layouts)], self.block
+            elif self.policy == INTERLEAVED:
+                layout, episodes = self.layouts[nr_of_blocks % len(self.layouts)], 1
+            else:
+                layout, episodes = self._next_competence_layout(nr_of_blocks), self.block
+            episodes = min(episodes, remaining)
+            yield layout, episodes
+            self.last_trained[layout] = nr_of_blocks
+            remaining -= episodes
+            nr_of_blocks += 1
+
+    def _next_competence_layout(self, nr_of_blocks):
+        mastered = [l for l in self.layouts if self.mastered[l]]
+        pending = [self.layouts[(self._current + k) % len(self.layouts)] for k in range(len(self.layouts))]
+        pending = [l for l in pending if not self.mastered[l]]
+        review_due = mastered and self.review and nr_of_blocks % (self.review + 1) == self.review
+        if pending and not review_due:
+            self._current = self.layouts.index(pending[0])
+            return pending[0]
+        return min(mastered, key=lambda l: self.last_trained[l]) # review
+
+    def record(self, layout, student_competence):
+        """Competence (0/1) of the episodes of the block just trained on layout."""
+        self.history[layout].extend(student_competence)
+        self.episodes[layout] += len(student_competence)
+        if self.blocks and self.blocks[-1][0] == layout:
+            self.blocks[-1] = (layout, self.blocks[-1][1] + len(student_competence))
+        else:
+            self.blocks.append((layout, len(student_competence)))
+
+        competence = self.competence(layout)
+        if not self.mastered[layout] and len(self.history[layout]) == self.history[layout].maxlen and competence >= self.mastery:
+            self.mastered[layout] = True
+        elif self.mastered[layout] and competence < self.regression:
+            self.mastered[layout] = False # regression: train it again
+            self._current = self.layouts.index(layout)
+
+
+def store_curriculum_report(curricula, output_dir, title=CURRICULUM_REPORT, max_blocks=100):
+    """Save the layout blocks of every seed (list per seed of (layout, episodes)) and the episodes per layout."""
+    with open(os.path.join(output_dir, "statistics", title), "w") as f:
+        for seed, blocks in enumerate(curricula):
+            per_layout = collections.Counter()
+            for layout, episodes in blocks:
+                per_layout[layout] += episodes
+            f.write(f"Seed {seed}: {len(blocks)} blocks, " + ", ".join(f"{l} {n}" for l, n in per_layout.items()) + " episodes\n")
+            if len(blocks) <= max_blocks:
+                f.write("  " + " -> ".join(f"{l} ({n})" for l, n in blocks) + "\n")
@@ -0,0 +1,303 @@
+"""
+Differential test harness: the MiniGrid reference implementation (engine: minigrid,
+step loop of Training.run_training) against the fast training paths, same seed and layout.
+
+Checks:
+  tabular     engine: tabular with the same step loop consumes the random stream exactly as the
+              reference: the step-by-step trajectories, the Q-table and the per-episode metrics
+              must be equal within tolerance
+  kernel      episode_kernel: python and jit must agree with each other. They draw their random
+              numbers differently (kernel.py), so their trajectories are replayed through the
+              reference environment and update rule: every state, color, reward and episode
+              outcome, the episode metrics and the final Q-table must match
+  population  PopulationTraining (vectorized over the teachers) with the single teacher of the
+              config: different random stream and no trajectories, so the comparison is
+              statistical, competence and reward per seed (mean over the run) over --seeds seeds
+              against the jit episode kernel (tied to the reference by the kernel replay check)
+  golden      the reference itself against the fixtures stored in golden/<layout>.npz
+              (trajectories, Q-table, metrics), to catch any change of the reference
+  warm_start  greedy episodes of the reference from the optimal warm start (student_q_init:
+              optimal) must reach the goal and leave the Q-values of the greedy actions
+              unchanged: the warm start is a fixed point of the learner
+
+Every path runs REFERENCE_PARAMS (not config.yaml), so the fixtures do not depend on the
+local config. Trajectories are recorded with trajectories.TrajectoryRecorder, whose rewards
+are float32 (REWARD_ATOL).
+
+    python differential.py [--layouts v1 v2] [--checks tabular kernel golden]
+    python differential.py --update-golden     # after an intended change of the reference
+
+Exit code 1 if any check fails.
+"""
+import argparse
+import collections
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from configManager import ConfigManager
+from tabular import make_environment, ENGINE_MINIGRID, ENGINE_TABULAR
+from human import Human, HumanPopulation
+from training import Training, PopulationTraining
+import trajectories
+import kernel
+
+GOLDEN_DIR = "golden"
+LAYOUTS = ["v1","v2","v3","v4"]
+CHECKS = ["tabular", "kernel", "population", "golden", "warm_start"]
+
+# Small fixed workload: about 50000 MiniGrid steps per layout
+REFERENCE_PARAMS = {
+    ConfigManager.SEED: 0,
+    ConfigManager.SIM_MODE: "single_env",
+    ConfigManager.N_EPISODES_SINGLE_ENV: 100,
+    ConfigManager.MAX_STEPS: 600, # long enough for the goal to be reached in every layout
+    ConfigManager.GRID_SIZE: 20,
+    ConfigManager.RENDER_MODE: None,
+    ConfigManager.ALPHA_S: 0.1,
+    ConfigManager.GAMMA_S: 0.95,
+    ConfigManager.EPS_S_MODE: "adaptive",
+    ConfigManager.EPS_S_DEFAULT: 0.9,
+    ConfigManager.MIN_EPSILON_S: 0.05,
+    ConfigManager.ALPHA_REW_MODEL: 0.1,
+    ConfigManager.ALPHA_T: 0.1,
+    ConfigManager.EPSILON_T: 0.1,
+    ConfigManager.HUMAN_PREFERENCES: None,
+    ConfigManager.ABSENCE_MUX: 0.5,
+    ConfigManager.PROGRESS: False,
+}
+
+ATOL = 1e-9
+RTOL = 1e-9
+REWARD_ATOL = 1e-6     # rewards of the recorded trajectories are float32
+POPULATION_SEEDS = 16
+POPULATION_EPISODES = 200
+POPULATION_SIGMAS = 4.0 # allowed difference of the means, in standard errors
+MAX_REPORTED = 10       # failures printed per check
+WARM_START_EPISODES = 3
+
+METRICS = ("student_competence", "cumulative_reward_s_trend", "cumulative_teacher_actions", "cumulative_reward_teacher")
+TRAJECTORY_FIELDS = ("x", "y", "dir", "action", "color")
+
+Run = collections.namedtuple("Run", "trajectory q metrics")
+
+
+def run_path(params, layout, engine, episode_kernel=None):
+    """Train one seed of params on layout with engine (and episode kernel), recording every step."""
+    trajectory_dir = tempfile.mkdtemp(prefix="differential_")
+    try:
+        run_params = dict(params, **{ConfigManager.ENGINE: engine, ConfigManager.LAYOUT_V: layout,
+                                     ConfigManager.EPISODE_KERNEL: episode_kernel, ConfigManager.RECORD_TRAJECTORIES: 1,
+                                     ConfigManager.TRAJECTORY_CAPACITY: None, ConfigManager.TRAJECTORY_DIR: trajectory_dir})
+        env = make_environment(run_params)
+        trainer = Training(run_params, env, Human(run_params))
+        trainer.reset_training() # seeds np.random
+        trainer.run_training()
+
+        recorded = trajectories.read_trajectories(os.path.join(trajectory_dir, f"seed_{run_params[ConfigManager.SEED]}"))
+        trajectory = {name: np.array(recorded.records[name]) for name in TRAJECTORY_FIELDS + ("reward",)}
+        trajectory["length"] = np.array(recorded.index["length"])
+        del recorded # close the memory maps before removing the files
+    finally:
+        shutil.rmtree(trajectory_dir, ignore_errors=True)
+
+    metrics = {m: np.asarray(getattr(trainer, m), dtype=np.float64) for m in METRICS}
+    return Run(trajectory, trainer.student_QTable_Dict[layout].copy(), metrics)
+
+
+def compare(name, expected, actual, atol=ATOL, rtol=RTOL):
+    """Failures (list of strings) of actual against expected: shape, then the first value out of tolerance."""
+    expected, actual = np.asarray(expected), np.asarray(actual)
+    if expected.shape != actual.shape:
+        return [f"{name}: shape {actual.shape}, expected {expected.shape}"]
+    close = np.isclose(actual, expected, atol=atol, rtol=rtol)
+    if close.all():
+        return []
+    first = np.unravel_index(np.argmin(close), close.shape)
+    return [f"{name}: {np.count_nonzero(~close)} value(s) differ, first at {tuple(int(i) for i in first)}: "
+            f"{actual[first]!r}, expected {expected[first]!r}"]
+
+
+def compare_runs(expected, actual, atol=ATOL, rtol=RTOL):
+    """Step-by-step trajectories, Q-table and metrics of two runs with the same random stream."""
+    failures = compare("episode lengths", expected.trajectory["length"], actual.trajectory["length"], 0, 0)
+    if not failures: # same steps: the trajectories can be compared step by step
+        for field in TRAJECTORY_FIELDS:
+            failures += compare(f"trajectory {field}", expected.trajectory[field], actual.trajectory[field], 0, 0)
+        failures += compare("trajectory reward", expected.trajectory["reward"], actual.trajectory["reward"], REWARD_ATOL, 0)
+    failures += compare("Q-table", expected.q, actual.q, atol, rtol)
+    for m in METRICS:
+        failures += compare(m, expected.metrics[m], actual.metrics[m], atol, rtol)
+    return failures
+
+
+def replay(params, layout, run, atol=ATOL, rtol=RTOL):
+    """Replay the recorded actions of run through the reference environment and update rule (human present)."""
+    replay_params = dict(params, **{ConfigManager.ENGINE: ENGINE_MINIGRID, ConfigManager.LAYOUT_V: layout})
+    env = make_environment(replay_params)
+    human = Human(replay_params)
+    alpha, gamma = replay_params[ConfigManager.ALPHA_S], replay_params[ConfigManager.GAMMA_S]
+    Q = np.zeros_like(run.q)
+    t = run.trajectory
+
+    failures = []
+    competence, cumulative_rewards = [], []
+    k = 0
+    for episode, length in enumerate(t["length"]):
+        env.reset(replay_params[ConfigManager.SEED])
+        cumulative_reward = 0.0
+        done = False
+        for step in range(length):
+            state = (*env.agent_pos, env.agent_dir)
+            recorded = (int(t["x"][k]), int(t["y"][k]), int(t["dir"][k]))
+            if state != recorded or done:
+                failures.append(f"episode {episode} step {step}: reference state {state} (done: {done}), recorded {recorded}")
+                return failures
+            color = env.check_if_agent_is_on_unpreferred_cell(human.preferences)
+            if (-1 if color is None else color) != t["color"][k]:
+                failures.append(f"episode {episode} step {step}: reference color {color}, recorded {t['color'][k]}")
+
+            action = int(t["action"][k])
+            _, reward, terminated, truncated, _ = env.step(action, human.HUMAN_ACTION_STAY, color, human.preferences)
+            if abs(reward - t["reward"][k]) > REWARD_ATOL:
+                failures.append(f"episode {episode} step {step}: reference reward {reward!r}, recorded {t['reward'][k]!r}")
+
+            index = Training.state_to_index(state, env.width, env.NR_OF_ROBOT_DIRECTIONS)
+            next_index = Training.state_to_index((*env.agent_pos, env.agent_dir), env.width, env.NR_OF_ROBOT_DIRECTIONS)
+            Q[index, action] += alpha * (reward + gamma * np.max(Q[next_index, :]) - Q[index, action])
+            cumulative_reward += reward
+            done = terminated or truncated
+            k += 1
+        if not done:
+            failures.append(f"episode {episode}: the reference episode is not over after the {length} recorded steps")
+            return failures
+        competence.append(1 if terminated else 0)
+        cumulative_rewards.append(cumulative_reward)
+    env.close()
+
+    failures += compare("student_competence (replayed)", competence, run.metrics["student_competence"], 0, 0)
+    failures += compare("cumulative_reward_s_trend (replayed)", cumulative_rewards, run.metrics["cumulative_reward_s_trend"], atol, rtol)
+    failures += compare("Q-table (replayed)", Q, run.q, atol, rtol)
+    return failures
+
+
+def check_population(params, layout, seeds=POPULATION_SEEDS, episodes=POPULATION_EPISODES, sigmas=POPULATION_SIGMAS):
+    """Mean competence and reward over the seeds, PopulationTraining against the jit episode kernel."""
+    run_params = dict(params, **{ConfigManager.ENGINE: ENGINE_TABULAR, ConfigManager.LAYOUT_V: layout,
+                                 ConfigManager.N_EPISODES_SINGLE_ENV: episodes, ConfigManager.EPISODE_KERNEL: kernel.KERNEL_JIT})
+    teacher = [{ConfigManager.HUMAN_PREFERENCES: params.get(ConfigManager.HUMAN_PREFERENCES),
+                ConfigManager.ABSENCE_MUX: params[ConfigManager.ABSENCE_MUX]}]
+    reference, batched = collections.defaultdict(list), collections.defaultdict(list)
+    for seed in range(seeds):
+        seed_params = dict(run_params, **{ConfigManager.SEED: seed})
+        trainer = Training(seed_params, make_environment(seed_params), Human(seed_params))
+        trainer.reset_training()
+        trainer.run_training()
+        population_params = dict(seed_params, **{ConfigManager.HUMAN_POPULATION: teacher, ConfigManager.EPISODE_KERNEL: None})
+        np.random.seed(seed)
+        population = PopulationTraining(population_params, HumanPopulation.from_config(population_params))
+        population.run_training()
+        for m in ("student_competence", "cumulative_reward_s_trend"):
+            reference[m].append(np.mean(getattr(trainer, m)))
+            batched[m].append(np.mean(np.asarray(getattr(population, m))[:, 0]))
+
+    failures = []
+    for m in reference:
+        difference = np.mean(batched[m]) - np.mean(reference[m])
+        stderr = np.sqrt((np.var(batched[m], ddof=1) + np.var(reference[m], ddof=1)) / seeds)
+        if abs(difference) > sigmas * stderr + ATOL:
+            failures.append(f"{m}: batched mean {np.mean(batched[m]):.4f}, reference mean {np.mean(reference[m]):.4f} "
+                            f"(difference {difference:+.4f} > {sigmas} x {stderr:.4f})")
+    return failures
+
+
+def check_warm_start(params, layout, episodes=WARM_START_EPISODES):
+    """Greedy episodes (epsilon 0) of the reference from the optimal warm start."""
+    run_params = dict(params, **{ConfigManager.ENGINE: ENGINE_MINIGRID, ConfigManager.LAYOUT_V: layout,
+                                 ConfigManager.STUDENT_Q_INIT: "optimal", ConfigManager.EPS_S_MODE: "constant",
+                                 ConfigManager.EPS_S_DEFAULT: 0.0, ConfigManager.N_EPISODES_SINGLE_ENV: episodes})
+    trainer = Training(run_params, make_environment(run_params), Human(run_params))
+    trainer.reset_training()
+    q = trainer.student_QTable_Dict[layout].copy()
+    trainer.run_training()
+
+    greedy = q == q.max(axis=1, keepdims=True)
+    failures = compare("Q-values of the greedy actions", q[greedy], trainer.student_QTable_Dict[layout][greedy])
+    if not all(trainer.student_competence):
+        failures.append(f"greedy episodes reached the goal {sum(trainer.student_competence)}/{episodes} times")
+    return failures
+
+
+def golden_path(layout, golden_dir=GOLDEN_DIR):
+    return os.path.join(golden_dir, f"{layout}.npz")
+
+
+def save_golden(run, params, layout, golden_dir=GOLDEN_DIR):
+    os.makedirs(golden_dir, exist_ok=True)
+    arrays = {f"trajectory_{k}": v for k, v in run.trajectory.items()}
+    arrays.update({f"metric_{k}": v for k, v in run.metrics.items()})
+    np.savez_compressed(golden_path(layout, golden_dir), q=run.q, params=json.dumps(params, sort_keys=True), **arrays)
+
+
+def load_golden(layout, golden_dir=GOLDEN_DIR):
+    """(params, Run) of the stored fixture of layout."""
+    with np.load(golden_path(layout, golden_dir)) as f:
+        trajectory = {k[len("trajectory_"):]: f[k] for k in f.files if k.startswith("trajectory_")}
+        metrics = {k[len("metric_"):]: f[k] for k in f.files if k.startswith("metric_")}
+        return json.loads(str(f["params"])), Run(trajectory, f["q"], metrics)
+
+
+def check_golden(params, layout, reference, golden_dir=GOLDEN_DIR):
+    if not os.path.exists(golden_path(layout, golden_dir)):
+        return [f"no fixture {golden_path(layout, golden_dir)} (run with --update-golden)"]
+    golden_params, golden = load_golden(layout, golden_dir)
+    if golden_params != json.loads(json.dumps(params, sort_keys=True)):
+        return [f"{golden_path(layout, golden_dir)} was generated with other parameters (run with --update-golden)"]
+    return compare_runs(golden, reference)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare the fast training paths with the MiniGrid reference implementation")
+    parser.add_argument("--layouts", nargs="+", default=LAYOUTS)
+    parser.add_argument("--checks", nargs="+", default=CHECKS, choices=CHECKS)
+    parser.add_argument("--golden-dir", default=GOLDEN_DIR)
+    parser.add_argument("--update-golden", action="store_true", help="store the reference runs as the new fixtures")
+    parser.add_argument("--seeds", type=int, default=POPULATION_SEEDS, help="seeds of the statistical population check")
+    args = parser.parse_args()
+
+    params = dict(REFERENCE_PARAMS)
+    results = []
+    for layout in args.layouts:
+        print(f"LAYOUT {layout}")
+        reference = run_path(params, layout, ENGINE_MINIGRID)
+
+        if args.update_golden:
+            save_golden(reference, params, layout, args.golden_dir)
+            print(f"  fixture saved to {golden_path(layout, args.golden_dir)}")
+        if "golden" in args.checks and not args.update_golden:
+            results.append(("golden", layout, check_golden(params, layout, reference, args.golden_dir)))
+        if "tabular" in args.checks:
+            results.append(("tabular", layout, compare_runs(reference, run_path(params, layout, ENGINE_TABULAR))))
+        if "kernel" in args.checks:
+            python_run = run_path(params, layout, ENGINE_TABULAR, kernel.KERNEL_PYTHON)
+            jit_run = run_path(params, layout, ENGINE_TABULAR, kernel.KERNEL_JIT)
+            results.append(("kernel python/jit", layout, compare_runs(python_run, jit_run)))
+            results.append(("kernel replay", layout, replay(params, layout, python_run)))
+        if "population" in args.checks:
+            results.append(("population", layout, check_population(params, layout, args.seeds)))
+        if "warm_start" in args.checks:
+            results.append(("warm_start", layout, check_warm_start(params, layout)))
+
+        for check, check_layout, failures in results:
+            if check_layout == layout:
+                print(f"  {'PASS' if not failures else 'FAIL'} {check}")
+                for failure in failures[:MAX_REPORTED]:
+                    print(f"       {failure}")
+                if len(failures) > MAX_REPORTED:
+                    print(f"       ... {len(failures) - MAX_REPORTED} more")
+
+    failed = [(check, layout) for check, layout, failures in results if failures]
+    print(f"{len(results) - len(failed)}/{len(results)} checks passed")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,185 @@
+"""
+Exact dynamic-programming solutions of the student problem on a compiled layout.
+
+The student reward for taking action a in state s (human present) is the
+preference of the color under the agent plus, when a reaches the goal, the
+MiniGrid reward 1 - 0.9 * step_count / max_steps. Since the goal reward decays
+with the step count, the exact solution is finite-horizon (backward induction
+over max_steps). Stationary value and policy iteration are also provided, with
+a constant goal reward.
+"""
+import numpy as np
+from configManager import ConfigManager
+from tabular import COLORS, compile_layout, layout_key, color_reward_vector, rollout_greedy
+
+FINITE_HORIZON = "finite_horizon"
+VALUE_ITERATION = "value_iteration"
+POLICY_ITERATION = "policy_iteration"
+
+
+class DPSolution:
+
+    """Optimal student Q-table of a layout and the return of its greedy policy.
+
+    q: [S, A] optimal Q-values (for finite_horizon: at step 0, i.e. episode start); 0 in the
+       terminal states (goal cell), as in a Q-table trained from zeros
+    optimal_return: undiscounted student return of the optimal policy from the start state
+    """
+
+    def __init__(self, q, optimal_return, iterations, terminal_states=None):
+        if terminal_states is not None:
+            q[terminal_states] = 0.0 # the episode ends there: the learner bootstraps 0 from them (rows never updated)
+        self.q = q
+        self.v = q.max(axis=1)
+        self.policy = np.argmax(q, axis=1).astype(np.int8)
+        self.optimal_return = float(optimal_return)
+        self.iterations = iterations
+
+    def regret(self, episode_returns):
+        """Per-episode regret of the student returns (e.g. Training.cumulative_reward_s_trend)."""
+        return self.optimal_return - np.asarray(episode_returns, dtype=float)
+
+
+def terminal_states(tables):
+    """States the goal is reached into: the agent never acts there."""
+    return np.unique(tables.next_index[tables.reaches_goal])
+
+
+def _backward_induction(tables, color_rewards, gamma, max_steps):
+    """Optimal Q-values of every step, (t, goal reward of the step, q_t) from t = max_steps - 1 down to 0."""
+    r_color = color_rewards[tables.index_color][:, None] # [S, 1]
+    goal = tables.reaches_goal
+    v_next = np.zeros(tables.nr_of_states) # value after truncation is 0
+    for t in reversed(range(max_steps)):
+        goal_reward = 1 - 0.9 * ((t + 1) / max_steps) # step_count is t + 1 after the action
+        q = r_color + goal * goal_reward + gamma * np.where(goal, 0.0, v_next[tables.next_index])
+        yield t, goal_reward, q
+        v_next = q.max(axis=1)
+
+
+def finite_horizon(tables, color_rewards, gamma, max_steps):
+    """Backward induction over the step count: exact under the time-decaying goal reward and truncation.
+
+    The Q-values are those of step 0, except on the optimal paths from the start state (all the greedy
+    actions, ties included), whose states hold the Q-values of the step the paths reach them: there the
+    Q-table is a fixed point of the one-step update of the learner, which sees the goal reward of the
+    actual step.
+    """
+    states = np.arange(tables.nr_of_states)
+    r_color = color_rewards[tables.index_color]
+    goal = tables.reaches_goal
+    next_index = tables.next_index
+    action_bits = 1 << np.arange(next_index.shape[1])
+
+    greedy_actions = np.zeros((max_steps, tables.nr_of_states), dtype=np.uint8) # bit set of the optimal actions of every step
+    return_next = np.zeros(tables.nr_of_states) # undiscounted return of the optimal policy
+    for t, goal_reward, q in _backward_induction(tables, color_rewards, gamma, max_steps):
+        greedy_actions[t] = (q == q.max(axis=1)[:, None]) @ action_bits
+        policy = np.argmax(q, axis=1)
+        reached = goal[states, policy]
+        return_next = r_color + reached * goal_reward + np.where(reached, 0.0, return_next[next_index[states, policy]])
+
+    # States of the optimal paths from the start, at the first step they are reached
+    on_path = {}
+    frontier = {int(tables.start_index)}
+    for t in range(max_steps):
+        for index in frontier:
+            on_path.setdefault(index, t)
+        successors = set()
+        for index in frontier:
+            for action in np.flatnonzero(greedy_actions[t, index] & action_bits):
+                if not goal[index, action]:
+                    successors.add(int(next_index[index, action]))
+        frontier = {index for index in successors if index not in on_path}
+        if not frontier:
+            break
+    at_step = {}
+    for index, t in on_path.items():
+        at_step.setdefault(t, []).append(index)
+
+    q_paths = q
+    for t, _, q_t in _backward_induction(tables, color_rewards, gamma, max_steps):
+        if t > 0 and t in at_step:
+            q_paths[at_step[t]] = q_t[at_step[t]]
+
+    return DPSolution(q_paths, return_next[tables.start_index], max_steps, terminal_states(tables))
+
+
+def value_iteration(tables, color_rewards, gamma, max_steps, goal_reward=1.0, tol=1e-10, max_iter=100000):
+    """Stationary value iteration with a constant goal reward."""
+    r = color_rewards[tables.index_color][:, None] + tables.reaches_goal * goal_reward
+    continues = gamma * ~tables.reaches_goal
+
+    v = np.zeros(tables.nr_of_states)
+    for it in range(1, max_iter + 1):
+        q = r + continues * v[tables.next_index]
+        v_new = q.max(axis=1)
+        delta = np.max(np.abs(v_new - v))
+        v = v_new
+        if delta < tol:
+            break
+
+    return _stationary_solution(tables, q, color_rewards, max_steps, it)
+
+
+def policy_iteration(tables, color_rewards, gamma, max_steps, goal_reward=1.0, tol=1e-10, max_iter=1000):
+    """Stationary policy iteration (iterative policy evaluation) with a constant goal reward."""
+    states = np.arange(tables.nr_of_states)
+    r = color_rewards[tables.index_color][:, None] + tables.reaches_goal * goal_reward
+    continues = gamma * ~tables.reaches_goal
+
+    policy = np.zeros(tables.nr_of_states, dtype=np.int64)
+    v = np.zeros(tables.nr_of_states)
+    for it in range(1, max_iter + 1):
+
+        # Policy evaluation
+        r_pi, c_pi, next_pi = r[states, policy], continues[states, policy], tables.next_index[states, policy]
+        while True:
+            v_new = r_pi + c_pi * v[next_pi]
+            delta = np.max(np.abs(v_new - v))
+            v = v_new
+            if delta < tol:
+                break
+
+        # Policy improvement (keep the current action on ties, so that the loop ends)
+        q = r + continues * v[tables.next_index]
+        improved = np.where(q[states, policy] >= q.max(axis=1) - tol, policy, np.argmax(q, axis=1))
+        if np.array_equal(improved, policy):
+            break
+        policy = improved
+
+    return _stationary_solution(tables, q, color_rewards, max_steps, it)
+
+
+def _stationary_solution(tables, q, color_rewards, max_steps, iterations):
+    # Return of the greedy policy under the true (time-decaying) goal reward
+    _, _, _, returns = rollout_greedy(tables, np.argmax(q, axis=1)[None, :], max_steps, color_rewards[:-1])
+    return DPSolution(q, returns[0], iterations, terminal_states(tables))
+
+
+SOLVERS = {
+    FINITE_HORIZON: finite_horizon,
+    VALUE_ITERATION: value_iteration,
+    POLICY_ITERATION: policy_iteration,
+}
+
+_solutions = {} # (*layout_key, max_steps, gamma, reward model, method) -> DPSolution, per process
+
+def solve_layout(params, layout=None, human_preferences=None, method=FINITE_HORIZON):
+    """Optimal solution of a layout for params gamma_s/max_steps, cached per process.
+
+    human_preferences defaults to the human_preferences config key, or Human.MODEL_OF_HUMAN_COLORS
+    without it (the reward seen while the human stays).
+    """
+    layout = params[ConfigManager.LAYOUT_V] if layout is None else layout
+    if human_preferences is None:
+        human_preferences = params.get(ConfigManager.HUMAN_PREFERENCES)
+    color_rewards = color_reward_vector(human_preferences)
+    key = (*layout_key(params, layout), params[ConfigManager.MAX_STEPS],
+           params[ConfigManager.GAMMA_S], tuple(color_rewards), method)
+
+    if key not in _solutions:
+        tables = compile_layout(params, layout)
+        _solutions[key] = SOLVERS[method](tables, color_rewards, params[ConfigManager.GAMMA_S], params[ConfigManager.MAX_STEPS])
+
+    return _solutions[key]
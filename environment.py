@@ -4,10 +4,14 @@ from minigrid.core.world_object import Goal, Wall, Floor
 from minigrid.minigrid_env import MiniGridEnv
 from configManager import ConfigManager
 from minigrid.core.constants import COLOR_NAMES
-from human import Human
+from human import Human, COLOR_INDEX
+from preference_model import PreferenceModel
+from phase_timer import clock
+import phase_timer
+import layout_generator
 
 
-class MyEnvironment(MiniGridEnv):
+class MyEnvironment(PreferenceModel, MiniGridEnv):
     
     NR_OF_ROBOT_DIRECTIONS = 4 # 0: right, 1: down, 2: left, 3: up
     NR_OF_ROBOT_ACTIONS =  3 # Number of agent (student) actions (forward, left, right)
@@ -29,13 +33,14 @@ class MyEnvironment(MiniGridEnv):
             "v2": self.build_v2,
             "v3": self.build_v3,
             "v4": self.build_v4,
+            layout_generator.PROCEDURAL: self.build_procedural,
             }
         
-        # attributi di agent
-        self.estimated_model_of_human_colors = dict.fromkeys(Human.MODEL_OF_HUMAN_COLORS, 0.0)
+        # attributi di agent (estimated model of human colors, visit counters)
+        self._init_preference_model()
         
-        # dict of counters of visited cells corresponding to human preferences
-        self.cell_visit_frequencies = dict.fromkeys(Human.MODEL_OF_HUMAN_COLORS, 0)
+        # Optional PhaseTimer, attached by Training when phase timing is enabled
+        self.phase_timer = None
   
         
         # Define the mission space
@@ -51,27 +56,21 @@ class MyEnvironment(MiniGridEnv):
             **kwargs,
         )
         
-    def check_if_agent_is_on_unpreferred_cell(self, human_preferences=None):
-        if human_preferences:
-           color = getattr(self.grid.get(*self.agent_pos), "color", None)
-           if color in human_preferences:
-               self.cell_visit_frequencies[color] += 1
-               return color
-           else:
-               return None
-        else:
-            return None
+    def _color_under_agent(self):
+        return COLOR_INDEX.get(getattr(self.grid.get(*self.agent_pos), "color", None))
     
     def reset(self, seed=None):
         super().reset()
-        self.cell_visit_frequencies = dict.fromkeys(Human.MODEL_OF_HUMAN_COLORS, 0)
-        
-    def _update_model_of_h_pref(self,color,human_preferred_colors):
-        self.estimated_model_of_human_colors[color] += self.cfg[ConfigManager.ALPHA_REW_MODEL] * (human_preferred_colors[color]
-                                                                - self.estimated_model_of_human_colors[color])
+        self._reset_visit_frequencies()
 
     def rebuild_env(self, width, height):
         self._gen_grid(width, height)
+
+    def set_layout(self, layout):
+        """Switch to layout in place: MiniGrid generates the grid of cfg layout_version at the next reset."""
+        if layout not in self.layouts:
+            raise ValueError(f"Unknown layout: {layout}")
+        self.cfg[ConfigManager.LAYOUT_V] = layout
     
     @staticmethod
     def _gen_mission():
@@ -285,23 +284,34 @@ class MyEnvironment(MiniGridEnv):
             self.place_agent()         
             
             
+    """
+    Layout procedurale (layout_generator): divisori verticali con gap, pilastri isolati e
+    blocchi colorati, generati per qualsiasi grid_size dai parametri procedural_layout
+    """
+    def build_procedural(self, width, height):
+        layout_params = layout_generator.layout_parameters(self.cfg.get(ConfigManager.PROCEDURAL_LAYOUT))
+        cell_type, cell_color, self.agent_start_pos, self.agent_start_dir = layout_generator.generate_layout(self.size, **layout_params)
+        
+        self.grid = Grid(width, height)
+        for x in range(width):
+            for y in range(height):
+                if cell_type[x, y] == layout_generator.CELL_WALL:
+                    self.grid.set(x, y, Wall())
+                elif cell_type[x, y] == layout_generator.CELL_GOAL:
+                    self.put_obj(Goal(), x, y)
+                elif cell_color[x, y] != layout_generator.NO_COLOR:
+                    self.put_obj(Floor(layout_generator.COLORS[cell_color[x, y]]), x, y)
+        
+        self.agent_pos = self.agent_start_pos
+        self.agent_dir = self.agent_start_dir
+            
     def step(self, action, human_action=None, color=None, human_color_preferences=None):
                 
+        if self.phase_timer is not None: t0 = clock()
         obs, r_tau, terminated, truncated, info = super().step(action)   
+        if self.phase_timer is not None: self.phase_timer.add(phase_timer.MINIGRID_STEP, clock() - t0)
         
-        r_ag = 0.0
-                            
-        if human_action == Human.HUMAN_ACTION_STAY:
-            if color:
-                r_ag = r_tau + human_color_preferences[color]
-                self._update_model_of_h_pref(color, human_color_preferences)  # update the model with the preference reward
-            else:
-                r_ag = r_tau
-        else:
-            if color:
-                r_ag = r_tau + self.estimated_model_of_human_colors[color]    
-            else:
-                r_ag = r_tau
+        r_ag = self._shape_reward(r_tau, human_action, color, human_color_preferences)
                             
         info['r_tau'] = r_tau
                                 
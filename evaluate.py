@@ -0,0 +1,141 @@
+"""
+Headless batch evaluation of the stored Q-tables of a simulation.
+
+Every Q-table in simulations/<name>/Q_Tables is turned into a greedy policy
+(int array, one action per state) and rolled out on each layout, without
+rendering and over the compiled layout arrays. Usage:
+
+    python evaluate.py <name_of_sim> [--layouts v1 v2 v3 v4] [--processes N]
+"""
+import argparse
+import csv
+import glob
+import multiprocessing
+import os
+import re
+import numpy as np
+from functools import partial
+from configManager import ConfigManager
+from tabular import COLORS, compile_layout, rollout_greedy
+
+ENVIRONMENTS = ["v1","v2","v3","v4"]
+
+# Q_table_<seed>.csv (single_env) or Q_table_<layout>_<seed>.csv (multiple_env)
+QTABLE_FILE_PATTERN = re.compile(r"Q_table_(?:(?P<layout>.+)_)?(?P<seed>\d+)\.csv$")
+
+
+def load_greedy_policy(q_table_path):
+    """Greedy action per state (ties go to the lowest action, as np.argmax)."""
+    q_table = np.loadtxt(q_table_path, delimiter=",", ndmin=2)
+    return np.argmax(q_table, axis=1).astype(np.int8)
+
+
+def find_q_tables(sim_dir, default_layout):
+    """List (seed, trained layout, path) of the stored Q-tables, sorted by seed and layout."""
+    q_tables = []
+    for path in glob.glob(os.path.join(sim_dir, "Q_Tables", "Q_table_*.csv")):
+        match = QTABLE_FILE_PATTERN.search(os.path.basename(path))
+        if match:
+            q_tables.append((int(match.group("seed")), match.group("layout") or default_layout, path))
+    return sorted(q_tables)
+
+
+def evaluate_on_layout(layout, policies=None, params=None):
+    """Roll out all the policies on one layout. Returns (layout, success, path_length, color_visits, returns)."""
+    tables = compile_layout(params, layout)
+    if policies.shape[1] != tables.nr_of_states:
+        raise ValueError(f"Q-tables have {policies.shape[1]} states, layout {layout} has {tables.nr_of_states}")
+    return (layout, *rollout_greedy(tables, policies, params[ConfigManager.MAX_STEPS], params.get(ConfigManager.HUMAN_PREFERENCES)))
+
+
+def simulation_config(sim_dir):
+    """Parameters the simulation actually ran with: config_effective.yaml (config file plus --set overrides), else config.yaml (older runs)."""
+    effective = os.path.join(sim_dir, "config_effective.yaml")
+    return effective if os.path.exists(effective) else os.path.join(sim_dir, "config.yaml")
+
+
+def evaluate_simulation(sim_dir, layouts=ENVIRONMENTS, processes=None):
+    """Evaluate every stored Q-table of a simulation on each layout, one row per (Q-table, layout)."""
+    params = ConfigManager.load_config(simulation_config(sim_dir))
+    q_tables = find_q_tables(sim_dir, params[ConfigManager.LAYOUT_V])
+    if not q_tables:
+        raise FileNotFoundError(f"No Q-tables found in {os.path.join(sim_dir, 'Q_Tables')}")
+
+    processes = processes or min(multiprocessing.cpu_count(), len(q_tables))
+    with multiprocessing.Pool(processes=processes) as pool:
+
+        # Extract the greedy policies once (CSV parsing is the slow part)
+        policies = np.stack(pool.map(load_greedy_policy, [path for _, _, path in q_tables]))
+
+        # Each layout rolls out all the policies at once
+        results = pool.map(partial(evaluate_on_layout, policies=policies, params=params), layouts)
+
+    rows = []
+    for layout, success, path_length, color_visits, returns in results:
+        for i, (seed, trained_layout, _) in enumerate(q_tables):
+            row = {"seed": seed,
+                   "trained_layout": trained_layout,
+                   "eval_layout": layout,
+                   "success": int(success[i]),
+                   "path_length": int(path_length[i]),
+                   "return": float(returns[i])}
+            row.update({f"visits_{c}": int(color_visits[i, k]) for k, c in enumerate(COLORS)})
+            rows.append(row)
+    return rows
+
+
+def summarize(rows):
+    """Success rate, mean path length (successful episodes) and mean color visits per (trained, eval) layout."""
+    summary = {}
+    for key in sorted({(r["trained_layout"], r["eval_layout"]) for r in rows}):
+        group = [r for r in rows if (r["trained_layout"], r["eval_layout"]) == key]
+        successful = [r["path_length"] for r in group if r["success"]]
+        summary[key] = {
+            "nr_seeds": len(group),
+            "success_rate": np.mean([r["success"] for r in group]),
+            "path_length": np.mean(successful) if successful else float("nan"),
+            "visits": {c: np.mean([r[f"visits_{c}"] for r in group]) for c in COLORS},
+        }
+    return summary
+
+
+def store_evaluation(rows, summary, sim_dir):
+
+    statistics_dir = os.path.join(sim_dir, "statistics")
+    os.makedirs(statistics_dir, exist_ok=True)
+
+    with open(os.path.join(statistics_dir, "evaluation.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    with open(os.path.join(statistics_dir, "evaluation_summary.txt"), "w") as f:
+        f.write(format_summary(summary))
+
+
+def format_summary(summary):
+    lines = ["Greedy policy evaluation", "=" * 50, ""]
+    lines.append(f"{'trained':>8} {'eval':>6} {'seeds':>6} {'success':>8} {'path len':>9}  color visits")
+    for (trained_layout, eval_layout), s in summary.items():
+        visits = " ".join(f"{c}={v:.1f}" for c, v in s["visits"].items() if v > 0)
+        lines.append(f"{trained_layout:>8} {eval_layout:>6} {s['nr_seeds']:>6} {s['success_rate']:>8.2f} {s['path_length']:>9.1f}  {visits}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Headless evaluation of the stored Q-tables of a simulation")
+    parser.add_argument("name_of_sim", help="simulation name (folder under simulations/) or path to the simulation folder")
+    parser.add_argument("--layouts", nargs="+", default=ENVIRONMENTS, help="layouts to roll the policies out on")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    sim_dir = args.name_of_sim if os.path.isdir(args.name_of_sim) else os.path.join(os.getcwd(), "simulations", args.name_of_sim)
+
+    rows = evaluate_simulation(sim_dir, args.layouts, args.processes)
+    summary = summarize(rows)
+    store_evaluation(rows, summary, sim_dir)
+
+    for r in rows:
+        print(f"seed {r['seed']:>4} {r['trained_layout']} -> {r['eval_layout']}: success={r['success']} path_length={r['path_length']} return={r['return']:.3f}")
+    print("\n" + format_summary(summary))
@@ -0,0 +1,73 @@
+"""
+Greedy policy of a student Q-table, maintained incrementally.
+
+GreedyIndex keeps, per state, the max Q-value, the set of greedy actions (ties)
+and the first of them (argmax, as np.argmax). Training updates it after every
+change of the Q-table, for the touched rows only, so the bootstrap target
+max_a Q(s', a), the greedy action selection and the Q(lambda) greedy test are
+O(1) reads instead of row scans. policy_changes counts the changes of the
+greedy action of any state, for the early stopping policy criterion.
+"""
+import numpy as np
+
+
+class GreedyIndex:
+
+    """max_q [S], ties [S, A] (bool), nr_of_ties [S] and argmax [S] of a Q-table, updated row by row."""
+
+    def __init__(self, QTable):
+
+        self.QTable = QTable
+        self.max_q = QTable.max(axis=1)
+        self.ties = QTable == self.max_q[:, None]
+        self.nr_of_ties = self.ties.sum(axis=1)
+        self.argmax = QTable.argmax(axis=1)
+        self.policy_changes = 0
+
+    def update(self, index, action):
+        """QTable[index, action] changed."""
+        q = self.QTable[index, action]
+        max_q = self.max_q[index]
+        if q > max_q: # new unique maximum
+            self.max_q[index] = q
+            self.ties[index] = False
+            self.ties[index, action] = True
+            self.nr_of_ties[index] = 1
+            self._set_argmax(index, action)
+        elif q == max_q:
+            if not self.ties[index, action]:
+                self.ties[index, action] = True
+                self.nr_of_ties[index] += 1
+                if action < self.argmax[index]:
+                    self._set_argmax(index, action)
+        elif self.ties[index, action]: # a greedy action decreased
+            self.refresh(index)
+
+    def refresh(self, rows):
+        """Recompute the given rows (an index or an array of indices, e.g. all the pairs touched by a trace update)."""
+        q = self.QTable[rows]
+        max_q = q.max(axis=-1)
+        argmax = q.argmax(axis=-1)
+        ties = q == np.expand_dims(max_q, -1)
+        changed = argmax != self.argmax[rows]
+        if np.any(changed): # a row can be listed more than once
+            self.policy_changes += np.unique(rows[changed]).size if np.ndim(rows) else 1
+        self.max_q[rows] = max_q
+        self.ties[rows] = ties
+        self.nr_of_ties[rows] = ties.sum(axis=-1)
+        self.argmax[rows] = argmax
+
+    def _set_argmax(self, index, action):
+        if self.argmax[index] != action:
+            self.argmax[index] = action
+            self.policy_changes += 1
+
+    def greedy_action(self, index):
+        """Greedy action of index, ties broken uniformly (np.random.choice, no draw for a single greedy action)."""
+        if self.nr_of_ties[index] == 1:
+            return self.argmax[index]
+        return np.random.choice(np.flatnonzero(self.ties[index]))
+
+    def policy(self):
+        """Greedy action of every state (copy), as np.argmax of the Q-table."""
+        return self.argmax.copy()
@@ -1,6 +1,26 @@
 from configManager import ConfigManager
 from types import MappingProxyType
-from minigrid.core.constants import COLOR_NAMES
+import numpy as np
+
+# Fixed color index of the preference arrays (same order as MiniGrid COLOR_NAMES)
+COLORS = ("blue", "green", "grey", "purple", "red", "yellow")
+COLOR_INDEX = MappingProxyType({c: i for i, c in enumerate(COLORS)})
+NR_OF_COLORS = len(COLORS)
+
+def preference_vector(human_preferences=None):
+    """Float array [NR_OF_COLORS] of the preferences: a {color: value} mapping (unlisted colors: 0.0),
+    a sequence in COLORS order, or None for the default Human.MODEL_OF_HUMAN_COLORS."""
+    if human_preferences is None:
+        human_preferences = Human.MODEL_OF_HUMAN_COLORS
+    if hasattr(human_preferences, "items"):
+        unknown = set(human_preferences) - set(COLORS)
+        if unknown:
+            raise ValueError(f"Unknown colors in the human preferences: {sorted(unknown)}")
+        return np.array([float(human_preferences.get(c, 0.0)) for c in COLORS])
+    vector = np.array(human_preferences, dtype=np.float64)
+    if vector.shape != (NR_OF_COLORS,):
+        raise ValueError(f"Human preferences need one value per color {COLORS}, got shape {vector.shape}")
+    return vector
 
 class Human():
      
@@ -22,6 +42,9 @@ class Human():
         print("Human INIT ")
         self.cfg = params
         
+        # Preferences per color index (human_preferences config key, default MODEL_OF_HUMAN_COLORS)
+        self.preferences = preference_vector(params.get(ConfigManager.HUMAN_PREFERENCES))
+        
     def _reward_Human(self, human_action, r_tau, cell_visited = None):
                 
         # Inizializzazione componenti
@@ -29,17 +52,12 @@ class Human():
         reward_to_leave = 1.0  # bonus quando l'umano decide di "leave"
         reward_preferences = 0.0  # componente legata alle preferenze sui colori
 
-        # Se non viene fornita la mappa delle celle visitate, la preferenza è nulla
-        if not cell_visited:
+        # Se non vengono forniti i contatori delle celle visitate, la preferenza è nulla
+        if cell_visited is None:
             reward_preferences = 0.0
         else:
-            # Somma pesata: per ogni colore configurato, moltiplica il peso
-            # di preferenza per il numero di celle visitate di quel colore
-            reward_preferences = sum(
-                self.MODEL_OF_HUMAN_COLORS[h_p] * cell_visited[h_p]
-                for h_p in self.MODEL_OF_HUMAN_COLORS
-                if h_p in cell_visited
-            )
+            # Somma pesata: peso di preferenza per numero di celle visitate, per ogni colore (prodotto scalare)
+            reward_preferences = float(np.dot(self.preferences, cell_visited))
                     
         # Combinazione finale in base all'azione umana
         if human_action == self.HUMAN_ACTION_STAY:
@@ -48,11 +66,70 @@ class Human():
             reward_human = r_tau + self.cfg[ConfigManager.ABSENCE_MUX] * reward_preferences + reward_to_leave
             
         return reward_human
+
+
+class HumanPopulation():
+    
+    """M human teachers as arrays: preferences [M, NR_OF_COLORS], absence multipliers [M]
+    and teacher Q-values [M, 2] (columns STAY, LEAVE).
+    
+    rewards, select_actions and update act on all the M teachers in one vectorized call;
+    teacher m computes the same reward as a Human with preferences[m] and absence_multipliers[m].
+    """
+    
+    STAY = 0
+    LEAVE = 1
+    ACTIONS = (Human.HUMAN_ACTION_STAY, Human.HUMAN_ACTION_LEAVE) # by column of the teacher Q-values
+    
+    def __init__(self, preferences, absence_multipliers):
+        
+        self.preferences = np.atleast_2d(np.asarray(preferences, dtype=np.float64))
+        self.size = self.preferences.shape[0]
+        if self.preferences.shape[1] != NR_OF_COLORS:
+            raise ValueError(f"Human preferences need one value per color {COLORS}, got shape {self.preferences.shape}")
+        self.absence_multipliers = np.broadcast_to(np.asarray(absence_multipliers, dtype=np.float64), (self.size,)).copy()
+        self.Q = np.zeros((self.size, len(self.ACTIONS)))
+        
+    @classmethod
+    def from_config(cls, params):
+        """Population of the human_population config key: a list of {human_preferences, absence_multiplier}
+        entries, each defaulting to the human_preferences and absence_multiplier of the config."""
+        entries = params.get(ConfigManager.HUMAN_POPULATION) or []
+        if not entries:
+            raise ValueError("human_population needs at least one entry")
+        preferences = [preference_vector(e.get(ConfigManager.HUMAN_PREFERENCES, params.get(ConfigManager.HUMAN_PREFERENCES))) for e in entries]
+        absence_multipliers = [e.get(ConfigManager.ABSENCE_MUX, params[ConfigManager.ABSENCE_MUX]) for e in entries]
+        return cls(preferences, absence_multipliers)
+        
+    def human(self, m, params):
+        """Human equivalent to teacher m (preferences and absence multiplier in a copy of params)."""
+        human_params = dict(params, **{ConfigManager.HUMAN_PREFERENCES: list(self.preferences[m]),
+                                       ConfigManager.ABSENCE_MUX: float(self.absence_multipliers[m])})
+        return Human(human_params)
+    
+    def select_actions(self, epsilon):
+        """Epsilon-greedy action (column index) of every teacher, ties broken at random."""
+        explore = np.random.random_sample(self.size) < epsilon
+        random_actions = np.random.randint(0, len(self.ACTIONS), self.size)
+        tie_break = np.random.random_sample(self.Q.shape)
+        greedy = np.argmax(np.where(self.Q == self.Q.max(axis=1, keepdims=True), tie_break, -1.0), axis=1)
+        return np.where(explore, random_actions, greedy)
+    
+    def rewards(self, actions, r_tau, cell_visited):
+        """Reward of every teacher (Human._reward_Human), cell_visited: visit counts [M, NR_OF_COLORS]."""
+        reward_preferences = np.einsum("mc,mc->m", self.preferences, cell_visited)
+        return np.where(actions == self.STAY, r_tau + reward_preferences,
+                        r_tau + self.absence_multipliers * reward_preferences + 1.0) # reward_to_leave
+    
+    def update(self, actions, rewards, alpha):
+        """Teacher Q-value update of the selected actions, for all the teachers."""
+        rows = np.arange(self.size)
+        self.Q[rows, actions] = (1 - alpha) * self.Q[rows, actions] + alpha * rewards
    
 """
 def main():
         params = ConfigManager.load_config("config.yaml")
-        cell_visited = {'red': 1, 'blue': 2}
+        cell_visited = np.array([2, 0, 0, 0, 1, 0]) # visits per color index: 2 blue, 1 red
         h = Human(params)
         p = h._reward_Human('leave',1,cell_visited)
         print(p)
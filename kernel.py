@@ -0,0 +1,126 @@
+"""
+Compiled episode kernel of the student: one whole episode of epsilon-greedy
+one-step Q-learning over the LayoutTables arrays of the tabular engine
+(transition lookup, color penalty, preference model update, TD update).
+
+The random numbers of the episode are drawn beforehand from np.random
+(draw_episode), so the result depends only on the seed, not on what runs the
+kernel: with episode_kernel: jit it is compiled with numba (if installed),
+with episode_kernel: python the very same function runs in the interpreter and
+gives identical results.
+
+The kernel consumes the random stream differently from the reference loop of
+Training.run_training (one draw for the exploration test and one for the
+action, per step), so the two paths give different (statistically equivalent)
+runs for the same seed.
+"""
+import numpy as np
+
+KERNEL_PYTHON = "python"
+KERNEL_JIT = "jit"
+KERNELS = (KERNEL_PYTHON, KERNEL_JIT)
+
+
+def draw_episode(max_steps):
+    """Random numbers of one episode: [0] exploration test, [1] action (random or tie break), per step."""
+    return np.random.random_sample((2, max_steps))
+
+
+def run_episode(Q, next_index, reaches_goal, index_color, start_index, max_steps, alpha, gamma, epsilon,
+                human_stay, human_prefs, estimated_prefs, alpha_rew_model, visits, draws,
+                trace_index, trace_action, trace_reward):
+    """Run one episode from start_index, updating Q, estimated_prefs and visits in place.
+
+    trace_index/trace_action/trace_reward [max_steps] receive the state, action and student
+    reward of every step (read by the trajectory recorder).
+    Returns (terminated, truncated, steps, cumulative reward, r_tau of the last step, last state index).
+    """
+    nr_of_actions = Q.shape[1]
+    index = start_index
+    cumulative_reward = 0.0
+    r_tau = 0.0
+    terminated = False
+    truncated = False
+    step_count = 0
+
+    while not terminated and not truncated:
+        u_explore = draws[0, step_count]
+        u_action = draws[1, step_count]
+
+        # Epsilon-greedy action, ties broken uniformly
+        if u_explore < epsilon:
+            action = int(u_action * nr_of_actions)
+        else:
+            max_q = Q[index, 0]
+            for a in range(1, nr_of_actions):
+                if Q[index, a] > max_q:
+                    max_q = Q[index, a]
+            nr_of_ties = 0
+            for a in range(nr_of_actions):
+                if Q[index, a] == max_q:
+                    nr_of_ties += 1
+            k = int(u_action * nr_of_ties)
+            action = 0
+            for a in range(nr_of_actions):
+                if Q[index, a] == max_q:
+                    if k == 0:
+                        action = a
+                        break
+                    k -= 1
+
+        # Color under the agent, before the step
+        color = index_color[index]
+        if color >= 0:
+            visits[color] += 1
+
+        # Transition and task reward
+        step_count += 1
+        terminated = reaches_goal[index, action]
+        r_tau = 1 - 0.9 * (step_count / max_steps) if terminated else 0.0
+        truncated = step_count >= max_steps
+        next_state = next_index[index, action]
+
+        # Preference shaping (true preference when the human stays, estimated otherwise)
+        reward = r_tau
+        if color >= 0:
+            if human_stay:
+                reward = r_tau + human_prefs[color]
+                estimated_prefs[color] += alpha_rew_model * (human_prefs[color] - estimated_prefs[color])
+            else:
+                reward = r_tau + estimated_prefs[color]
+
+        # One-step Q-learning
+        max_next = Q[next_state, 0]
+        for a in range(1, nr_of_actions):
+            if Q[next_state, a] > max_next:
+                max_next = Q[next_state, a]
+        td_error = reward + gamma * max_next - Q[index, action]
+        Q[index, action] += alpha * td_error
+
+        trace_index[step_count - 1] = index
+        trace_action[step_count - 1] = action
+        trace_reward[step_count - 1] = reward
+
+        cumulative_reward += reward
+        index = next_state
+
+    return terminated, truncated, step_count, cumulative_reward, r_tau, index
+
+
+_jit_kernel = None
+
+def get_kernel(name):
+    """Episode function for episode_kernel name; jit falls back to the interpreter without numba."""
+    global _jit_kernel
+    if name == KERNEL_PYTHON:
+        return run_episode
+    elif name == KERNEL_JIT:
+        if _jit_kernel is None:
+            try:
+                import numba # optional dependency, imported only by the jit kernel (about 150 ms)
+            except ImportError:
+                print("numba is not installed: running the episode kernel in the interpreter")
+                return run_episode
+            _jit_kernel = numba.njit(cache=True)(run_episode)
+        return _jit_kernel
+    raise ValueError(f"Unknown episode kernel: {name}")
@@ -0,0 +1,129 @@
+"""
+Procedural layouts for any grid size (layout_version: procedural).
+
+The v1..v4 layouts of MyEnvironment use offsets that only fit the default
+grid_size. The procedural family keeps their structure (start in the top-left
+corner, goal in the bottom-right one, vertical dividing walls with gaps,
+red/blue floor patches) but places everything relative to the size, so the
+same parameters give comparable layouts at 20x20, 50x50 or 100x100.
+
+Parameters (procedural_layout config key, every entry optional):
+  seed          generator seed (independent of the training seed)
+  dividers      number of vertical dividing walls (default: one every 20 cells)
+  gaps          gaps per divider: an int (random rows) or a list of fractions of
+                the height in [0, 1] (same rows in every divider)
+  gap_width     rows of each gap
+  wall_density  fraction of the interior cells turned into isolated pillars
+  patches       number of colored patches (default: one per 400 cells, at least 3)
+  patch_size    side of a patch
+  patch_colors  colors of the patches, drawn uniformly
+
+Pillars are only placed where their 8 neighbours are free, so they never
+disconnect the free cells: the goal is always reachable through the gaps.
+
+generate_layout returns the cell arrays of tabular.LayoutTables directly;
+tabular.compile_layout turns them into (cached) tables without MiniGrid, and
+MyEnvironment.build_procedural draws the same arrays as a MiniGrid grid.
+"""
+import numpy as np
+from tabular import CELL_EMPTY, CELL_WALL, CELL_GOAL, COLORS, NO_COLOR
+
+PROCEDURAL = "procedural" # layout_version of the procedural family
+
+DEFAULTS = {
+    "seed": 0,
+    "dividers": None,
+    "gaps": 1,
+    "gap_width": 2,
+    "wall_density": 0.05,
+    "patches": None,
+    "patch_size": 3,
+    "patch_colors": ("red", "blue"),
+}
+
+
+def layout_parameters(params=None):
+    """Generator parameters: DEFAULTS updated with the procedural_layout mapping of the config (if any)."""
+    layout_params = dict(DEFAULTS)
+    layout_params.update(params or {})
+    unknown = set(layout_params) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown procedural layout parameters: {sorted(unknown)}")
+    return layout_params
+
+
+def parameters_key(layout_params):
+    """Hashable form of the generator parameters (part of the layout cache keys)."""
+    return tuple((k, tuple(v) if isinstance(v, (list, tuple)) else v) for k, v in sorted(layout_params.items()))
+
+
+def generate_layout(size, seed=0, dividers=None, gaps=1, gap_width=2, wall_density=0.05, patches=None,
+                    patch_size=3, patch_colors=("red", "blue")):
+    """Generate a size x size layout.
+
+    Returns (cell_type [size, size] int8, cell_color [size, size] int8, start_pos, start_dir),
+    indexed [x, y] as in tabular.LayoutTables.
+    """
+    if size < 6:
+        raise ValueError(f"Procedural layouts need grid_size >= 6, got {size}")
+    rng = np.random.default_rng(seed)
+    cell_type = np.full((size, size), CELL_EMPTY, dtype=np.int8)
+    cell_color = np.full((size, size), NO_COLOR, dtype=np.int8)
+
+    # Surrounding walls
+    cell_type[[0, -1], :] = CELL_WALL
+    cell_type[:, [0, -1]] = CELL_WALL
+
+    start_pos, start_dir = (1, 1), 0
+    goal = (size - 2, size - 2)
+    interior = size - 2
+
+    # Vertical dividers, evenly spaced between the start and the goal column, each with its gaps
+    if dividers is None:
+        dividers = max(1, size // 20)
+    columns = []
+    for k in range(1, dividers + 1):
+        x = int(round(k * (size - 1) / (dividers + 1)))
+        if 2 <= x <= size - 3 and (not columns or x - columns[-1] >= 2): # two adjacent dividers could not be crossed
+            columns.append(x)
+    gap_width = max(1, min(gap_width, interior))
+    for x in columns:
+        cell_type[x, 1:-1] = CELL_WALL
+        if isinstance(gaps, (int, np.integer)):
+            first_rows = rng.choice(interior - gap_width + 1, size=max(1, min(gaps, interior - gap_width + 1)), replace=False) + 1
+        else:
+            first_rows = [1 + int(round(f * (interior - gap_width))) for f in gaps]
+        for y in first_rows:
+            cell_type[x, y:y + gap_width] = CELL_EMPTY
+
+    # Isolated pillars: a free cell whose 8 neighbours are free (so never next to a divider or a gap), not the start or the goal
+    reserved = np.zeros((size, size), dtype=bool)
+    reserved[start_pos] = reserved[goal] = True
+    nr_of_pillars = int(wall_density * interior * interior)
+    candidates = rng.permutation(interior * interior)
+    placed = 0
+    for c in candidates:
+        if placed >= nr_of_pillars:
+            break
+        x, y = divmod(int(c), interior)
+        x, y = x + 1, y + 1
+        if reserved[x, y] or (cell_type[x - 1:x + 2, y - 1:y + 2] != CELL_EMPTY).any():
+            continue
+        cell_type[x, y] = CELL_WALL
+        placed += 1
+
+    cell_type[goal] = CELL_GOAL
+
+    # Colored floor patches (overlappable, only on free cells)
+    if patches is None:
+        patches = max(3, (size * size) // 400)
+    color_index = [COLORS.index(c) for c in patch_colors]
+    for _ in range(patches):
+        x0 = int(rng.integers(1, max(2, size - 1 - patch_size)))
+        y0 = int(rng.integers(1, max(2, size - 1 - patch_size)))
+        color = color_index[int(rng.integers(len(color_index)))]
+        block = cell_type[x0:x0 + patch_size, y0:y0 + patch_size] == CELL_EMPTY
+        cell_color[x0:x0 + patch_size, y0:y0 + patch_size][block] = color
+    cell_color[start_pos] = NO_COLOR
+
+    return cell_type, cell_color, start_pos, start_dir
@@ -0,0 +1,208 @@
+"""
+Memory footprint of a sweep: peak RSS measurement, memory budget and streaming
+aggregation of the per-seed results.
+
+Pool workers report their peak RSS and their process (worker_id) with their
+TrainingResult: a worker trains several seeds and its peak RSS is the peak of
+its lifetime, so the memory report gives it per worker process. With
+memory_budget_mb set in the config, plan_memory_budget estimates the footprint
+of one worker and of the parent and limits the number of concurrent workers so
+that the estimate stays under the budget. When keeping one row of metrics per
+seed in the parent would not fit, the parent switches to streaming aggregation
+(running sums over the seeds, see SeedAggregator).
+"""
+import os
+import platform
+import sys
+import numpy as np
+from configManager import ConfigManager
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+MB = 1024 * 1024
+FLOAT_BYTES = 8
+LIST_ENTRY_BYTES = 32 # pointer + boxed float of a Python list entry
+NR_OF_METRICS = 4 # per-episode metrics of Training (competence, student reward, teacher action, teacher reward)
+MEMORY_REPORT = "Memory.txt"
+
+
+def peak_rss_mb(who=None):
+    """Peak resident set size of this process (or of its waited-for children: who=resource.RUSAGE_CHILDREN) in MB."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    return rss / MB if sys.platform == "darwin" else rss / 1024 # bytes on macOS, KB on Linux
+
+
+def worker_id():
+    """Host and PID of this process, e.g. "node1:4242" (cluster workers run on several hosts)."""
+    return f"{platform.node()}:{os.getpid()}"
+
+
+def current_rss_mb():
+    """Current resident set size of this process in MB (peak RSS where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+def estimate_result_mb(episodes, nr_of_states, nr_of_actions, nr_of_layouts):
+    """Size of one TrainingResult: the per-episode metric arrays and the student Q-tables."""
+    return (NR_OF_METRICS * episodes * FLOAT_BYTES + nr_of_layouts * nr_of_states * nr_of_actions * FLOAT_BYTES) / MB
+
+
+def estimate_worker_mb(params, episodes, nr_of_states, nr_of_actions, base_mb, nr_of_layouts=1):
+    """Peak footprint of one worker: the interpreter and its imports (base_mb) plus the training state."""
+    qtable = nr_of_states * nr_of_actions * FLOAT_BYTES
+
+    size = nr_of_layouts * qtable # Training keeps one student Q-table per trained layout
+    size += NR_OF_METRICS * episodes * LIST_ENTRY_BYTES # metric lists of Training
+    size += nr_of_states * nr_of_actions * 6 # compiled layout tables (tabular engine)
+    if params.get(ConfigManager.PLANNING_STEPS, 0) > 0:
+        size += nr_of_layouts * (2 * qtable + nr_of_states * 216) # model arrays and predecessor sets
+    if params.get(ConfigManager.STUDENT_ALGORITHM, "q_learning") == "q_lambda":
+        size += qtable # trace positions
+
+    return base_mb + size / MB + estimate_result_mb(episodes, nr_of_states, nr_of_actions, nr_of_layouts)
+
+
+def plan_memory_budget(params, num_processes, episodes, nr_of_layouts):
+    """Return (num_processes, streaming) keeping the estimated footprint under memory_budget_mb.
+
+    Every worker is assumed to hold a full copy of the parent (base RSS), which
+    overestimates forked workers that share pages with the parent.
+    """
+    budget = params.get(ConfigManager.MEMORY_BUDGET_MB)
+    if not budget:
+        return num_processes, False
+
+    grid_size = params[ConfigManager.GRID_SIZE]
+    nr_of_states, nr_of_actions = grid_size * grid_size * 4, 3
+    nr_of_seeds = params[ConfigManager.NR_OF_SEEDS]
+
+    base_mb = current_rss_mb() or 0.0
+    worker_mb = estimate_worker_mb(params, episodes, nr_of_states, nr_of_actions, base_mb, nr_of_layouts)
+    result_mb = estimate_result_mb(episodes, nr_of_states, nr_of_actions, nr_of_layouts)
+    metrics_mb = NR_OF_METRICS * episodes * FLOAT_BYTES / MB
+
+    # Parent: one row per seed (plus the stacked copy made by np.mean) or running sums only
+    collect_mb = 2 * nr_of_seeds * metrics_mb
+    stream_mb = 2 * metrics_mb
+    in_flight_mb = result_mb # each worker can have one finished result waiting in the Pool queue
+
+    streaming = base_mb + collect_mb + num_processes * (worker_mb + in_flight_mb) > budget
+    parent_mb = base_mb + (stream_mb if streaming else collect_mb)
+
+    max_processes = int((budget - parent_mb) // (worker_mb + in_flight_mb))
+    if max_processes < 1:
+        print(f"WARNING: memory budget of {budget} MB is below the estimate for a single worker "
+              f"({parent_mb + worker_mb + in_flight_mb:.1f} MB), running 1 worker")
+        max_processes = 1
+    planned = min(num_processes, max_processes)
+
+    print(f"Memory budget {budget} MB: ~{worker_mb:.1f} MB per worker, ~{parent_mb:.1f} MB parent -> "
+          f"{planned} worker(s), {'streaming' if streaming else 'per-seed'} aggregation")
+    return planned, streaming
+
+
+class SeedAggregator:
+
+    """Mean over the seeds of the per-episode metrics of the training results.
+
+    streaming=False keeps one row per seed and averages them at the end (np.mean);
+    streaming=True keeps only the running sums, in the same order, so the means are
+    the same. Per-seed scalars (phase timings, peak RSS, early stops, curricula) are kept in both modes,
+    visit counts are summed over the seeds in both modes.
+    
+    Per-layout metrics (multiple_env) are summed by episode on that layout: with an adaptive
+    curriculum the seeds spend a different number of episodes on each layout, so the mean of
+    each such episode is over the seeds that reached it (layout_mean).
+    """
+
+    METRICS = ("student_competence", "cumulative_reward_s_trend", "cumulative_teacher_actions", "cumulative_reward_teacher")
+
+    def __init__(self, streaming=False):
+
+        self.streaming = streaming
+        self.nr_of_seeds = 0
+        self.rows = {m: [] for m in self.METRICS}
+        self.sums = {}
+        self.phase_timings = []
+        self.peak_rss_mb = []
+        self.workers = [] # per seed, worker_id of the process that trained it
+        self.visit_counts = {} # layout -> visit counts summed over the seeds (visitation)
+        self.stop_episodes = [] # per seed, (layout, first padded episode, padded episodes) of the early stops
+        self.curricula = [] # per seed, (layout, episodes) blocks of the curriculum
+        self.layout_sums = {} # (layout, metric) -> sums over the seeds, by episode on that layout
+        self.layout_counts = {} # layout -> seeds that reached each episode on that layout
+
+    def add(self, result):
+        for m in self.METRICS:
+            values = getattr(result, m)
+            if not self.streaming:
+                self.rows[m].append(values)
+            elif m in self.sums:
+                self.sums[m] += values
+            else:
+                self.sums[m] = np.array(values, dtype=np.float64)
+        self.phase_timings.append(result.phase_timings)
+        self.peak_rss_mb.append(result.peak_rss_mb)
+        self.workers.append(result.worker)
+        self.stop_episodes.append(result.stop_episodes)
+        self.curricula.append(result.curriculum)
+        if result.episode_layouts is not None:
+            for i, layout in enumerate(result.layouts):
+                on_layout = result.episode_layouts == i
+                _accumulate(self.layout_counts, layout, np.ones(np.count_nonzero(on_layout)))
+                for m in self.METRICS:
+                    _accumulate(self.layout_sums, (layout, m), getattr(result, m)[on_layout])
+        for layout, counts in (result.visit_counts or {}).items():
+            if layout in self.visit_counts:
+                self.visit_counts[layout] += counts
+            else:
+                self.visit_counts[layout] = counts.astype(np.int64)
+        self.nr_of_seeds += 1
+
+    def mean(self, metric):
+        if self.streaming:
+            return self.sums[metric] / self.nr_of_seeds
+        return np.mean(np.array(self.rows[metric]), axis=0)
+    
+    def layout_mean(self, metric, layout):
+        """Mean over the seeds of metric by episode on layout (None if no seed trained on it)."""
+        if layout not in self.layout_counts:
+            return None
+        return self.layout_sums[(layout, metric)] / self.layout_counts[layout]
+
+
+def _accumulate(sums, key, values):
+    """sums[key] += values, extending sums[key] with zeros when values is longer."""
+    if key not in sums:
+        sums[key] = np.array(values, dtype=np.float64)
+        return
+    if len(values) > len(sums[key]):
+        sums[key] = np.concatenate((sums[key], np.zeros(len(values) - len(sums[key]))))
+    sums[key][:len(values)] += values
+
+
+def store_memory_report(peak_rss_per_seed, workers, parent_peak_rss, output_dir, num_processes, streaming, budget=None, title=MEMORY_REPORT):
+    """Save the peak RSS of the parent and of each worker process, with the seeds it trained."""
+    seeds_of = {} # worker_id -> seeds, in order of first seed
+    peak_of = {}
+    for seed, (worker, rss) in enumerate(zip(workers, peak_rss_per_seed)):
+        seeds_of.setdefault(worker, []).append(seed)
+        if rss is not None:
+            peak_of[worker] = max(rss, peak_of.get(worker, rss)) # lifetime peak: the one of its last seed
+    with open(os.path.join(output_dir, "statistics", title), "w") as f:
+        f.write(f"Memory budget: {budget or 'none'} MB, {num_processes} worker(s), {'streaming' if streaming else 'per-seed'} aggregation\n")
+        f.write("Peak RSS per worker process (host:pid), over its lifetime: a worker trains several seeds\n")
+        f.write("=" * 50 + "\n\n")
+        f.write(f"Parent peak RSS: {parent_peak_rss:.1f} MB\n" if parent_peak_rss is not None else "Parent peak RSS: n/a\n")
+        for worker, seeds in seeds_of.items():
+            rss = f"{peak_of[worker]:.1f} MB" if worker in peak_of else "n/a"
+            f.write(f"Worker {worker} peak RSS: {rss} (seeds {', '.join(map(str, seeds))})\n")
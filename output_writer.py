@@ -0,0 +1,94 @@
+import atexit
+import queue
+import threading
+import numpy as np
+import utils
+
+
+class OutputWriterError(RuntimeError):
+    """Raised on close when one or more background writes failed."""
+
+
+class OutputWriter:
+
+    """Background writer for results, plots and Q-tables.
+
+    Orchestrators submit arrays, figures and Q-tables, which are written by a
+    single background thread while computation continues. The queue is bounded:
+    when it is full, submit blocks until the writer catches up.
+    """
+
+    DEFAULT_MAX_QUEUE_SIZE = 32
+    _STOP = object()
+
+    def __init__(self, max_queue_size=DEFAULT_MAX_QUEUE_SIZE):
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = False
+        self.errors = [] # list of (job name, exception) for the failed writes
+
+        self._thread = threading.Thread(target=self._run, name="OutputWriter", daemon=True)
+        self._thread.start()
+
+        # Flush whatever is still queued if the process exits without close()
+        atexit.register(self.close, raise_on_error=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        # Do not mask the original exception with the writer errors
+        self.close(raise_on_error=exc_type is None)
+        return False
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) to be run on the writer thread."""
+        if self._closed:
+            raise OutputWriterError("OutputWriter is closed")
+        self._queue.put((fn, args, kwargs))
+
+    def submit_analysis(self, data, output_dir, title="Data", nr_seeds=0):
+        # Copy the data, the caller is free to reuse its buffers
+        self.submit(utils.analyze_data, np.array(data, copy=True), output_dir, title, nr_seeds)
+
+    def submit_array(self, data, output_dir, title="Data Trend"):
+        self.submit(utils.store_raw_data, np.array(data, copy=True), output_dir, title)
+
+    def submit_qtable(self, QTable, folder_path, seed=0, layout=None):
+        self.submit(utils.store_QTable, np.array(QTable, copy=True), folder_path, seed, layout)
+
+    def submit_figure(self, fig, save_path, **savefig_kwargs):
+        # The figure must not be touched by the caller after submission
+        self.submit(fig.savefig, save_path, **savefig_kwargs)
+
+    def flush(self):
+        """Block until every submitted job has been written."""
+        self._queue.join()
+
+    def close(self, raise_on_error=True):
+        """Flush the queue, stop the writer thread and report failed writes."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(self._STOP)
+            self._thread.join()
+            atexit.unregister(self.close)
+
+        if self.errors and raise_on_error:
+            failed = ", ".join(f"{name}: {e!r}" for name, e in self.errors)
+            raise OutputWriterError(f"{len(self.errors)} output job(s) failed: {failed}")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                fn, args, kwargs = item
+                try:
+                    fn(*args, **kwargs)
+                except Exception as e:
+                    name = getattr(fn, "__name__", repr(fn))
+                    self.errors.append((name, e))
+                    print(f"OutputWriter: {name} failed: {e!r}")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,73 @@
+"""
+Per-phase timers for the training loop, aggregated per block of episodes.
+
+Training.run_training and MyEnvironment.step call add() only when a PhaseTimer
+is attached (phase_timing: true in the config); otherwise the instrumentation
+is a single `is not None` check per phase.
+"""
+import time
+
+# Phases measured by Training.run_training
+EPISODE_RESET = "episode_reset"
+ACTION_SELECTION = "action_selection"
+COLOR_CHECK = "color_check"
+ENV_STEP = "env_step"
+Q_UPDATE = "q_update"
+PLANNING = "planning"
+TEACHER_UPDATE = "teacher_update" # teacher action selection, reward and Q update
+EPISODE_KERNEL = "episode_kernel" # whole student episode run by kernel.run_episode (episode_kernel set)
+
+# Sub-phase measured by MyEnvironment.step (included in env_step)
+MINIGRID_STEP = "minigrid_step"
+
+PHASES = (EPISODE_RESET, ACTION_SELECTION, COLOR_CHECK, ENV_STEP, Q_UPDATE, PLANNING, TEACHER_UPDATE, EPISODE_KERNEL, MINIGRID_STEP)
+
+clock = time.perf_counter
+
+
+class PhaseTimer:
+
+    """Accumulates seconds per phase and closes a block every block_size episodes.
+
+    blocks: list of dicts with first_episode, episodes, steps and the seconds spent in each phase.
+    """
+
+    def __init__(self, block_size=100):
+
+        self.block_size = block_size
+        self.blocks = []
+        self.episode = 0 # episodes seen so far (over all the run_training calls)
+        self._new_block()
+
+    def _new_block(self):
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.current["first_episode"] = self.episode
+        self.current["episodes"] = 0
+        self.current["steps"] = 0
+
+    def add(self, phase, seconds):
+        self.current[phase] += seconds
+
+    def end_episode(self, steps):
+        self.current["episodes"] += 1
+        self.current["steps"] += steps
+        self.episode += 1
+        if self.current["episodes"] == self.block_size:
+            self.blocks.append(self.current)
+            self._new_block()
+
+    def flush(self):
+        """Close the current (partial) block, if any."""
+        if self.current["episodes"] > 0:
+            self.blocks.append(self.current)
+            self._new_block()
+
+    def totals(self):
+        """Seconds per phase, episodes and steps over all the closed blocks."""
+        totals = dict.fromkeys(PHASES, 0.0)
+        totals["episodes"] = 0
+        totals["steps"] = 0
+        for block in self.blocks:
+            for k in totals:
+                totals[k] += block[k]
+        return totals
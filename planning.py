@@ -0,0 +1,93 @@
+"""
+Dyna-style planning for the student: a learned deterministic tabular model of
+the layout, replayed between real environment steps. With a priority threshold
+> 0 the replay is prioritized sweeping instead of uniform sampling.
+"""
+import heapq
+import numpy as np
+
+
+class DynaModel:
+
+    """Learned tabular model (last observed next state and reward) of one layout."""
+
+    def __init__(self, nr_of_states, nr_of_actions, priority_threshold=0.0):
+
+        self.nr_of_actions = nr_of_actions
+        self.next_index = np.full((nr_of_states, nr_of_actions), -1, dtype=np.int64)
+        self.reward = np.zeros((nr_of_states, nr_of_actions))
+        self.observed = [] # (state, action) pairs seen at least once, for uniform sampling
+
+        # Prioritized sweeping
+        self.priority_threshold = priority_threshold
+        self.predecessors = [set() for _ in range(nr_of_states)] # state -> {(state, action) leading to it}
+        self.queue = [] # heap of (-priority, state, action), with outdated entries until popped
+        self.priority = {} # (state, action) -> priority of its current entry in the queue
+        self.greedy = None # GreedyIndex of the Q-table being planned on
+
+    def update(self, index, action, reward, next_index):
+        if self.next_index[index, action] < 0:
+            self.observed.append((index, action))
+        self.next_index[index, action] = next_index
+        self.reward[index, action] = reward
+        if self.priority_threshold > 0:
+            self.predecessors[next_index].add((index, action))
+
+    def push(self, index, action, priority):
+        """Queue (index, action) with priority, unless it is already queued with a higher one."""
+        if priority > self.priority_threshold and priority > self.priority.get((index, action), 0.0):
+            self.priority[(index, action)] = priority
+            heapq.heappush(self.queue, (-priority, index, action))
+            if len(self.queue) > 2 * len(self.priority): # drop the outdated entries
+                self.queue = [(-p, i, a) for (i, a), p in self.priority.items()]
+                heapq.heapify(self.queue)
+
+    def pop(self):
+        """(index, action) of highest priority, None if the queue is empty (outdated entries skipped)."""
+        while self.queue:
+            priority, index, action = heapq.heappop(self.queue)
+            if self.priority.get((index, action)) == -priority:
+                del self.priority[(index, action)]
+                return index, action
+        return None
+
+    def plan(self, QTable, alpha, gamma, n_updates, index=None, action=None, td_error=0.0, greedy=None):
+        """Replay n_updates simulated one-step Q-learning updates on QTable.
+
+        index, action, td_error: the last real transition, which seeds the priority queue.
+        greedy: greedy.GreedyIndex of QTable, kept up to date (and read for the bootstrap targets).
+        """
+        self.greedy = greedy
+        if self.priority_threshold > 0:
+            self._prioritized_sweeping(QTable, alpha, gamma, n_updates, index, action, td_error)
+        else:
+            self._uniform(QTable, alpha, gamma, n_updates)
+
+    def _td_error(self, QTable, gamma, index, action):
+        next_index = self.next_index[index, action]
+        max_next = np.max(QTable[next_index, :]) if self.greedy is None else self.greedy.max_q[next_index]
+        return self.reward[index, action] + gamma * max_next - QTable[index, action]
+
+    def _update(self, QTable, alpha, gamma, index, action):
+        QTable[index, action] += alpha * self._td_error(QTable, gamma, index, action)
+        if self.greedy is not None: self.greedy.update(index, action)
+
+    def _uniform(self, QTable, alpha, gamma, n_updates):
+        for _ in range(n_updates):
+            index, action = self.observed[np.random.randint(len(self.observed))]
+            self._update(QTable, alpha, gamma, index, action)
+
+    def _prioritized_sweeping(self, QTable, alpha, gamma, n_updates, index, action, td_error):
+        if index is not None:
+            self.push(index, action, abs(td_error))
+
+        for _ in range(n_updates):
+            entry = self.pop()
+            if entry is None:
+                break
+            index, action = entry
+            self._update(QTable, alpha, gamma, index, action)
+
+            # The value of index changed: re-prioritize the transitions leading to it
+            for pred_index, pred_action in self.predecessors[index]:
+                self.push(pred_index, pred_action, abs(self._td_error(QTable, gamma, pred_index, pred_action)))
@@ -0,0 +1,61 @@
+from configManager import ConfigManager
+from human import Human, NR_OF_COLORS
+import numpy as np
+
+
+class PreferenceModel:
+
+    """Student-side model of the human color preferences.
+
+    Shared by MyEnvironment (MiniGrid) and TabularEnvironment (array-backed): both
+    shape the student reward the same way, they only differ in how the color of
+    the cell under the agent is looked up: each defines _color_under_agent(), returning
+    the index in human.COLORS of the color of that cell, None if it is uncolored.
+
+    The estimated model and the visit counters are arrays over human.COLORS,
+    allocated once and updated in place.
+    """
+
+    def _init_preference_model(self):
+        # attributi di agent
+        self.estimated_model_of_human_colors = np.zeros(NR_OF_COLORS)
+
+        # counters of visited cells per color
+        self.cell_visit_frequencies = np.zeros(NR_OF_COLORS, dtype=np.int64)
+
+    def check_if_agent_is_on_unpreferred_cell(self, human_preferences=None):
+        """Color index of the cell under the agent (counted as a visit), None on uncolored cells."""
+        if human_preferences is not None:
+           color = self._color_under_agent()
+           if color is not None:
+               self.cell_visit_frequencies[color] += 1
+               return color
+           else:
+               return None
+        else:
+            return None
+
+    def _reset_visit_frequencies(self):
+        self.cell_visit_frequencies.fill(0)
+
+    def _update_model_of_h_pref(self,color,human_preferred_colors):
+        self.estimated_model_of_human_colors[color] += self.cfg[ConfigManager.ALPHA_REW_MODEL] * (human_preferred_colors[color]
+                                                                - self.estimated_model_of_human_colors[color])
+
+    def _shape_reward(self, r_tau, human_action=None, color=None, human_color_preferences=None):
+        """Student reward: task reward plus the (true or estimated) preference of the visited color."""
+        r_ag = 0.0
+
+        if human_action == Human.HUMAN_ACTION_STAY:
+            if color is not None:
+                r_ag = r_tau + human_color_preferences[color]
+                self._update_model_of_h_pref(color, human_color_preferences)  # update the model with the preference reward
+            else:
+                r_ag = r_tau
+        else:
+            if color is not None:
+                r_ag = r_tau + self.estimated_model_of_human_colors[color]
+            else:
+                r_ag = r_tau
+
+        return r_ag
@@ -0,0 +1,75 @@
+"""
+Worker start-up: start method of the Pool and optional preloading.
+
+With preload: true the worker modules are imported and the layouts compiled
+(tabular.compile_layout, and dp_solver.solve_layout for the optimal warm start)
+once, before the workers start:
+  - fork (default on Linux): in the parent, the workers inherit the caches
+  - forkserver: in the fork server (set_forkserver_preload), every worker is
+    forked from it with the modules and the layouts already in memory
+  - spawn: each worker starts from a fresh interpreter, preloading only helps the parent
+
+start_method: null keeps the platform default.
+"""
+import json
+import multiprocessing
+import multiprocessing.forkserver
+import os
+from configManager import ConfigManager
+
+ENV_PRELOAD = "TEACHRL_PRELOAD" # JSON {"params": ..., "layouts": [...]} read by the fork server
+
+
+def preload(params, layouts):
+    """Import the modules used by the workers and fill the per-process layout caches."""
+    import training
+    import tabular
+    import dp_solver
+
+    if params.get(ConfigManager.ENGINE, tabular.ENGINE_MINIGRID) == tabular.ENGINE_TABULAR:
+        for layout in layouts:
+            tabular.compile_layout(params, layout)
+    else:
+        import environment # MiniGrid, gymnasium and pygame
+
+    if params.get(ConfigManager.STUDENT_Q_INIT, "zeros") == "optimal":
+        for layout in layouts: # Training keeps a student Q-table for the trained layouts only
+            dp_solver.solve_layout(params, layout)
+
+
+def pool_context(params, layouts):
+    """Multiprocessing context of the sweep (start_method), preloaded if preload is set."""
+    ctx = multiprocessing.get_context(params.get(ConfigManager.START_METHOD))
+    if params.get(ConfigManager.PRELOAD, False):
+        if ctx.get_start_method() == "forkserver":
+            # The fork server keeps what it imported at start-up: start it now, with the payload in its
+            # environment only (later child processes must not preload). It runs with "python -c" and
+            # does not get sys.path from the parent: pass this directory via PYTHONPATH, otherwise the
+            # preload import fails silently and every worker preloads again
+            here = os.path.dirname(os.path.abspath(__file__))
+            saved = {k: os.environ.get(k) for k in ("PYTHONPATH", ENV_PRELOAD)}
+            python_path = saved["PYTHONPATH"] or ""
+            if here not in python_path.split(os.pathsep):
+                os.environ["PYTHONPATH"] = os.pathsep.join(p for p in (here, python_path) if p)
+            os.environ[ENV_PRELOAD] = json.dumps({"params": params, "layouts": list(layouts)})
+            ctx.set_forkserver_preload([__name__])
+            try:
+                multiprocessing.forkserver.ensure_running()
+            finally:
+                for k, v in saved.items():
+                    if v is None:
+                        os.environ.pop(k, None)
+                    else:
+                        os.environ[k] = v
+        else:
+            preload(params, layouts)
+    return ctx
+
+
+# Imported by the fork server (set_forkserver_preload): preload there, once for all the workers
+_payload = os.environ.pop(ENV_PRELOAD, None) # not inherited by the workers forked from it
+if _payload:
+    try:
+        preload(**json.loads(_payload))
+    except Exception as e: # a failed preload only costs start-up time
+        print(f"Preload failed: {e!r}")
@@ -0,0 +1,198 @@
+"""
+Per-worker profiling of training runs and merged reports.
+
+Each Pool worker runs its seed under a profiler (profile_worker) and saves the
+profile under simulations/<name>/profiles/. The parent then merges all the
+profiles (merge_profiles) into a ranked report (report.txt) and a collapsed
+stack file (profile.collapsed, one "frame;frame;... count" line per stack, the
+input format of flamegraph.pl / speedscope).
+
+Two profilers are available (profiler config key):
+  - cprofile: deterministic, exact call counts and times, .prof files (pstats)
+  - sampling: samples the worker stack every profiler_interval seconds, .collapsed files
+"""
+import cProfile
+import collections
+import glob
+import os
+import pstats
+import signal
+import sys
+import threading
+
+CPROFILE = "cprofile"
+SAMPLING = "sampling"
+DEFAULT_INTERVAL = 0.005 # seconds between two stack samples
+
+REPORT_FILE = "report.txt"
+COLLAPSED_FILE = "profile.collapsed"
+REPORT_TOP = 40 # functions listed in the ranked report
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+
+    """Samples the stack of the calling thread every interval seconds of CPU time.
+
+    Uses a SIGPROF interval timer where available (POSIX), so that no extra thread
+    competes for the GIL; otherwise falls back to a background sampling thread.
+    Must be started from the main thread of the process (as in a Pool worker).
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+
+        self.interval = interval
+        self.samples = collections.Counter() # collapsed stack -> number of samples
+        self._use_signal = hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._use_signal:
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self._target = threading.get_ident()
+            self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._use_signal:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler)
+        else:
+            self._stop.set()
+            self._thread.join()
+
+    def _record(self, frame):
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            self.samples[";".join(reversed(stack))] += 1
+
+    def _on_signal(self, signum, frame):
+        self._record(frame)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._record(sys._current_frames().get(self._target))
+
+
+def profile_worker(fn, seed, profile_dir=None, mode=CPROFILE, interval=DEFAULT_INTERVAL):
+    """Run fn(seed) under the profiler and save the profile as profiles/seed_<seed>.(prof|collapsed)."""
+    if mode == CPROFILE:
+        profile = cProfile.Profile()
+        result = profile.runcall(fn, seed)
+        profile.dump_stats(os.path.join(profile_dir, f"seed_{seed}.prof"))
+    elif mode == SAMPLING:
+        profile = SamplingProfiler(interval)
+        profile.start()
+        try:
+            result = fn(seed)
+        finally:
+            profile.stop()
+        write_collapsed(profile.samples, os.path.join(profile_dir, f"seed_{seed}.collapsed"))
+    else:
+        raise ValueError(f"Unknown profiler: {mode}")
+    return result
+
+
+def write_collapsed(samples, path):
+    with open(path, "w") as f:
+        for stack, count in sorted(samples.items(), key=lambda kv: -kv[1]):
+            f.write(f"{stack} {count}\n")
+
+
+def read_collapsed(path):
+    samples = collections.Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                samples[stack] += int(count)
+    return samples
+
+
+def _collapsed_from_pstats(stats, min_fraction=1e-4, max_depth=64):
+    """Approximate collapsed stacks (in microseconds) from the cProfile call graph.
+
+    cProfile only records caller -> callee edges: the self time of each function
+    is split over its callers in proportion to the number of calls.
+    """
+    entries = stats.stats # func -> (cc, nc, tt, ct, callers)
+    names = {func: f"{func[2]} ({os.path.basename(func[0])}:{func[1]})" for func in entries}
+    samples = collections.Counter()
+
+    def paths(func, fraction, path, depth):
+        callers = {c: v for c, v in entries[func][4].items() if c in entries and c not in path}
+        calls = sum(v[1] if isinstance(v, tuple) else v for v in callers.values())
+        if not callers or calls == 0 or depth >= max_depth:
+            yield [names[func]], fraction
+            return
+        for caller, v in callers.items():
+            share = fraction * (v[1] if isinstance(v, tuple) else v) / calls
+            if share < min_fraction:
+                continue
+            for stack, f in paths(caller, share, path | {caller}, depth + 1):
+                yield stack + [names[func]], f
+
+    for func, (cc, nc, tt, ct, callers) in entries.items():
+        if tt <= 0:
+            continue
+        for stack, fraction in paths(func, 1.0, {func}, 0):
+            samples[";".join(stack)] += int(round(1e6 * tt * fraction))
+    return +samples # drop zero counts
+
+
+def _ranked_from_collapsed(samples, top=REPORT_TOP):
+    """Self and inclusive sample counts per frame."""
+    self_counts = collections.Counter()
+    total_counts = collections.Counter()
+    for stack, count in samples.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    total = sum(samples.values()) or 1
+    lines = [f"{'self %':>8} {'total %':>8} {'self':>10}  function", "-" * 70]
+    for frame, count in self_counts.most_common(top):
+        lines.append(f"{100 * count / total:8.2f} {100 * total_counts[frame] / total:8.2f} {count:10d}  {frame}")
+    return "\n".join(lines) + "\n"
+
+
+def merge_profiles(profile_dir, mode=CPROFILE, top=REPORT_TOP):
+    """Merge all the worker profiles of profile_dir into report.txt and profile.collapsed."""
+    if mode == CPROFILE:
+        files = sorted(glob.glob(os.path.join(profile_dir, "seed_*.prof")))
+        if not files:
+            return None
+        with open(os.path.join(profile_dir, REPORT_FILE), "w") as f:
+            stats = pstats.Stats(*files, stream=f)
+            samples = _collapsed_from_pstats(stats)
+
+            f.write(f"Merged cProfile of {len(files)} workers\n\n")
+            f.write("Sorted by internal time\n")
+            stats.sort_stats("tottime").print_stats(top)
+            f.write("Sorted by cumulative time\n")
+            stats.sort_stats("cumulative").print_stats(top)
+    elif mode == SAMPLING:
+        files = sorted(glob.glob(os.path.join(profile_dir, "seed_*.collapsed")))
+        if not files:
+            return None
+        samples = collections.Counter()
+        for path in files:
+            samples.update(read_collapsed(path))
+
+        with open(os.path.join(profile_dir, REPORT_FILE), "w") as f:
+            f.write(f"Merged sampling profile of {len(files)} workers, {sum(samples.values())} samples\n\n")
+            f.write(_ranked_from_collapsed(samples, top))
+    else:
+        raise ValueError(f"Unknown profiler: {mode}")
+
+    write_collapsed(samples, os.path.join(profile_dir, COLLAPSED_FILE))
+    return os.path.join(profile_dir, REPORT_FILE)
@@ -0,0 +1,251 @@
+"""
+Episode-addressable replay of a training run, from periodic snapshots of its state.
+
+With snapshot_every: n, Training.run_training saves, at the start of every n-th
+episode of each seed (and of the first episode after the ones padded by early
+stopping), all that the following episodes depend on: the state of np.random,
+the student Q-tables of every layout, the teacher Q-values, the estimated model
+of the human preferences and the competence of the last utils.WINDOW_SIZE
+episodes (exploration rate). Every
+snapshot_full_every-th snapshot stores the Q-tables in full, the others only
+the entries changed since that full snapshot, so the files grow with the
+snapshots and not with the steps. Files of a seed, in <snapshot_dir>:
+  seed_<seed>.snap   the snapshots (np.savez_compressed), back to back
+  seed_<seed>.sidx   one SNAPSHOT_DTYPE row per snapshot
+  seed_<seed>.seg    one SEGMENT_DTYPE row per run_training call (layout, simulated episodes)
+  seed_<seed>.yaml   the params of the seed
+
+replay_episode re-simulates from the nearest snapshot at or before an episode,
+switching layout as the run_training calls did, and returns its steps (trajectories.RECORD_DTYPE), exactly as they were trained,
+e.g. to look at the first success or at a drop of competence:
+
+    python replay.py simulations/<name_of_sim>/snapshots/seed_0 --episode 1200
+
+Dyna planning is not supported (its model is not snapshotted). Episodes padded
+by early stopping were never simulated and cannot be replayed.
+"""
+import argparse
+import io
+import os
+import tempfile
+import numpy as np
+import yaml
+from configManager import ConfigManager
+from greedy import GreedyIndex
+from human import Human
+from tabular import make_environment
+from trajectories import read_trajectories
+import utils
+
+SNAPSHOT_SUFFIX = ".snap"
+INDEX_SUFFIX = ".sidx"
+SEGMENT_SUFFIX = ".seg"
+PARAMS_SUFFIX = ".yaml"
+
+DEFAULT_FULL_EVERY = 10
+
+# One snapshot: first episode it precedes, bytes in the .snap file, row of the full snapshot its Q-table deltas refer to
+SNAPSHOT_DTYPE = np.dtype([("episode", "<i8"), ("layout", "S16"), ("offset", "<i8"), ("nbytes", "<i8"), ("base", "<i8")])
+
+# One run_training call: first episode, layout, episodes actually simulated (not padded by early stopping)
+SEGMENT_DTYPE = np.dtype([("episode", "<i8"), ("layout", "S16"), ("episodes", "<i8")])
+
+
+class SnapshotWriter:
+
+    """Per-seed writer of the snapshots of a Training, to path.snap / .sidx / .seg (overwritten by a new run)."""
+
+    def __init__(self, path, every, full_every=DEFAULT_FULL_EVERY):
+
+        self.path = path
+        self.every = every
+        self.full_every = full_every
+        self.nr_of_snapshots = 0
+        self.base = None      # row of the last full snapshot
+        self.base_q = None    # its Q-tables (copies)
+        self.segment = None   # [first episode, layout, episodes] of the current run_training call
+        self.next_episode = 0 # episode after the last simulated one
+        self._files = None
+        self._offset = 0
+
+    def begin_segment(self, trainer):
+        """Start a run_training call of trainer (files opened, the params stored by the first call)."""
+        if self._files is None:
+            mode = "ab" if self.nr_of_snapshots else "wb"
+            if mode == "wb":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                ConfigManager.store_params(trainer.cfg, os.path.dirname(self.path) or ".", os.path.basename(self.path) + PARAMS_SUFFIX)
+            self._files = tuple(open(self.path + suffix, mode) for suffix in (SNAPSHOT_SUFFIX, INDEX_SUFFIX, SEGMENT_SUFFIX))
+        self.segment = [None, trainer.cfg[ConfigManager.LAYOUT_V], 0]
+
+    def begin_episode(self, trainer):
+        """Called at the start of every episode, before any draw: snapshot every n-th episode and after padded ones."""
+        episode = len(trainer.student_competence)
+        if self.segment[2] == 0:
+            self.segment[0] = episode
+        if episode % self.every == 0 or episode != self.next_episode:
+            self._write(episode, trainer)
+        self.segment[2] += 1
+        self.next_episode = episode + 1
+
+    def end_segment(self):
+        """Append the row of the run_training call just finished (nothing if it ran no episode)."""
+        if self.segment is not None and self.segment[2] > 0:
+            episode, layout, episodes = self.segment
+            self._files[2].write(np.array([(episode, str(layout).encode()[:16], episodes)], dtype=SEGMENT_DTYPE).tobytes())
+        self.segment = None
+
+    def _write(self, episode, trainer):
+        arrays = capture(trainer)
+        full = self.nr_of_snapshots % self.full_every == 0
+        if full:
+            self.base = self.nr_of_snapshots
+            self.base_q = {k: q.copy() for k, q in trainer.student_QTable_Dict.items()}
+        for i, (k, q) in enumerate(trainer.student_QTable_Dict.items()):
+            arrays[f"layout_{i}"] = np.array(str(k))
+            if full:
+                arrays[f"q_{i}"] = q
+            else: # entries changed since the full snapshot
+                changed = np.flatnonzero(q != self.base_q[k])
+                arrays[f"dq_index_{i}"] = changed.astype(np.int32)
+                arrays[f"dq_value_{i}"] = q.ravel()[changed]
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        data = buffer.getvalue()
+        self._files[0].write(data)
+        row = (episode, str(trainer.cfg[ConfigManager.LAYOUT_V]).encode()[:16], self._offset, len(data), self.base)
+        self._files[1].write(np.array([row], dtype=SNAPSHOT_DTYPE).tobytes())
+        self._offset += len(data)
+        self.nr_of_snapshots += 1
+
+    def close(self):
+        """Flush and close the files (reopened in append mode by the next run_training call)."""
+        if self._files is not None:
+            for f in self._files:
+                f.close()
+            self._files = None
+
+
+def capture(trainer):
+    """State of trainer at the start of an episode, except the Q-tables (arrays for np.savez)."""
+    _, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    actions = list(trainer.teacher_Q_Values) # in order: the teacher selection draws over this order
+    return {"rng_keys": keys, "rng_pos": np.array([pos, has_gauss]), "rng_gauss": np.array(cached_gaussian),
+            "teacher_actions": np.array(actions), "teacher_q": np.array([trainer.teacher_Q_Values[a] for a in actions]),
+            "preference_model": trainer.env.estimated_model_of_human_colors,
+            "competence": np.asarray(trainer.student_competence[-utils.WINDOW_SIZE:], dtype=np.int8)}
+
+
+def restore(trainer, episode, state):
+    """Put trainer back in the state captured at the start of episode (Q-tables included, see Snapshots.load)."""
+    for k, q in state["q"].items():
+        trainer.student_QTable_Dict[k][:] = q
+        trainer.greedy_Dict[k] = GreedyIndex(trainer.student_QTable_Dict[k])
+    trainer.teacher_Q_Values = {a.item(): float(v) for a, v in zip(state["teacher_actions"], state["teacher_q"])}
+    trainer.env.estimated_model_of_human_colors[:] = state["preference_model"]
+    # Only the last episodes matter (exploration rate): the earlier ones keep the episode numbers
+    competence = state["competence"].tolist()
+    trainer.student_competence = [0] * (episode - len(competence)) + competence
+    pos, has_gauss = state["rng_pos"]
+    np.random.set_state(("MT19937", state["rng_keys"], int(pos), int(has_gauss), float(state["rng_gauss"])))
+
+
+class Snapshots:
+
+    """Snapshots of one seed (path without suffix, e.g. <snapshot_dir>/seed_0)."""
+
+    def __init__(self, path):
+
+        self.path = path
+        self.index = np.fromfile(path + INDEX_SUFFIX, dtype=SNAPSHOT_DTYPE)
+        self.segments = np.fromfile(path + SEGMENT_SUFFIX, dtype=SEGMENT_DTYPE)
+        with open(path + PARAMS_SUFFIX) as f:
+            self.params = yaml.safe_load(f)
+
+    def __len__(self):
+        return len(self.index)
+
+    def segment(self, episode):
+        """Row of the run_training call that simulated episode."""
+        rows = np.flatnonzero((self.segments["episode"] <= episode) & (episode < self.segments["episode"] + self.segments["episodes"]))
+        if rows.size == 0:
+            raise KeyError(f"Episode {episode} was not simulated in {self.path} (padded by early stopping, or beyond the run)")
+        return self.segments[rows[-1]]
+
+    def nearest(self, episode):
+        """Row of the last snapshot at or before episode (no padded episodes in between: there is one after each)."""
+        self.segment(episode)
+        return np.flatnonzero(self.index["episode"] <= episode)[-1]
+
+    def _arrays(self, row):
+        entry = self.index[row]
+        with open(self.path + SNAPSHOT_SUFFIX, "rb") as f:
+            f.seek(entry["offset"])
+            data = f.read(entry["nbytes"])
+        return dict(np.load(io.BytesIO(data)))
+
+    def load(self, row):
+        """State of snapshot row, with the Q-tables ({layout: array}) rebuilt from its full snapshot."""
+        state = self._arrays(row)
+        base = self._arrays(self.index[row]["base"])
+        state["q"] = {}
+        i = 0
+        while f"layout_{i}" in state:
+            q = base[f"q_{i}"].copy()
+            if f"dq_index_{i}" in state:
+                q.ravel()[state[f"dq_index_{i}"]] = state[f"dq_value_{i}"]
+            state["q"][str(state[f"layout_{i}"])] = q
+            i += 1
+        return state
+
+
+def replay_episode(path, episode):
+    """Steps of episode of the seed of path (trajectories.RECORD_DTYPE), re-simulated from the nearest snapshot."""
+    snapshots = Snapshots(path)
+    row = snapshots.nearest(episode)
+    start = int(snapshots.index[row]["episode"])
+    segments = snapshots.segments[(snapshots.segments["episode"] + snapshots.segments["episodes"] > start)
+                                  & (snapshots.segments["episode"] <= episode)]
+
+    # Same training, without the instrumentation; every replayed episode is recorded in a temporary directory
+    params = dict(snapshots.params)
+    params.update({ConfigManager.LAYOUT_V: snapshots.index[row]["layout"].decode(), ConfigManager.STUDENT_Q_INIT: "zeros",
+                   ConfigManager.SNAPSHOT_EVERY: None, ConfigManager.EARLY_STOPPING: None, ConfigManager.VISITATION: False,
+                   ConfigManager.PHASE_TIMING: False, ConfigManager.RECORD_TRAJECTORIES: 1, ConfigManager.TRAJECTORY_CAPACITY: None})
+    with tempfile.TemporaryDirectory() as tmp:
+        params[ConfigManager.TRAJECTORY_DIR] = tmp
+        from training import Training # training imports this module
+        state = snapshots.load(row)
+        env = make_environment(params)
+        trainer = Training(params, env, Human(params), list(state["q"]))
+        restore(trainer, start, state)
+        for first, layout, episodes in segments: # the run_training calls from start to episode
+            params[ConfigManager.LAYOUT_V] = layout.decode()
+            env.set_layout(layout.decode())
+            trainer.run_training(min(first + episodes, episode + 1) - max(first, start), close=False)
+        trainer.close()
+        return np.array(read_trajectories(os.path.join(tmp, f"seed_{params[ConfigManager.SEED]}")).episode(episode))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Snapshots of a seed, and replay of any of its episodes")
+    parser.add_argument("path", help="<snapshot_dir>/seed_<seed> (without suffix)")
+    parser.add_argument("--episode", type=int, default=None, help="replay this episode and print its steps")
+    parser.add_argument("--save", default=None, help="save the steps of the replayed episode to this .npy file")
+    args = parser.parse_args()
+
+    snapshots = Snapshots(args.path)
+    if args.episode is None:
+        print(f"{len(snapshots)} snapshots ({os.path.getsize(args.path + SNAPSHOT_SUFFIX) / 1024:.1f} KB), "
+              f"{len(snapshots.segments)} run_training calls")
+        for segment in snapshots.segments:
+            print(f"episodes {segment['episode']:>7} - {segment['episode'] + segment['episodes'] - 1:>7} {segment['layout'].decode():>12}")
+    else:
+        steps = replay_episode(args.path, args.episode)
+        print(f"Episode {args.episode}: {len(steps)} steps, reward {steps['reward'].sum():.2f}")
+        for step in steps:
+            print(step)
+        if args.save:
+            np.save(args.save, steps)
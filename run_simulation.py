@@ -1,33 +1,57 @@
+import argparse
+import contextlib
 import multiprocessing
+import os
+import queue
+import traceback
+import yaml
 import numpy as np
 from functools import partial
-from training import Training
-from environment import MyEnvironment
-from human import Human
+from training import Training, TrainingResult, PopulationTraining
+from tabular import make_environment, ENGINE_TABULAR
+from human import Human, HumanPopulation
 import utils
 from configManager import ConfigManager
+from output_writer import OutputWriter
+import dp_solver
+import profiler
+import memory
+import telemetry
+import preload
+import shared_layouts
+import visitation
+import convergence
+import curriculum
+from curriculum import CurriculumScheduler
+import cluster
 
+ENVIRONMENTS = ["v1","v2","v3","v4"]
 
-def run_training_over_multiple_envs(seed, environments=None, params=None):
 
-    leverage_nr_of_ep_for_learning_policy = 7000
-    nr_of_ep_for_env_change = 1000
+def run_training_over_multiple_envs(seed, environments=None, params=None):
+    """Train one student over the layouts, in the blocks chosen by the curriculum of params (one environment, switched in place)."""
     
-    n = leverage_nr_of_ep_for_learning_policy // nr_of_ep_for_env_change
+    params[ConfigManager.SEED] = seed
+    scheduler = CurriculumScheduler.from_config(params, environments)
     
-    env = MyEnvironment(params)
+    env = make_environment(params)
     human = Human(params)
-    trainer = Training(params, env, human)
-
-    for i in range(1,n+1):
-        for j in range(len(environments)):
-            params[ConfigManager.LAYOUT_V] = environments[j]
-            env.rebuild_env(env.width,env.height)
-            trainer.set_environment(env)
-            trainer.run_training()
-            
-            print(f"Completed training with environment {environments[j]}")
-            
+    trainer = Training(params, env, human, environments)
+    if scheduler.policy == curriculum.INTERLEAVED and trainer.convergence is not None:
+        print("Early stopping is off with the interleaved curriculum (its window is measured within one block)")
+        trainer.convergence = None
+
+    for layout, episodes in scheduler:
+        params[ConfigManager.LAYOUT_V] = layout
+        env.set_layout(layout)
+        trainer.run_training(episodes, close=False) # output files and timer block stay open across the blocks
+        scheduler.record(layout, trainer.student_competence[-episodes:])
+        
+        if episodes > 1:
+            print(f"Completed training with environment {layout} (competence {scheduler.competence(layout):.2f})")
+    
+    trainer.close()
+    trainer.curriculum = scheduler.blocks
     return trainer
 
 
@@ -46,7 +70,7 @@ def run_training_with_seed(seed, params=None):
         print(f"Starting training with seed {seed}")
             
         #env = MyEnvironment(params)
-        env = MyEnvironment(params)
+        env = make_environment(params)
         human = Human(params)
         
         # Create training instance with the current seed
@@ -58,69 +82,336 @@ def run_training_with_seed(seed, params=None):
         print(f"Completed training with seed {seed}")
         
     return trainer
-            
-if __name__ == "__main__":
-            
-    params = ConfigManager.load_config("config.yaml")
-    ConfigManager().printALL(params)
+
+
+def run_population_with_seed(seed, params=None):
+    """Train against all the teachers of the human_population config key in this process (single_env)."""
+    params[ConfigManager.SEED] = seed
     
-    output_dir = utils.create_output_directories_tree(params[ConfigManager.NAME_OF_SIM])
-    ConfigManager.store_config("config.yaml",output_dir)
+    print(f"Starting population training with seed {seed}")
     
-    environments = ["v1","v2","v3","v4"]
+    trainer = PopulationTraining(params, HumanPopulation.from_config(params))
+    trainer.run_training()
     
-    # Determine the number of processes to use (use cpu_count or limit to a reasonable number)
-    cpu_count = multiprocessing.cpu_count()
-    num_processes = min(cpu_count, params[ConfigManager.NR_OF_SEEDS], multiprocessing.cpu_count())  # Limit to 8 processes max to avoid overwhelming the system
-    print(f"----- Starting {params[ConfigManager.NR_OF_SEEDS]} (n of seeds) training sessions with multiprocessing ({num_processes}/{cpu_count} cores available) -----")
+    print(f"Completed population training with seed {seed}")
     
+    return trainer
+
+
+def init_worker(progress_queue=None, progress_interval=telemetry.DEFAULT_INTERVAL, layouts_manifest=None):
+    """Pool initializer: progress queue of the parent and, if shared, the read-only layout tables."""
+    telemetry.init_worker(progress_queue, progress_interval)
+    if layouts_manifest is not None:
+        shared_layouts.attach(layouts_manifest)
+
+
+def collect_result(fn, seed, layouts=None):
+    """Pool task: run fn(seed) and return the compact TrainingResult of the trained layouts."""
+    telemetry.start_seed(seed)
+    try:
+        trainer = fn(seed)
+    finally:
+        telemetry.finish_seed()
+    return TrainingResult(trainer, seed, layouts, peak_rss_mb=memory.peak_rss_mb(), worker=memory.worker_id())
+
+
+def seed_task(params, environments=ENVIRONMENTS):
+    """Picklable fn(seed) -> TrainingResult for the sim_mode of params: what a worker runs for one seed."""
     mode = params[ConfigManager.SIM_MODE]
+    if params.get(ConfigManager.HUMAN_POPULATION):
+        if mode != "single_env":
+            raise ValueError("human_population is supported in single_env mode only")
+        fn, layouts = partial(run_population_with_seed, params=params), [params[ConfigManager.LAYOUT_V]]
+    elif mode == "single_env":
+        fn, layouts = partial(run_training_with_seed, params=params), [params[ConfigManager.LAYOUT_V]]
+    elif mode == "multiple_env":
+        fn, layouts = partial(run_training_over_multiple_envs, environments=environments, params=params), list(environments)
+    else:
+        raise ValueError(f"Unknown sim_mode: {mode}")
     
-    # Create a pool of workers
-    with multiprocessing.Pool(processes=num_processes) as pool:
-        
-        if mode == "single_env":
-            map_fn = partial(run_training_with_seed, params=params)
-        elif mode == "multiple_env":
-            map_fn = partial(run_training_over_multiple_envs, environments=environments, params=params)
-        
-        # Map the seeds to the training function
-        trainers = pool.map(map_fn, range(params[ConfigManager.NR_OF_SEEDS]))
-    
-    print("All training sessions completed successfully!")
-    
-    # Initialize empty 2Darrays for collecting data from all trainers
-    all_s_competence = []
-    all_c_reward_s = []
-    all_eps_s_hist = []
-    all_t_actions = []
-    all_c_reward_t = []
-    
-    # Collect data from all trainers
-    for trainer in trainers:
-        all_s_competence.append(trainer.student_competence)
-        all_c_reward_s.append(trainer.cumulative_reward_s_trend)
-        all_t_actions.append(trainer.cumulative_teacher_actions)
-        all_c_reward_t.append(trainer.cumulative_reward_teacher)
+    # Workers send back the compact result only, not the whole Training
+    return partial(collect_result, fn, layouts=layouts)
+
+
+def episodes_per_seed(params, environments=ENVIRONMENTS):
+    """Number of training episodes of one seed (length of the per-episode metrics)."""
+    if params[ConfigManager.SIM_MODE] == "single_env":
+        return params[ConfigManager.N_EPISODES_SINGLE_ENV]
+    return curriculum.budget(params, environments)
+
+
+def run_sweep(params, output_dir, num_processes, environments=ENVIRONMENTS):
+    """Train all the seeds on a Pool of num_processes workers, then write Q-tables, plots and statistics to output_dir.
+    
+    With cluster_address set, the seeds run on the workers connected to a cluster.Coordinator instead (num_processes unused).
+    Returns the SeedAggregator holding the means over the seeds.
+    """
+    
+    mode = params[ConfigManager.SIM_MODE]
+    layouts = [params[ConfigManager.LAYOUT_V]] if mode == "single_env" else list(environments)
+    population = bool(params.get(ConfigManager.HUMAN_POPULATION))
+    
+    # Trajectories and replay snapshots of the workers go to the output directory (unless trajectory_dir / snapshot_dir is set;
+    # cluster workers send them back to the coordinator)
+    if params.get(ConfigManager.RECORD_TRAJECTORIES) and not params.get(ConfigManager.TRAJECTORY_DIR):
+        params[ConfigManager.TRAJECTORY_DIR] = os.path.join(output_dir, "trajectories")
+    if params.get(ConfigManager.SNAPSHOT_EVERY) and not params.get(ConfigManager.SNAPSHOT_DIR):
+        params[ConfigManager.SNAPSHOT_DIR] = os.path.join(output_dir, "snapshots")
+    
+    # Optional memory ceiling: fewer concurrent workers and/or streaming aggregation
+    num_processes, streaming = memory.plan_memory_budget(params, num_processes, episodes_per_seed(params, environments), len(layouts))
+    aggregator = memory.SeedAggregator(streaming)
+    
+    # Start method of the workers, with the modules and layouts optionally preloaded once
+    ctx = preload.pool_context(params, layouts)
+    
+    cluster_address = params.get(ConfigManager.CLUSTER_ADDRESS)
+    
+    # Live progress: workers publish rate-limited events, the parent prints the aggregate view and logs it to statistics/
+    progress_queue, monitor = None, contextlib.nullcontext()
+    if params.get(ConfigManager.PROGRESS, True):
+        # Remote workers send their events over the cluster connections: a thread queue is enough
+        progress_queue = queue.Queue(maxsize=10000) if cluster_address else ctx.Queue(maxsize=10000)
+        monitor = telemetry.ProgressMonitor(progress_queue, params[ConfigManager.NR_OF_SEEDS], episodes_per_seed(params, environments),
+                                            os.path.join(output_dir, "statistics", telemetry.PROGRESS_FILE),
+                                            refresh=params.get(ConfigManager.PROGRESS_REFRESH, telemetry.DEFAULT_REFRESH))
+    
+    # Layout tables compiled once by the parent and shared read-only by the workers (tabular engine)
+    shared, layouts_manifest = contextlib.nullcontext(), None
+    if params.get(ConfigManager.SHARED_LAYOUTS, False) and params.get(ConfigManager.ENGINE) == ENGINE_TABULAR and not cluster_address:
+        shared = shared_layouts.SharedLayouts(params, sorted(layouts))
+        layouts_manifest = shared.manifest
+        print(f"Sharing {len(layouts)} compiled layout(s) with the workers ({shared.nbytes / 1024:.1f} KB)")
+    
+    # Background writer: Q-tables of finished seeds are written while the other seeds are still training
+    with OutputWriter() as writer:
+    
+        # Create a pool of workers (or a coordinator serving the workers of several hosts)
+        if cluster_address:
+            executor = cluster.Coordinator(cluster.parse_address(cluster_address), cluster.get_authkey(),
+                                           max_retries=params.get(ConfigManager.CLUSTER_MAX_RETRIES, cluster.MAX_RETRIES),
+                                           heartbeat_timeout=params.get(ConfigManager.CLUSTER_HEARTBEAT_TIMEOUT, cluster.HEARTBEAT_TIMEOUT),
+                                           progress_queue=progress_queue,
+                                           local_workers=params.get(ConfigManager.CLUSTER_LOCAL_WORKERS, 0),
+                                           idle_timeout=params.get(ConfigManager.CLUSTER_IDLE_TIMEOUT, cluster.IDLE_TIMEOUT))
+        else:
+            executor = ctx.Pool(processes=num_processes, initializer=init_worker,
+                                initargs=(progress_queue, params.get(ConfigManager.PROGRESS_INTERVAL, telemetry.DEFAULT_INTERVAL),
+                                          layouts_manifest))
         
-    if True:
-        # Convert lists to numpy arrays and calculate MEAN over nr of seeds
-        s_competence_mean_over_seeds = np.mean(np.array(all_s_competence), axis=0)
-        c_reward_s_mean_over_seeds = np.mean(np.array(all_c_reward_s), axis=0)
-        t_actions_history_mean_over_seeds = np.mean(np.array(all_t_actions), axis=0)
-        c_reward_t_mean_over_seeds = np.mean(np.array(all_c_reward_t), axis=0)    
+        with shared, monitor, executor:
+            
+            map_fn = seed_task(params, environments)
                 
-        weights = np.ones(utils.WINDOW_SIZE) / utils.WINDOW_SIZE
-        
-        s_competence_ma = np.convolve(s_competence_mean_over_seeds, weights, mode='valid') 
-        c_reward_s_ma   = np.convolve(c_reward_s_mean_over_seeds, weights, mode='valid') 
-        teach_act_ma    = np.convolve(t_actions_history_mean_over_seeds, weights, mode='valid') 
-        reward_tea_ma   = np.convolve(c_reward_t_mean_over_seeds, weights, mode='valid') 
+            # Optional per-worker profiling, saved under <output_dir>/profiles (local workers only)
+            profiler_mode = params.get(ConfigManager.PROFILER) if not cluster_address else None
+            if profiler_mode:
+                profile_dir = os.path.join(output_dir, "profiles")
+                os.makedirs(profile_dir, exist_ok=True)
+                map_fn = partial(profiler.profile_worker, map_fn, profile_dir=profile_dir, mode=profiler_mode,
+                                 interval=params.get(ConfigManager.PROFILER_INTERVAL, profiler.DEFAULT_INTERVAL))
+            
+            seeds = range(params[ConfigManager.NR_OF_SEEDS])
+            if cluster_address:
+                results = executor.imap(params, seeds, environments)
+            else:
+                results = executor.imap(map_fn, seeds)
+            
+            # Results are consumed as soon as they are ready, in seed order
+            for seed, result in enumerate(results):
+                if population:
+                    QTables = result.student_QTable_Dict[params[ConfigManager.LAYOUT_V]] # one per pair, or the shared student
+                    for m, QTable in enumerate(QTables):
+                        writer.submit_qtable(QTable, output_dir, seed, f"teacher{m}" if len(QTables) > 1 else None)
+                elif mode == "single_env":
+                    writer.submit_qtable(result.student_QTable_Dict[params[ConfigManager.LAYOUT_V]], output_dir, seed)
+                else:
+                    for layout in environments:
+                        writer.submit_qtable(result.student_QTable_Dict[layout], output_dir, seed, layout)
+                aggregator.add(result)
+                del result
         
-        print(f"Plotting results and saving to {output_dir}...")
+        print("All training sessions completed successfully!")
         
-        utils.analyze_data(s_competence_ma,output_dir,f"Student Competence",nr_seeds=params[ConfigManager.NR_OF_SEEDS])
-        utils.analyze_data(c_reward_s_ma,output_dir,f"Student Reward",nr_seeds=params[ConfigManager.NR_OF_SEEDS])
-        utils.analyze_data(teach_act_ma,output_dir,f"Teacher Decisions",nr_seeds=params[ConfigManager.NR_OF_SEEDS])
-        utils.analyze_data(reward_tea_ma,output_dir,f"Teacher Reward",nr_seeds=params[ConfigManager.NR_OF_SEEDS])
+        if profiler_mode:
+            writer.submit(profiler.merge_profiles, profile_dir, profiler_mode)
+            
+        if True:
+            # MEAN over nr of seeds
+            s_competence_mean_over_seeds = aggregator.mean("student_competence")
+            c_reward_s_mean_over_seeds = aggregator.mean("cumulative_reward_s_trend")
+            t_actions_history_mean_over_seeds = aggregator.mean("cumulative_teacher_actions")
+            c_reward_t_mean_over_seeds = aggregator.mean("cumulative_reward_teacher")
+                    
+            weights = np.ones(utils.WINDOW_SIZE) / utils.WINDOW_SIZE
+            
+            # Population of teachers: metrics [episodes, M], one analysis per teacher, then the mean over the teachers
+            if population:
+                metrics = {"Student Competence": s_competence_mean_over_seeds, "Student Reward": c_reward_s_mean_over_seeds,
+                           "Teacher Decisions": t_actions_history_mean_over_seeds, "Teacher Reward": c_reward_t_mean_over_seeds}
+                for m in range(s_competence_mean_over_seeds.shape[1]):
+                    for title, values in metrics.items():
+                        writer.submit_analysis(np.convolve(values[:, m], weights, mode='valid'), output_dir,
+                                               f"{title} teacher {m}", nr_seeds=params[ConfigManager.NR_OF_SEEDS])
+                s_competence_mean_over_seeds = s_competence_mean_over_seeds.mean(axis=1)
+                c_reward_s_mean_over_seeds = c_reward_s_mean_over_seeds.mean(axis=1)
+                t_actions_history_mean_over_seeds = t_actions_history_mean_over_seeds.mean(axis=1)
+                c_reward_t_mean_over_seeds = c_reward_t_mean_over_seeds.mean(axis=1)
+            
+            s_competence_ma = np.convolve(s_competence_mean_over_seeds, weights, mode='valid') 
+            c_reward_s_ma   = np.convolve(c_reward_s_mean_over_seeds, weights, mode='valid') 
+            teach_act_ma    = np.convolve(t_actions_history_mean_over_seeds, weights, mode='valid') 
+            reward_tea_ma   = np.convolve(c_reward_t_mean_over_seeds, weights, mode='valid') 
+            
+            print(f"Plotting results and saving to {output_dir}...")
+            
+            writer.submit_analysis(s_competence_ma,output_dir,f"Student Competence",nr_seeds=params[ConfigManager.NR_OF_SEEDS])
+            writer.submit_analysis(c_reward_s_ma,output_dir,f"Student Reward",nr_seeds=params[ConfigManager.NR_OF_SEEDS])
+            writer.submit_analysis(teach_act_ma,output_dir,f"Teacher Decisions",nr_seeds=params[ConfigManager.NR_OF_SEEDS])
+            writer.submit_analysis(reward_tea_ma,output_dir,f"Teacher Reward",nr_seeds=params[ConfigManager.NR_OF_SEEDS])
+            
+            # multiple_env: metrics per layout, by episode on that layout, and the curriculum of every seed
+            if mode == "multiple_env":
+                for layout in environments:
+                    for metric, title in (("student_competence", "Student Competence"), ("cumulative_reward_s_trend", "Student Reward")):
+                        values = aggregator.layout_mean(metric, layout)
+                        if values is not None and len(values) >= utils.WINDOW_SIZE:
+                            writer.submit_analysis(np.convolve(values, weights, mode='valid'), output_dir, f"{title} {layout}",
+                                                   nr_seeds=params[ConfigManager.NR_OF_SEEDS])
+                writer.submit(curriculum.store_curriculum_report, list(aggregator.curricula), output_dir)
+            
+            # State-visitation heatmaps and color visits per layout, summed over the seeds
+            if params.get(ConfigManager.VISITATION, False) and aggregator.visit_counts:
+                writer.submit(visitation.store_visitation, aggregator.visit_counts, dict(params), output_dir,
+                              params.get(ConfigManager.VISITATION_BLOCK, visitation.DEFAULT_BLOCK))
+            
+            # Where each seed converged and how many episodes were padded
+            if params.get(ConfigManager.EARLY_STOPPING):
+                writer.submit(convergence.store_stop_report, list(aggregator.stop_episodes), episodes_per_seed(params, environments), output_dir)
+            
+            # Per-phase timings of the training loop, if enabled
+            if params.get(ConfigManager.PHASE_TIMING, False):
+                writer.submit(utils.store_phase_timings, aggregator.phase_timings, output_dir)
+            
+            # Regret against the exact optimal return of the layout (one layout only in single_env mode,
+            # for the preferences of the config: not meaningful for a population of teachers)
+            if mode == "single_env" and not population:
+                regret_s_ma = dp_solver.solve_layout(params).regret(c_reward_s_ma)
+                writer.submit_analysis(regret_s_ma,output_dir,f"Student Regret",nr_seeds=params[ConfigManager.NR_OF_SEEDS])
+                
+            # Peak RSS of the parent and of each worker process
+            writer.submit(memory.store_memory_report, list(aggregator.peak_rss_mb), list(aggregator.workers), memory.peak_rss_mb(), output_dir,
+                          num_processes, streaming, params.get(ConfigManager.MEMORY_BUDGET_MB))
+                
+    return aggregator
+
+
+# Exit codes of the command line entry point
+EXIT_OK = 0
+EXIT_TRAINING_FAILED = 1   # a worker or the output writer raised
+EXIT_USAGE = 2             # bad arguments, missing or invalid config
+EXIT_OUTPUT_EXISTS = 3     # output directory exists and the policy is "fail"
+EXIT_INTERRUPTED = 130     # Ctrl-C / SIGINT
+
+# Environment variables read when the corresponding option is not given
+ENV_CONFIG = "TEACHRL_CONFIG"
+ENV_OVERRIDES = "TEACHRL_OVERRIDES"   # YAML mapping, e.g. "{nr_of_seeds: 8, engine: tabular}"
+ENV_ON_EXISTS = "TEACHRL_ON_EXISTS"
+ENV_CORES = "TEACHRL_CORES"
+ENV_BATCH = "TEACHRL_BATCH"           # 1/true/yes: same as --batch
+
+
+def parse_override(text):
+    """key=value, the value parsed as YAML (numbers, booleans, null, lists...)."""
+    key, sep, value = text.partition("=")
+    if not sep or not key.strip():
+        raise argparse.ArgumentTypeError(f"expected key=value, got {text!r}")
+    return key.strip(), yaml.safe_load(value)
+
 
+def parse_args(argv=None):
+    
+    parser = argparse.ArgumentParser(description="Train all the seeds of a simulation and write its outputs under simulations/<name_of_sim>")
+    parser.add_argument("--config", default=os.environ.get(ENV_CONFIG, "config.yaml"), help=f"config file (env {ENV_CONFIG})")
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[], metavar="KEY=VALUE",
+                        help=f"override a config key, may be repeated (env {ENV_OVERRIDES}: YAML mapping)")
+    parser.add_argument("--on-exists", choices=utils.ON_EXISTS_POLICIES, default=os.environ.get(ENV_ON_EXISTS),
+                        help=f"policy when the output directory exists (env {ENV_ON_EXISTS}; default: ask, fail with --batch)")
+    parser.add_argument("--cores", type=int, default=os.environ.get(ENV_CORES), help=f"number of worker processes (env {ENV_CORES})")
+    parser.add_argument("--batch", "-y", action="store_true", default=os.environ.get(ENV_BATCH, "").lower() in ("1", "true", "yes"),
+                        help=f"never prompt (env {ENV_BATCH})")
+    args = parser.parse_args(argv)
+    
+    if args.on_exists is None:
+        args.on_exists = utils.ON_EXISTS_FAIL if args.batch else utils.ON_EXISTS_ASK
+    elif args.on_exists not in utils.ON_EXISTS_POLICIES: # invalid value from the environment
+        parser.error(f"invalid {ENV_ON_EXISTS}: {args.on_exists}")
+    if args.batch and args.on_exists == utils.ON_EXISTS_ASK:
+        parser.error("--on-exists ask needs an interactive run")
+    
+    overrides = {}
+    if os.environ.get(ENV_OVERRIDES):
+        try:
+            overrides = yaml.safe_load(os.environ[ENV_OVERRIDES])
+        except yaml.YAMLError as e:
+            parser.error(f"invalid {ENV_OVERRIDES}: {e}")
+        if not isinstance(overrides, dict):
+            parser.error(f"{ENV_OVERRIDES} must be a YAML mapping")
+    overrides.update(dict(args.overrides)) # command line wins over the environment
+    args.overrides = overrides
+    
+    if args.cores is not None:
+        try:
+            args.cores = int(args.cores)
+        except ValueError:
+            parser.error(f"invalid {ENV_CORES}: {args.cores}")
+        if args.cores < 1:
+            parser.error("--cores must be >= 1")
+    return args
+
+
+def main(argv=None):
+    
+    args = parse_args(argv)
+    
+    try:
+        params = ConfigManager.load_config(args.config, args.overrides)
+    except (OSError, yaml.YAMLError) as e:
+        print(f"Cannot load config {args.config}: {e}")
+        return EXIT_USAGE
+    missing = [k for k in (ConfigManager.NAME_OF_SIM, ConfigManager.NR_OF_SEEDS, ConfigManager.SIM_MODE) if k not in (params or {})]
+    if missing:
+        print(f"Missing config keys in {args.config}: {', '.join(missing)}")
+        return EXIT_USAGE
+    
+    ConfigManager().printALL(params, confirm=not args.batch)
+    
+    try:
+        output_dir = utils.create_output_directories_tree(params[ConfigManager.NAME_OF_SIM], on_exists=args.on_exists)
+    except FileExistsError as e:
+        print(e)
+        return EXIT_OUTPUT_EXISTS
+    ConfigManager.store_config(args.config,output_dir)
+    ConfigManager.store_params(params, output_dir) # what evaluate.py reads back (a reused directory may hold a stale one)
+    
+    # Determine the number of processes to use (use cpu_count or limit to a reasonable number)
+    cpu_count = multiprocessing.cpu_count()
+    num_processes = min(args.cores or cpu_count, params[ConfigManager.NR_OF_SEEDS])
+    print(f"----- Starting {params[ConfigManager.NR_OF_SEEDS]} (n of seeds) training sessions with multiprocessing ({num_processes}/{cpu_count} cores available) -----")
+    
+    try:
+        run_sweep(params, output_dir, num_processes)
+    except KeyboardInterrupt:
+        print("Simulation interrupted")
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        traceback.print_exc()
+        print(f"Simulation failed: {e!r}")
+        return EXIT_TRAINING_FAILED
+    
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    
+    raise SystemExit(main())
@@ -1,7 +1,7 @@
 import multiprocessing
 import numpy as np
-import optuna
 import copy
+import os
 from functools import partial
 from typing import Dict, Any, List, Optional
 
@@ -9,6 +9,7 @@ from training import Training
 from environment import MyEnvironment
 from human import Human
 import utils
+import profiler
 from logger import setup_logging, get_logger
 from configManager import ConfigManager, ConfigConstants
 
@@ -100,7 +101,7 @@ def process_and_save_results(final_results: List[Training], params: Dict[str, An
     # Return a metric that could be used for optimization (e.g., final student competence)
     return s_competence_ma[-1] if len(s_competence_ma) > 0 else 0.0
 
-def objective(trial: optuna.Trial) -> float:
+def objective(trial: "optuna.Trial") -> float:
     
     """Optuna objective function"""
     # Suggest alpha_rew_model value from the discrete set
@@ -123,15 +124,29 @@ def objective(trial: optuna.Trial) -> float:
     
     logger.info(f"Using {num_processes} processes on {cpu_count} available CPU cores")
     
+    map_fn = partial(run_training_with_seed, params=params)
+    
+    # Optional per-worker profiling, saved under simulations/<alpha_rew_model>/profiles
+    profiler_mode = params.get(ConfigManager.PROFILER)
+    if profiler_mode:
+        profile_dir = os.path.join(os.getcwd(), "simulations", str(alpha_rew_model), "profiles")
+        os.makedirs(profile_dir, exist_ok=True)
+        map_fn = partial(profiler.profile_worker, map_fn, profile_dir=profile_dir, mode=profiler_mode,
+                         interval=params.get(ConfigManager.PROFILER_INTERVAL, profiler.DEFAULT_INTERVAL))
+    
     # Create a pool of workers
     try:
         with multiprocessing.Pool(processes=num_processes) as pool:
             # Map the seeds to the training function
-            final_results = pool.map(partial(run_training_with_seed, params=params), range(params_to_override[ConfigConstants.NR_OF_SEEDS]))
+            final_results = pool.map(map_fn, range(params_to_override[ConfigConstants.NR_OF_SEEDS]))
     except Exception as e:
         logger.error(f"Error during multiprocessing: {e}")
         raise
     
+    if profiler_mode:
+        report_path = profiler.merge_profiles(profile_dir, profiler_mode)
+        logger.info(f"Merged worker profiles: {report_path}")
+    
     logger.info(f"All training sessions completed for alpha_rew_model = {alpha_rew_model}!")
     
     # Process and save results for this alpha value and return the metric
@@ -142,6 +157,9 @@ def objective(trial: optuna.Trial) -> float:
             
             
 if __name__ == "__main__":
+    
+    import optuna # only the parent drives the study: keep optuna out of the workers
+    
     try:
         logger.info("Starting parameter sweep for alpha_rew_model values from 0.0 to 1.0 with step 0.2")
         
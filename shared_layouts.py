@@ -0,0 +1,76 @@
+"""
+Read-only layout tables shared by all the Pool workers.
+
+The parent compiles the layouts once (tabular.compile_layout) and copies their
+arrays into a single multiprocessing.shared_memory block (SharedLayouts). The
+workers attach to it in the Pool initializer (attach): from then on the
+LayoutTables returned by compile_layout in the worker are read-only views on the
+shared block, so no worker builds a MiniGrid Grid or holds its own copy.
+"""
+import numpy as np
+from multiprocessing import shared_memory
+import tabular
+
+ARRAYS = ("cell_type", "cell_color", "next_index", "reaches_goal", "index_color")
+ALIGNMENT = 64 # bytes, start of every array in the block
+
+_attached = [] # SharedMemory handles of this worker, kept open for the lifetime of the process
+
+
+class SharedLayouts:
+
+    """Owner of the shared block (parent side): create, then close() to unlink it.
+
+    manifest: picklable description of the block (name, and per tabular.layout_key
+    the start state and the offset, dtype and shape of each array), passed to attach.
+    """
+
+    def __init__(self, params, layouts):
+
+        tables = {tabular.layout_key(params, layout): tabular.compile_layout(params, layout) for layout in layouts}
+
+        # Layout of the block: every array aligned to ALIGNMENT bytes
+        entries, size = {}, 0
+        for key, t in tables.items():
+            arrays = {}
+            for name in ARRAYS:
+                a = getattr(t, name)
+                size = -(-size // ALIGNMENT) * ALIGNMENT
+                arrays[name] = (size, a.dtype.str, a.shape)
+                size += a.nbytes
+            entries[key] = {"start_pos": t.start_pos, "start_dir": t.start_dir, "arrays": arrays}
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for key, t in tables.items():
+            for name, (offset, dtype, shape) in entries[key]["arrays"].items():
+                np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offset)[...] = getattr(t, name)
+
+        self.manifest = {"name": self.shm.name, "layouts": entries}
+        self.nbytes = size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach(manifest):
+    """Worker side: replace the compiled layouts of this process with read-only views on the shared block."""
+    # Workers share the resource tracker of the parent: attaching registers the same name again (a no-op),
+    # and the parent's unlink at the end of the sweep is the only cleanup
+    shm = shared_memory.SharedMemory(name=manifest["name"])
+    _attached.append(shm)
+
+    for key, entry in manifest["layouts"].items():
+        arrays = {}
+        for name, (offset, dtype, shape) in entry["arrays"].items():
+            view = np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+            view.flags.writeable = False
+            arrays[name] = view
+        tabular._compiled_layouts[key] = tabular.LayoutTables.from_arrays(start_pos=entry["start_pos"], start_dir=entry["start_dir"], **arrays)
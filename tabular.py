@@ -0,0 +1,290 @@
+import copy
+import numpy as np
+from configManager import ConfigManager
+from human import preference_vector
+import human
+from preference_model import PreferenceModel
+
+# MiniGrid conventions (minigrid.core.actions.Actions, minigrid.core.constants.DIR_TO_VEC)
+ACTION_LEFT = 0
+ACTION_RIGHT = 1
+ACTION_FORWARD = 2
+DIR_TO_VEC = np.array([(1, 0), (0, 1), (-1, 0), (0, -1)])
+
+# Same action/direction space as MyEnvironment
+NR_OF_ROBOT_DIRECTIONS = 4 # 0: right, 1: down, 2: left, 3: up
+NR_OF_ROBOT_ACTIONS = 3    # left, right, forward
+
+# Cell types of the compiled layouts
+CELL_EMPTY = 0 # empty cell or floor (can be overlapped)
+CELL_WALL = 1  # cannot be overlapped
+CELL_GOAL = 2  # terminal cell
+
+# Color index used by the compiled layouts (-1: no color of interest)
+COLORS = human.COLORS
+NO_COLOR = -1
+
+ENGINE_MINIGRID = "minigrid"
+ENGINE_TABULAR = "tabular"
+
+
+class LayoutTables:
+
+    """Array form of a MyEnvironment layout.
+
+    States are indexed as in Training.state_to_index: (x * width + y) * 4 + dir.
+    next_index[s, a] and reaches_goal[s, a] give the deterministic MiniGrid
+    transition for each state and student action.
+    """
+
+    def __init__(self, cell_type, cell_color, start_pos, start_dir):
+
+        self.cell_type = np.asarray(cell_type, dtype=np.int8)    # [width, height]
+        self.cell_color = np.asarray(cell_color, dtype=np.int8)  # [width, height], index into COLORS
+        self.width, self.height = self.cell_type.shape
+        self.start_pos = (int(start_pos[0]), int(start_pos[1]))
+        self.start_dir = int(start_dir)
+        self.start_index = self.state_to_index(*self.start_pos, self.start_dir)
+
+        self._build_transitions()
+
+    @classmethod
+    def from_arrays(cls, cell_type, cell_color, next_index, reaches_goal, index_color, start_pos, start_dir):
+        """LayoutTables over already compiled arrays (e.g. read-only views on shared memory), without copies."""
+        tables = cls.__new__(cls)
+        tables.cell_type = cell_type
+        tables.cell_color = cell_color
+        tables.width, tables.height = cell_type.shape
+        tables.start_pos = (int(start_pos[0]), int(start_pos[1]))
+        tables.start_dir = int(start_dir)
+        tables.start_index = tables.state_to_index(*tables.start_pos, tables.start_dir)
+        tables.next_index = next_index
+        tables.reaches_goal = reaches_goal
+        tables.index_color = index_color
+        return tables
+
+    @property
+    def nr_of_states(self):
+        return self.width * self.height * NR_OF_ROBOT_DIRECTIONS
+
+    def state_to_index(self, x, y, d):
+        return (x * self.width + y) * NR_OF_ROBOT_DIRECTIONS + d
+
+    def index_to_state(self, index):
+        cell, d = divmod(int(index), NR_OF_ROBOT_DIRECTIONS)
+        x, y = divmod(cell, self.width)
+        return x, y, d
+
+    def _build_transitions(self):
+        n_dir = NR_OF_ROBOT_DIRECTIONS
+        x, y, d = np.meshgrid(np.arange(self.width), np.arange(self.height), np.arange(n_dir), indexing="ij")
+        x, y, d = x.ravel(), y.ravel(), d.ravel() # ravel order matches state_to_index
+
+        next_index = np.empty((self.nr_of_states, NR_OF_ROBOT_ACTIONS), dtype=np.int32)
+        reaches_goal = np.zeros((self.nr_of_states, NR_OF_ROBOT_ACTIONS), dtype=bool)
+
+        # Rotations never move the agent
+        next_index[:, ACTION_LEFT] = self.state_to_index(x, y, (d - 1) % n_dir)
+        next_index[:, ACTION_RIGHT] = self.state_to_index(x, y, (d + 1) % n_dir)
+
+        # Forward: move unless the front cell is a wall (or outside the grid)
+        fx = x + DIR_TO_VEC[d, 0]
+        fy = y + DIR_TO_VEC[d, 1]
+        inside = (fx >= 0) & (fx < self.width) & (fy >= 0) & (fy < self.height)
+        front_type = np.full(x.shape, CELL_WALL, dtype=np.int8)
+        front_type[inside] = self.cell_type[fx[inside], fy[inside]]
+        can_move = front_type != CELL_WALL
+        next_index[:, ACTION_FORWARD] = np.where(can_move, self.state_to_index(fx, fy, d), self.state_to_index(x, y, d))
+        reaches_goal[:, ACTION_FORWARD] = front_type == CELL_GOAL
+
+        self.next_index = next_index
+        self.reaches_goal = reaches_goal
+        self.index_color = np.repeat(self.cell_color.ravel(), n_dir) # color under the agent for each state
+
+
+def tables_from_env(env):
+    """Compile the current grid of a (reset) MyEnvironment into LayoutTables."""
+    cell_type = np.full((env.width, env.height), CELL_EMPTY, dtype=np.int8)
+    cell_color = np.full((env.width, env.height), NO_COLOR, dtype=np.int8)
+
+    for x in range(env.width):
+        for y in range(env.height):
+            obj = env.grid.get(x, y)
+            if obj is None:
+                continue
+            if obj.type == "goal":
+                cell_type[x, y] = CELL_GOAL
+            elif not obj.can_overlap():
+                cell_type[x, y] = CELL_WALL
+            if obj.color in COLORS:
+                cell_color[x, y] = COLORS.index(obj.color)
+
+    return LayoutTables(cell_type, cell_color, env.agent_start_pos, env.agent_start_dir)
+
+
+_compiled_layouts = {} # layout_key -> LayoutTables, per process
+
+def layout_key(params, layout=None):
+    """Cache key of a layout: (layout, grid_size), plus the generator parameters for the procedural family."""
+    import layout_generator
+    layout = params[ConfigManager.LAYOUT_V] if layout is None else layout
+    if layout == layout_generator.PROCEDURAL:
+        layout_params = layout_generator.layout_parameters(params.get(ConfigManager.PROCEDURAL_LAYOUT))
+        return (layout, params[ConfigManager.GRID_SIZE], layout_generator.parameters_key(layout_params))
+    return (layout, params[ConfigManager.GRID_SIZE])
+
+def compile_layout(params, layout=None):
+    """Return the LayoutTables of a layout (default: params layout_version), compiled once per process."""
+    layout = params[ConfigManager.LAYOUT_V] if layout is None else layout
+    key = layout_key(params, layout)
+
+    if key not in _compiled_layouts:
+        import layout_generator
+        if layout == layout_generator.PROCEDURAL: # generated straight as arrays, no MiniGrid
+            layout_params = layout_generator.layout_parameters(params.get(ConfigManager.PROCEDURAL_LAYOUT))
+            _compiled_layouts[key] = LayoutTables(*layout_generator.generate_layout(params[ConfigManager.GRID_SIZE], **layout_params))
+        else:
+            from environment import MyEnvironment # MiniGrid is only needed to compile the layout
+
+            env_params = copy.deepcopy(params)
+            env_params[ConfigManager.LAYOUT_V] = layout
+            env_params[ConfigManager.RENDER_MODE] = None
+            env = MyEnvironment(env_params)
+            env.reset()
+            _compiled_layouts[key] = tables_from_env(env)
+            env.close()
+
+    return _compiled_layouts[key]
+
+
+class TabularEnvironment(PreferenceModel):
+
+    """Drop-in replacement for MyEnvironment stepping over LayoutTables.
+
+    Same transitions, rewards and preference model as the MiniGrid environment,
+    but no observations and no grid regeneration on reset.
+    """
+
+    NR_OF_ROBOT_DIRECTIONS = NR_OF_ROBOT_DIRECTIONS
+    NR_OF_ROBOT_ACTIONS = NR_OF_ROBOT_ACTIONS
+
+    def __init__(self, params, tables=None):
+
+        self.cfg = params
+        self.max_steps = params[ConfigManager.MAX_STEPS]
+        self.set_tables(compile_layout(params) if tables is None else tables)
+
+        # attributi di agent (estimated model of human colors, visit counters)
+        self._init_preference_model()
+
+        self.reset()
+
+    def set_tables(self, tables):
+        self.tables = tables
+        self.width = tables.width
+        self.height = tables.height
+
+    @property
+    def agent_pos(self):
+        x, y, _ = self.tables.index_to_state(self.index)
+        return (x, y)
+
+    @property
+    def agent_dir(self):
+        return self.index % self.NR_OF_ROBOT_DIRECTIONS
+
+    def _color_under_agent(self):
+        color = int(self.tables.index_color[self.index])
+        return color if color != NO_COLOR else None
+
+    def reset(self, seed=None):
+        self.index = self.tables.start_index
+        self.step_count = 0
+        self._reset_visit_frequencies()
+
+    def rebuild_env(self, width, height):
+        self.set_tables(compile_layout(self.cfg))
+        self.reset()
+
+    def set_layout(self, layout):
+        """Switch to layout in place: its tables are compiled once per process, the preference model is kept."""
+        self.set_tables(compile_layout(self.cfg, layout))
+        self.reset()
+
+    def step(self, action, human_action=None, color=None, human_color_preferences=None):
+
+        self.step_count += 1
+
+        terminated = bool(self.tables.reaches_goal[self.index, action])
+        r_tau = 1 - 0.9 * (self.step_count / self.max_steps) if terminated else 0
+        truncated = self.step_count >= self.max_steps
+        self.index = int(self.tables.next_index[self.index, action])
+
+        r_ag = self._shape_reward(r_tau, human_action, color, human_color_preferences)
+
+        return None, r_ag, terminated, truncated, {'r_tau': r_tau}
+
+    def close(self):
+        pass
+
+
+def make_environment(params):
+    """Build the environment selected by the engine config key (default: MiniGrid)."""
+    engine = params.get(ConfigManager.ENGINE, ENGINE_MINIGRID)
+    if engine == ENGINE_TABULAR:
+        return TabularEnvironment(params)
+    elif engine == ENGINE_MINIGRID:
+        from environment import MyEnvironment
+        return MyEnvironment(params)
+    else:
+        raise ValueError(f"Unknown engine: {engine}")
+
+
+def color_reward_vector(human_preferences=None):
+    """Preference reward per color index, with a trailing 0.0 so that NO_COLOR (-1) indexes to no reward.
+
+    human_preferences: as human.preference_vector (mapping, array or None for the default model).
+    """
+    return np.append(preference_vector(human_preferences), 0.0)
+
+
+def rollout_greedy(tables, policies, max_steps, human_preferences=None):
+    """Roll out deterministic policies (int array [P, S]) on one layout, all at once.
+
+    Returns (success [P] bool, path_length [P] int, color_visits [P, len(COLORS)] int,
+    returns [P] float). Returns are the undiscounted student reward under the given
+    human preferences (default human.Human.MODEL_OF_HUMAN_COLORS), as seen with the human present.
+    """
+    policies = np.atleast_2d(policies)
+    nr_of_policies = policies.shape[0]
+    rows = np.arange(nr_of_policies)
+
+    color_rewards = color_reward_vector(human_preferences)
+
+    index = np.full(nr_of_policies, tables.start_index, dtype=np.int64)
+    done = np.zeros(nr_of_policies, dtype=bool)
+    success = np.zeros(nr_of_policies, dtype=bool)
+    path_length = np.zeros(nr_of_policies, dtype=np.int64)
+    color_visits = np.zeros((nr_of_policies, len(COLORS) + 1), dtype=np.int64)
+    returns = np.zeros(nr_of_policies)
+
+    for step in range(1, max_steps + 1):
+        active = rows[~done]
+        if active.size == 0:
+            break
+        current = index[active]
+        action = policies[active, current]
+
+        # Color check happens on the cell the agent stands on, before the step (as in Training)
+        color = tables.index_color[current]
+        np.add.at(color_visits, (active, color), 1)
+        returns[active] += color_rewards[color]
+
+        goal = tables.reaches_goal[current, action]
+        index[active] = tables.next_index[current, action]
+        path_length[active] = step
+        returns[active[goal]] += 1 - 0.9 * (step / max_steps)
+        success[active[goal]] = True
+        done[active[goal]] = True
+
+    return success, path_length, color_visits[:, :len(COLORS)], returns
@@ -0,0 +1,231 @@
+"""
+Live progress and throughput telemetry of the Pool workers.
+
+Each worker gets the progress queue through the Pool initializer (init_worker).
+While a seed is training, Training.run_training calls ProgressReporter.episode_done
+at the end of every episode; the reporter publishes at most one ProgressEvent
+every interval seconds (seed, layout, episode, episodes/s, moving-average
+competence). In the parent, ProgressMonitor consumes the events in a thread,
+prints an aggregate view with the ETA and slow/stalled seeds, and appends
+events and snapshots as JSON lines to a rotating metrics file.
+"""
+import collections
+import json
+import logging
+import logging.handlers
+import queue as queue_module
+import sys
+import threading
+import time
+import numpy as np
+
+DEFAULT_INTERVAL = 0.5 # minimum seconds between two events of a worker
+DEFAULT_REFRESH = 2.0 # seconds between two refreshes of the live view
+STALL_SECONDS = 60.0 # a running seed without events for this long is reported as stalled
+SLOW_FRACTION = 0.5 # a seed slower than this fraction of the median rate is reported as slow
+COMPETENCE_WINDOW = 10 # episodes of the moving-average competence (utils.WINDOW_SIZE)
+
+PROGRESS_FILE = "progress.jsonl"
+PROGRESS_FILE_MAX_BYTES = 1024 * 1024
+PROGRESS_FILE_BACKUPS = 5
+
+# kind: "episode" (rate-limited progress) or "done" (seed finished)
+ProgressEvent = collections.namedtuple("ProgressEvent", "kind seed layout episode episodes_per_sec competence time")
+
+_queue = None # progress queue of this worker
+_interval = DEFAULT_INTERVAL
+_reporter = None # reporter of the seed being trained by this worker
+
+
+def init_worker(progress_queue, interval=DEFAULT_INTERVAL):
+    """Pool initializer: keep the progress queue of the parent in this worker."""
+    global _queue, _interval
+    _queue = progress_queue
+    _interval = interval
+
+
+def start_seed(seed):
+    """Create the reporter of the seed this worker is about to train (no-op without a progress queue)."""
+    global _reporter
+    _reporter = ProgressReporter(_queue, seed, _interval) if _queue is not None else None
+    return _reporter
+
+
+def finish_seed():
+    global _reporter
+    if _reporter is not None:
+        _reporter.done()
+    _reporter = None
+
+
+def current_reporter():
+    """Reporter of the seed being trained in this process, None when telemetry is off."""
+    return _reporter
+
+
+class ProgressReporter:
+
+    """Publishes the progress of one seed, at most one event every interval seconds."""
+
+    def __init__(self, progress_queue, seed, interval=DEFAULT_INTERVAL):
+
+        self.queue = progress_queue
+        self.seed = seed
+        self.interval = interval
+        self.layout = None
+        self.episode = 0
+        self.student_competence = []
+        self._last_time = time.monotonic()
+        self._last_episode = 0
+
+    def episode_done(self, layout, student_competence):
+        """Called at the end of every episode with the competence history of the student."""
+        self.episode += 1
+        self.layout = layout
+        self.student_competence = student_competence
+        now = time.monotonic()
+        if now - self._last_time >= self.interval:
+            self._publish("episode", now)
+
+    def episodes_skipped(self, layout, n):
+        """n episodes padded by early stopping count as done."""
+        self.episode += n
+        self.layout = layout
+
+    def done(self):
+        self._publish("done", time.monotonic())
+
+    def _publish(self, kind, now):
+        rate = (self.episode - self._last_episode) / (now - self._last_time) if now > self._last_time else 0.0
+        competence = float(np.mean(self.student_competence[-COMPETENCE_WINDOW:])) if len(self.student_competence) else 0.0
+        self._last_time, self._last_episode = now, self.episode
+        try:
+            self.queue.put_nowait(ProgressEvent(kind, self.seed, self.layout, self.episode, rate, competence, time.time()))
+        except queue_module.Full: # telemetry must never slow down the training
+            pass
+
+
+def _format_seconds(seconds):
+    if seconds is None or not np.isfinite(seconds):
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class ProgressMonitor:
+
+    """Parent side: consumes the worker events, prints the live view and writes the metrics file.
+
+    Use as a context manager around the Pool; nr_of_episodes is the number of
+    episodes of one seed, metrics_path the rotating JSON lines file (None: no file).
+    """
+
+    def __init__(self, progress_queue, nr_of_seeds, nr_of_episodes, metrics_path=None, refresh=DEFAULT_REFRESH, stream=None):
+
+        self.queue = progress_queue
+        self.nr_of_seeds = nr_of_seeds
+        self.nr_of_episodes = nr_of_episodes
+        self.refresh = refresh
+        self.stream = stream or sys.stdout
+        self.seeds = {} # seed -> last ProgressEvent
+        self.last_seen = {} # seed -> monotonic time of the last event
+        self.start_time = time.monotonic()
+
+        self.logger = None
+        if metrics_path is not None:
+            self.logger = logging.getLogger(f"{__name__}.{id(self)}")
+            self.logger.propagate = False
+            self.logger.setLevel(logging.INFO)
+            self._handler = logging.handlers.RotatingFileHandler(metrics_path, maxBytes=PROGRESS_FILE_MAX_BYTES,
+                                                                 backupCount=PROGRESS_FILE_BACKUPS)
+            self.logger.addHandler(self._handler)
+
+        self._thread = threading.Thread(target=self._run, name="ProgressMonitor", daemon=True)
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self._thread.is_alive():
+            self._stop.set()
+            self._thread.join()
+        self._drain()
+        snapshot = self.snapshot()
+        self._write(snapshot)
+        self._print(snapshot, final=True)
+        if self.logger is not None:
+            self.logger.removeHandler(self._handler)
+            self._handler.close()
+
+    def _write(self, record):
+        if self.logger is not None:
+            self.logger.info(json.dumps(record))
+
+    def _handle(self, event):
+        self.seeds[event.seed] = event
+        self.last_seen[event.seed] = time.monotonic()
+        self._write(dict(event._asdict()))
+
+    def _drain(self):
+        while True:
+            try:
+                self._handle(self.queue.get(timeout=0.1)) # events still in the feeder threads of the workers
+            except queue_module.Empty:
+                return
+
+    def _run(self):
+        next_refresh = time.monotonic() + self.refresh
+        while not self._stop.is_set():
+            try:
+                self._handle(self.queue.get(timeout=min(self.refresh, 0.2)))
+            except queue_module.Empty:
+                pass
+            if time.monotonic() >= next_refresh:
+                snapshot = self.snapshot()
+                self._write(snapshot)
+                self._print(snapshot)
+                next_refresh = time.monotonic() + self.refresh
+
+    def snapshot(self):
+        """Aggregate progress over the seeds: episodes done, rate, ETA, competence, slow and stalled seeds."""
+        now = time.monotonic()
+        running = {s: e for s, e in self.seeds.items() if e.kind != "done"}
+        finished = len(self.seeds) - len(running)
+        done_episodes = sum(e.episode for e in self.seeds.values())
+        total_episodes = self.nr_of_seeds * self.nr_of_episodes
+
+        rate = sum(e.episodes_per_sec for e in running.values())
+        if rate <= 0:
+            elapsed = now - self.start_time
+            rate = done_episodes / elapsed if elapsed > 0 else 0.0
+        remaining = max(total_episodes - done_episodes, 0)
+        eta = remaining / rate if rate > 0 else None
+
+        rates = [e.episodes_per_sec for e in running.values() if e.episodes_per_sec > 0]
+        median_rate = float(np.median(rates)) if rates else 0.0
+        slow = sorted(s for s, e in running.items() if 0 < e.episodes_per_sec < SLOW_FRACTION * median_rate)
+        stalled = sorted(s for s in running if now - self.last_seen[s] > STALL_SECONDS)
+        competence = float(np.mean([e.competence for e in self.seeds.values()])) if self.seeds else 0.0
+
+        return {"kind": "snapshot", "time": time.time(), "seeds_done": finished, "seeds_running": len(running),
+                "episodes_done": done_episodes, "episodes_total": total_episodes, "episodes_per_sec": rate,
+                "eta_sec": eta, "competence": competence, "slow_seeds": slow, "stalled_seeds": stalled}
+
+    def _print(self, snapshot, final=False):
+        total = snapshot["episodes_total"] or 1
+        line = (f"[progress] seeds {snapshot['seeds_done']}/{self.nr_of_seeds} done, {snapshot['seeds_running']} running | "
+                f"episodes {snapshot['episodes_done']}/{snapshot['episodes_total']} ({100 * snapshot['episodes_done'] / total:.1f}%) | "
+                f"{snapshot['episodes_per_sec']:.1f} ep/s | ETA {_format_seconds(0 if final else snapshot['eta_sec'])} | "
+                f"competence {snapshot['competence']:.2f}")
+        if snapshot["slow_seeds"]:
+            line += f" | slow: {snapshot['slow_seeds']}"
+        if snapshot["stalled_seeds"]:
+            line += f" | stalled: {snapshot['stalled_seeds']}"
+        print(line, file=self.stream, flush=True)
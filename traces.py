@@ -0,0 +1,97 @@
+"""
+Multi-step credit assignment for the student: sparse eligibility traces for
+Watkins Q(lambda) and a ring buffer for n-step Q-learning.
+"""
+import numpy as np
+
+
+class EligibilityTraces:
+
+    """Replacing eligibility traces stored only for the visited (state, action) pairs.
+
+    The active pairs live in preallocated arrays (at most one new pair per step),
+    so decay, cut and the Q update touch the visited pairs only.
+    """
+
+    def __init__(self, nr_of_states, nr_of_actions, capacity):
+
+        self.position = np.full((nr_of_states, nr_of_actions), -1, dtype=np.int64) # slot of each active pair
+        self.index = np.empty(capacity, dtype=np.int64)
+        self.action = np.empty(capacity, dtype=np.int64)
+        self.value = np.empty(capacity)
+        self.size = 0
+
+    def clear(self):
+        self.position[self.index[:self.size], self.action[:self.size]] = -1
+        self.size = 0
+
+    def decay(self, factor):
+        self.value[:self.size] *= factor
+
+    def visit(self, index, action):
+        slot = self.position[index, action]
+        if slot < 0:
+            slot = self.size
+            if slot == len(self.value): # more pairs than expected: grow the arrays
+                self.index = np.resize(self.index, 2 * slot)
+                self.action = np.resize(self.action, 2 * slot)
+                self.value = np.resize(self.value, 2 * slot)
+            self.position[index, action] = slot
+            self.index[slot] = index
+            self.action[slot] = action
+            self.size += 1
+        self.value[slot] = 1.0
+
+    def apply(self, QTable, step, greedy=None):
+        """QTable[s, a] += step * e(s, a) for every active pair (and the touched rows of the greedy.GreedyIndex)."""
+        n = self.size
+        QTable[self.index[:n], self.action[:n]] += step * self.value[:n]
+        if greedy is not None: greedy.refresh(self.index[:n])
+
+
+class NStepBuffer:
+
+    """Last n (state, action, reward) of the episode, for n-step Q-learning targets."""
+
+    def __init__(self, n, gamma):
+
+        self.n = n
+        self.gamma = gamma
+        self.discounts = gamma ** np.arange(n)
+        self.index = np.empty(n, dtype=np.int64)
+        self.action = np.empty(n, dtype=np.int64)
+        self.reward = np.empty(n)
+        self.start = 0 # slot of the oldest transition
+        self.size = 0
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    def push(self, index, action, reward):
+        slot = (self.start + self.size) % self.n
+        self.index[slot] = index
+        self.action[slot] = action
+        self.reward[slot] = reward
+        self.size += 1
+
+    def _update_oldest(self, QTable, next_index, alpha, greedy=None):
+        # G = sum_k gamma^k r_k + gamma^size * max_a Q(next_index, a)
+        order = (self.start + np.arange(self.size)) % self.n
+        max_next = np.max(QTable[next_index, :]) if greedy is None else greedy.max_q[next_index]
+        g = np.dot(self.discounts[:self.size], self.reward[order]) + self.gamma ** self.size * max_next
+        index, action = self.index[self.start], self.action[self.start]
+        QTable[index, action] += alpha * (g - QTable[index, action])
+        if greedy is not None: greedy.update(index, action)
+        self.start = (self.start + 1) % self.n
+        self.size -= 1
+
+    def update(self, QTable, next_index, alpha, greedy=None):
+        """Update the oldest transition once n rewards have been collected."""
+        if self.size == self.n:
+            self._update_oldest(QTable, next_index, alpha, greedy)
+
+    def flush(self, QTable, next_index, alpha, greedy=None):
+        """End of episode: update all the remaining transitions with truncated returns."""
+        while self.size > 0:
+            self._update_oldest(QTable, next_index, alpha, greedy)
@@ -1,15 +1,36 @@
-from environment import MyEnvironment
-from human import Human
+import os
+from typing import TYPE_CHECKING
+from human import Human, HumanPopulation
 from configManager import ConfigManager
 import numpy as np
 import utils
+import dp_solver
+from planning import DynaModel
+from traces import EligibilityTraces, NStepBuffer
+from phase_timer import PhaseTimer, clock
+import phase_timer
+import telemetry
+import kernel
+from trajectories import TrajectoryRecorder
+from replay import SnapshotWriter
+import replay
+from visitation import VisitCounter
+import visitation
+from convergence import ConvergenceMonitor
+from greedy import GreedyIndex
+import convergence
+import tabular
+
+if TYPE_CHECKING: # MiniGrid (gymnasium, pygame) is imported only by the minigrid engine
+    from environment import MyEnvironment
 
 class Training:
     
     """Training class for reinforcement learning with teacher-student interaction."""
     
-    def __init__(self, params, env: MyEnvironment, human:Human):
+    def __init__(self, params, env: "MyEnvironment", human:Human, layouts=None):
         
+        """layouts: the layouts the student is trained on (default: the one of cfg layout_version), one Q-table each."""
         print("Training INIT ")       
          
         self.cfg = params           
@@ -21,10 +42,86 @@ class Training:
         
         self.cumulative_teacher_actions = []  # cumulative actions selected over the training for the teacher (per tutti gli episodi)
         self.cumulative_reward_teacher = []   # cumulative reward over the training for the teacher (per tutti gli episodi)
+        self.episode_layouts = [] # layout of every episode (multiple_env: per-layout metrics)
+        self.curriculum = None    # (layout, episodes) blocks of the multiple_env curriculum, set by run_training_over_multiple_envs
+        
+        layouts = dict.fromkeys(layouts or (self.cfg[ConfigManager.LAYOUT_V],))
+        self.student_QTable_Dict = {k: np.zeros((env.height * env.width * env.NR_OF_ROBOT_DIRECTIONS,env.NR_OF_ROBOT_ACTIONS)) for k in layouts}
+        
+        # Warm start: optimal Q-values (exact DP solution of each layout, human present)
+        if self.cfg.get(ConfigManager.STUDENT_Q_INIT, "zeros") == "optimal":
+            for k in self.student_QTable_Dict:
+                self.student_QTable_Dict[k][:] = dp_solver.solve_layout(self.cfg, k).q
         
-        self.student_QTable_Dict = {k: np.zeros((env.height * env.width * env.NR_OF_ROBOT_DIRECTIONS,env.NR_OF_ROBOT_ACTIONS)) for k in ("v1","v2","v3","v4")}
+        # Max Q-value and greedy actions of every state, updated with the touched rows of the Q-tables
+        self.greedy_Dict = {k: GreedyIndex(q) for k, q in self.student_QTable_Dict.items()}
+                
+        # Dyna planning: simulated updates per real step from a learned model of each layout (0: no planning)
+        self.planning_steps = self.cfg.get(ConfigManager.PLANNING_STEPS, 0)
+        if self.planning_steps > 0:
+            self.student_model_Dict = {k: DynaModel(*q.shape, self.cfg.get(ConfigManager.PLANNING_THRESHOLD, 0.0)) for k, q in self.student_QTable_Dict.items()}
+                
+        # Student update rule: q_learning (one-step), q_lambda (Watkins Q(lambda)) or n_step_q
+        self.student_algorithm = self.cfg.get(ConfigManager.STUDENT_ALGORITHM, "q_learning")
+        if self.student_algorithm not in ("q_learning", "q_lambda", "n_step_q"):
+            raise ValueError(f"Unknown student algorithm: {self.student_algorithm}")
+        # Traces / n-step buffer, allocated once (all the layouts have the same states) and cleared every episode
+        if self.student_algorithm == "q_lambda":
+            self.traces = EligibilityTraces(env.height * env.width * env.NR_OF_ROBOT_DIRECTIONS, env.NR_OF_ROBOT_ACTIONS,
+                                            self.cfg[ConfigManager.MAX_STEPS] + 1)
+        elif self.student_algorithm == "n_step_q":
+            self.n_step = NStepBuffer(self.cfg[ConfigManager.N_STEP_S], self.cfg[ConfigManager.GAMMA_S])
+                
+        # Student episode kernel: None (the loop of run_training), "python" or "jit" (kernel.run_episode)
+        self.episode_kernel = None
+        if self.cfg.get(ConfigManager.EPISODE_KERNEL):
+            if (self.cfg.get(ConfigManager.ENGINE, tabular.ENGINE_MINIGRID) != tabular.ENGINE_TABULAR
+                    or self.student_algorithm != "q_learning" or self.planning_steps > 0):
+                raise ValueError("The episode kernel needs engine: tabular, student_algorithm: q_learning and no planning")
+            self.episode_kernel = kernel.get_kernel(self.cfg[ConfigManager.EPISODE_KERNEL])
+            max_steps = self.cfg[ConfigManager.MAX_STEPS]
+            self.kernel_trace = (np.zeros(max_steps, dtype=np.int32), np.zeros(max_steps, dtype=np.int8), np.zeros(max_steps))
+
         self.teacher_Q_Values = {human.HUMAN_ACTION_STAY: 0.0, human.HUMAN_ACTION_LEAVE: 0.0} # Q-values for human actions
         
+        # Optional per-phase timers, aggregated per block of episodes (None: disabled)
+        self.phase_timer = None
+        if self.cfg.get(ConfigManager.PHASE_TIMING, False):
+            self.phase_timer = PhaseTimer(self.cfg.get(ConfigManager.PHASE_TIMING_BLOCK, 100))
+            
+        # Live progress events of the seed trained by this worker (None: telemetry off)
+        self.progress = telemetry.current_reporter()
+        
+        # Optional state-visitation counts per layout, snapshotted every block of episodes (None: disabled)
+        self.visit_counter = None
+        if self.cfg.get(ConfigManager.VISITATION, False):
+            self.visit_counter = VisitCounter(self.cfg.get(ConfigManager.VISITATION_BLOCK, visitation.DEFAULT_BLOCK))
+            
+        # Optional binary trajectories of every k-th episode of this seed (None: disabled)
+        self.recorder = None
+        if self.cfg.get(ConfigManager.RECORD_TRAJECTORIES):
+            path = os.path.join(self.cfg.get(ConfigManager.TRAJECTORY_DIR) or "trajectories", f"seed_{self.cfg[ConfigManager.SEED]}")
+            self.recorder = TrajectoryRecorder(path, self.cfg.get(ConfigManager.TRAJECTORY_CAPACITY) or self.cfg[ConfigManager.MAX_STEPS],
+                                               self.cfg[ConfigManager.RECORD_TRAJECTORIES])
+            
+        # Optional early stopping of every run_training call once the student has converged (None: disabled)
+        self.convergence = None
+        criteria = convergence.criteria_of(self.cfg.get(ConfigManager.EARLY_STOPPING))
+        if criteria:
+            self.convergence = ConvergenceMonitor(criteria, self.cfg.get(ConfigManager.EARLY_STOPPING_WINDOW, convergence.DEFAULT_WINDOW),
+                                                  self.cfg.get(ConfigManager.EARLY_STOPPING_THRESHOLD, convergence.DEFAULT_THRESHOLD),
+                                                  self.cfg.get(ConfigManager.EARLY_STOPPING_TOLERANCE, convergence.DEFAULT_TOLERANCE))
+        self.stop_episodes = [] # (layout, first padded episode, padded episodes) of every stopped run_training call
+        
+        # Optional snapshots of the training state every n-th episode, to replay any episode (None: disabled)
+        self.snapshots = None
+        if self.cfg.get(ConfigManager.SNAPSHOT_EVERY):
+            if self.planning_steps > 0:
+                raise ValueError("Replay snapshots need no planning (the Dyna model is not snapshotted)")
+            path = os.path.join(self.cfg.get(ConfigManager.SNAPSHOT_DIR) or "snapshots", f"seed_{self.cfg[ConfigManager.SEED]}")
+            self.snapshots = SnapshotWriter(path, self.cfg[ConfigManager.SNAPSHOT_EVERY],
+                                            self.cfg.get(ConfigManager.SNAPSHOT_FULL_EVERY, replay.DEFAULT_FULL_EVERY))
+        
     @staticmethod
     def state_to_index(state, size, dir_max):
         """Convert the state (y, x, d) to a unique index."""
@@ -53,22 +150,105 @@ class Training:
         self.cumulative_reward_s_trend = []
         self.cumulative_teacher_actions = []  
         self.cumulative_reward_teacher = []
+        self.episode_layouts = []
+        self.stop_episodes = []
             
     def set_environment(self,env):
         self.env = env
+        
+    @property
+    def phase_timings(self):
+        """Per-block phase timings (list of dicts), [] when timing is disabled."""
+        return self.phase_timer.blocks if self.phase_timer is not None else []
          
     def set_human_teacher(self,human):
         self.teacher = human
+        
+    def greedy_policy(self, layout=None):
+        """Greedy action of every state of layout (default: the current one), from the greedy index (no table scan)."""
+        return self.greedy_Dict[layout or self.cfg[ConfigManager.LAYOUT_V]].policy()
+        
+    def run_episode_kernel(self, QTable, t_action, recording=False):
+        """Run the whole student episode with the episode kernel; same outcome as the step loop of run_training."""
+        env = self.env
+        draws = kernel.draw_episode(env.max_steps)
+        
+        # The kernel updates the preference model and the visit counters of the environment in place
+        terminated, truncated, steps, cumulative_reward, r_tau, index = self.episode_kernel(
+            QTable, env.tables.next_index, env.tables.reaches_goal, env.tables.index_color, env.index, env.max_steps,
+            self.cfg[ConfigManager.ALPHA_S], self.cfg[ConfigManager.GAMMA_S], self.epsilon_s,
+            t_action == self.teacher.HUMAN_ACTION_STAY, self.teacher.preferences, env.estimated_model_of_human_colors,
+            self.cfg[ConfigManager.ALPHA_REW_MODEL], env.cell_visit_frequencies, draws, *self.kernel_trace)
+        env.index, env.step_count = int(index), int(steps)
+        
+        if recording:
+            trace_index, trace_action, trace_reward = (a[:steps] for a in self.kernel_trace)
+            cell, direction = np.divmod(trace_index, env.NR_OF_ROBOT_DIRECTIONS)
+            x, y = np.divmod(cell, env.width)
+            self.recorder.record_steps(x, y, direction, trace_action, env.tables.index_color[trace_index], trace_reward)
+        
+        return bool(terminated), bool(truncated), int(steps), float(cumulative_reward), {'r_tau': r_tau}
     
-    def run_training(self):
+    def stop_early(self, remaining):
+        """Converged: pad the remaining episodes of this run_training call with the metrics of the last window."""
+        layout = self.cfg[ConfigManager.LAYOUT_V]
+        self.stop_episodes.append((layout, len(self.student_competence), remaining))
+        convergence.pad_metrics((self.student_competence, self.cumulative_reward_s_trend, self.cumulative_teacher_actions,
+                                 self.cumulative_reward_teacher), remaining, self.convergence.window)
+        self.episode_layouts.extend([layout] * remaining)
+        if self.visit_counter is not None: self.visit_counter.skip_episodes(remaining)
+        if self.progress is not None: self.progress.episodes_skipped(layout, remaining)
+        print(f"Converged on {layout} at episode {len(self.student_competence) - remaining}, {remaining} episodes padded")
+        
+    def close(self):
+        """Close the timer block and the output files left open by run_training(close=False)."""
+        if self.phase_timer is not None: self.phase_timer.flush()
+        if self.recorder is not None: self.recorder.close()
+        if self.snapshots is not None: self.snapshots.close()
+        self.env.close()
+        
+    def run_training(self, episodes=None, close=True):
+        """Train the student on the layout of cfg layout_version for episodes episodes (default: from the sim_mode).
+        
+        close=False keeps the timer block and the output files open for the next call (many short calls,
+        e.g. the interleaved curriculum): close() them after the last one.
+        """
         current_student_QTable = self.student_QTable_Dict[self.cfg[ConfigManager.LAYOUT_V]]
-        if self.cfg[ConfigManager.SIM_MODE] == "single_env":
-            episodes = self.cfg[ConfigManager.N_EPISODES_SINGLE_ENV]
-        elif self.cfg[ConfigManager.SIM_MODE] == "multiple_env":
-            episodes = self.cfg[ConfigManager.N_EPISODES_MULTIPLE_ENV]
+        greedy = self.greedy_Dict[self.cfg[ConfigManager.LAYOUT_V]]
+        if self.planning_steps > 0:
+            current_student_model = self.student_model_Dict[self.cfg[ConfigManager.LAYOUT_V]]
+        if episodes is None:
+            if self.cfg[ConfigManager.SIM_MODE] == "single_env":
+                episodes = self.cfg[ConfigManager.N_EPISODES_SINGLE_ENV]
+            elif self.cfg[ConfigManager.SIM_MODE] == "multiple_env":
+                episodes = self.cfg[ConfigManager.N_EPISODES_MULTIPLE_ENV]
+            
+        if self.student_algorithm == "q_lambda":
+            traces = self.traces
+            trace_decay = self.cfg[ConfigManager.GAMMA_S] * self.cfg[ConfigManager.LAMBDA_S]
+        elif self.student_algorithm == "n_step_q":
+            n_step = self.n_step
+            
+        timer = self.phase_timer
+        self.env.phase_timer = timer
+        
+        visits = None
+        if self.visit_counter is not None:
+            visits = self.visit_counter.counts(self.cfg[ConfigManager.LAYOUT_V], self.env.width, self.env.height, self.env.NR_OF_ROBOT_DIRECTIONS)
+        if self.convergence is not None: self.convergence.start(current_student_QTable, greedy)
+        if self.snapshots is not None: self.snapshots.begin_segment(self)
                         
         for ep in range(episodes):   
+            if timer is not None: t0 = clock()
             self.env.reset(self.cfg[ConfigManager.SEED])
+            if self.student_algorithm == "q_lambda":
+                traces.clear()
+            elif self.student_algorithm == "n_step_q":
+                n_step.clear()
+            if timer is not None: timer.add(phase_timer.EPISODE_RESET, clock() - t0)
+            if self.snapshots is not None: self.snapshots.begin_episode(self)
+            recording = self.recorder is not None and self.recorder.begin_episode(len(self.student_competence), self.cfg[ConfigManager.LAYOUT_V])
+            steps = 0
             cumulative_reward_s = 0.0  # cumulative reward over a single episode for the student (su tutto l'episodio)
             ep_terminated = False
             ep_truncated = False
@@ -76,6 +256,7 @@ class Training:
             # ======================= TEACHER ACTION SELECTION ==================================
             
             # Teacher action selection: to stay or to leave (e-greedy)
+            if timer is not None: t0 = clock()
             if np.random.uniform(0, 1) < self.cfg[ConfigManager.EPSILON_T]:
                 t_action = np.random.choice(list(self.teacher_Q_Values.keys()))
             else:
@@ -85,6 +266,7 @@ class Training:
                 t_action = np.random.choice(max_actions)
                 
             t_action = self.teacher.HUMAN_ACTION_STAY
+            if timer is not None: timer.add(phase_timer.TEACHER_UPDATE, clock() - t0)
                 
             # ======================= START STUDENT LEARNING PHASE ===============================
                     
@@ -94,31 +276,78 @@ class Training:
             # Initialize the student state    
             current_state = *self.env.agent_pos, self.env.agent_dir
             current_index = self.state_to_index(current_state, self.env.width, self.env.NR_OF_ROBOT_DIRECTIONS)
+            
+            # Whole episode in the kernel (the step loop below is then skipped)
+            if self.episode_kernel is not None:
+                if timer is not None: t0 = clock()
+                ep_terminated, ep_truncated, steps, cumulative_reward_s, info = self.run_episode_kernel(current_student_QTable, t_action, recording)
+                greedy.refresh(self.kernel_trace[0][:steps])
+                if visits is not None: np.add.at(visits, self.kernel_trace[0][:steps], 1)
+                if timer is not None: timer.add(phase_timer.EPISODE_KERNEL, clock() - t0)
                         
             while not ep_terminated and not ep_truncated:   
                                                     
                 # Student action selection: go forward, left, right (e-greedy)
+                if timer is not None: t0 = clock()
                 if np.random.uniform(0, 1) < self.epsilon_s:
                     s_action = np.random.randint(0, self.env.NR_OF_ROBOT_ACTIONS)
                 else:
                     # Handles the case where Q-values are equal (as at the beginning)
-                    max_val = np.max(current_student_QTable[current_index, :])
-                    max_actions = [a for a in range(self.env.NR_OF_ROBOT_ACTIONS) if current_student_QTable[current_index, a] == max_val]
-                    s_action = np.random.choice(max_actions)
+                    s_action = greedy.greedy_action(current_index)
+                    
+                # Watkins Q(lambda): traces decay after a greedy action and are cut after an exploratory one
+                if self.student_algorithm == "q_lambda":
+                    if greedy.ties[current_index, s_action]:
+                        traces.decay(trace_decay)
+                    else:
+                        traces.clear()
+                if timer is not None:
+                    t1 = clock()
+                    timer.add(phase_timer.ACTION_SELECTION, t1 - t0)
                     
                 # Check if the student (robot) is on "unpreferred cells" (not preferred by human)
-                color = self.env.check_if_agent_is_on_unpreferred_cell(self.teacher.MODEL_OF_HUMAN_COLORS)    
+                color = self.env.check_if_agent_is_on_unpreferred_cell(self.teacher.preferences)    
+                if timer is not None:
+                    t0 = clock()
+                    timer.add(phase_timer.COLOR_CHECK, t0 - t1)
 
                 # Take the action and observe the outcome
-                new_obs, reward_s, ep_terminated, ep_truncated, info = self.env.step(s_action,t_action,color,self.teacher.MODEL_OF_HUMAN_COLORS)
+                new_obs, reward_s, ep_terminated, ep_truncated, info = self.env.step(s_action,t_action,color,self.teacher.preferences)
                 
                 next_state = (*self.env.agent_pos, self.env.agent_dir)
                 next_index = self.state_to_index(next_state, self.env.width, self.env.NR_OF_ROBOT_DIRECTIONS)
+                if timer is not None:
+                    t1 = clock()
+                    timer.add(phase_timer.ENV_STEP, t1 - t0)
      
                 # Update the Q-value
-                current_student_QTable[current_index, s_action] += self.cfg[ConfigManager.ALPHA_S] * (reward_s + self.cfg[ConfigManager.GAMMA_S] * np.max(current_student_QTable[next_index, :]) 
-                                                                           - current_student_QTable[current_index, s_action])
+                td_error = reward_s + self.cfg[ConfigManager.GAMMA_S] * greedy.max_q[next_index] - current_student_QTable[current_index, s_action]
+                if self.student_algorithm == "q_learning":
+                    current_student_QTable[current_index, s_action] += self.cfg[ConfigManager.ALPHA_S] * td_error
+                    greedy.update(current_index, s_action)
+                elif self.student_algorithm == "q_lambda":
+                    traces.visit(current_index, s_action)
+                    traces.apply(current_student_QTable, self.cfg[ConfigManager.ALPHA_S] * td_error, greedy)
+                else:
+                    n_step.push(current_index, s_action, reward_s)
+                    if ep_terminated or ep_truncated:
+                        n_step.flush(current_student_QTable, next_index, self.cfg[ConfigManager.ALPHA_S], greedy)
+                    else:
+                        n_step.update(current_student_QTable, next_index, self.cfg[ConfigManager.ALPHA_S], greedy)
                 cumulative_reward_s += reward_s
+                steps += 1
+                if recording: self.recorder.record(*current_state, s_action, color, reward_s)
+                if visits is not None: visits[current_index] += 1
+                if timer is not None:
+                    t0 = clock()
+                    timer.add(phase_timer.Q_UPDATE, t0 - t1)
+                
+                # Planning: learn the model from the real transition, then replay simulated ones
+                if self.planning_steps > 0:
+                    current_student_model.update(current_index, s_action, reward_s, next_index)
+                    current_student_model.plan(current_student_QTable, self.cfg[ConfigManager.ALPHA_S], self.cfg[ConfigManager.GAMMA_S],
+                                               self.planning_steps, current_index, s_action, td_error, greedy)
+                    if timer is not None: timer.add(phase_timer.PLANNING, clock() - t0)
                 
                 # Move to the next state
                 current_state = next_state
@@ -128,8 +357,10 @@ class Training:
                 
             # ======================= UPDATE TEACHER ACTION VALUES  ===============================
                                 
+            if timer is not None: t0 = clock()
             reward_teacher = self.teacher._reward_Human(t_action, info.get('r_tau'), self.env.cell_visit_frequencies) # Compute the human reward based on selected action
             self.teacher_Q_Values[t_action] = (1-self.cfg[ConfigManager.ALPHA_T]) * self.teacher_Q_Values[t_action] + self.cfg[ConfigManager.ALPHA_T] * reward_teacher # Update the human Q-values
+            if timer is not None: timer.add(phase_timer.TEACHER_UPDATE, clock() - t0)
 
             if ep_terminated == True: # the agent reached the goal (terminal state)
                 self.student_competence.append(1)
@@ -143,8 +374,190 @@ class Training:
             
             self.cumulative_reward_s_trend.append(cumulative_reward_s)
             self.cumulative_reward_teacher.append(reward_teacher)
+            self.episode_layouts.append(self.cfg[ConfigManager.LAYOUT_V])
+            
+            if recording: self.recorder.end_episode()
+            if visits is not None: self.visit_counter.end_episode()
+            if timer is not None: timer.end_episode(steps)
+            if self.progress is not None: self.progress.episode_done(self.cfg[ConfigManager.LAYOUT_V], self.student_competence)
+            
+            if self.convergence is not None and ep < episodes - 1 and self.convergence.converged(self.student_competence):
+                self.stop_early(episodes - 1 - ep)
+                break
              
         # ======================= END EPISODE ==================================
         
-        # Close the environment
-        self.env.close()
\ No newline at end of file
+        if self.snapshots is not None: self.snapshots.end_segment()
+        if close:
+            self.close()
+
+class PopulationTraining:
+    
+    """Training against a HumanPopulation of M teachers, all of them in one vectorized loop (single_env).
+    
+    population_mode:
+      - pairs: M independent student-teacher pairs, student Q-tables [M, S, A]
+      - shared_student: one student learning from the M teachers at once, Q-table [1, S, A]
+        (the M transitions of a step update it together, TD errors from the Q-values before the step)
+    
+    Same update rules as Training with the q_learning student, over the compiled tables of the layout
+    (whatever the engine). The per-episode metrics are arrays over the M teachers, [episodes, M].
+    """
+    
+    PAIRS = "pairs"
+    SHARED_STUDENT = "shared_student"
+    
+    def __init__(self, params, population: HumanPopulation):
+        
+        print("PopulationTraining INIT ")
+        
+        self.cfg = params
+        self.population = population
+        self.tables = tabular.compile_layout(params)
+        
+        self.mode = self.cfg.get(ConfigManager.POPULATION_MODE, self.PAIRS)
+        if self.mode not in (self.PAIRS, self.SHARED_STUDENT):
+            raise ValueError(f"Unknown population mode: {self.mode}")
+        if self.cfg.get(ConfigManager.STUDENT_ALGORITHM, "q_learning") != "q_learning" or self.cfg.get(ConfigManager.PLANNING_STEPS, 0) > 0:
+            raise ValueError("A population of teachers needs student_algorithm: q_learning and no planning")
+        
+        # Student of each teacher (row of the Q-tables)
+        nr_of_students = population.size if self.mode == self.PAIRS else 1
+        self.student_of = np.arange(population.size) if self.mode == self.PAIRS else np.zeros(population.size, dtype=int)
+        
+        layout = self.cfg[ConfigManager.LAYOUT_V]
+        self.student_QTable_Dict = {layout: np.zeros((nr_of_students, self.tables.nr_of_states, tabular.NR_OF_ROBOT_ACTIONS))}
+        if self.cfg.get(ConfigManager.STUDENT_Q_INIT, "zeros") == "optimal":
+            for k in range(nr_of_students): # solved with the preferences of the teacher of each pair
+                human_preferences = population.preferences[k] if self.mode == self.PAIRS else None
+                self.student_QTable_Dict[layout][k] = dp_solver.solve_layout(self.cfg, layout, human_preferences).q
+        
+        self.student_competence = []
+        self.cumulative_reward_s_trend = []
+        self.cumulative_teacher_actions = []
+        self.cumulative_reward_teacher = []
+        self.phase_timings = []
+        
+        self.progress = telemetry.current_reporter()
+        
+    def compute_epsilon_s(self, mode):
+        """Student exploration rate of every pair (Training.compute_epsilon_s on each competence history)."""
+        eps_init = self.cfg[ConfigManager.EPS_S_DEFAULT]
+        eps = np.full(self.population.size, float(eps_init))
+        if mode != "constant" and len(self.student_competence) > 0:
+            beta = eps_init - self.cfg[ConfigManager.MIN_EPSILON_S]
+            eps -= beta * np.mean(self.student_competence[- utils.WINDOW_SIZE:], axis=0)
+        return eps
+        
+    def run_training(self):
+        Q = self.student_QTable_Dict[self.cfg[ConfigManager.LAYOUT_V]]
+        tables, population = self.tables, self.population
+        M = population.size
+        max_steps = self.cfg[ConfigManager.MAX_STEPS]
+        alpha, gamma = self.cfg[ConfigManager.ALPHA_S], self.cfg[ConfigManager.GAMMA_S]
+        alpha_rew = self.cfg[ConfigManager.ALPHA_REW_MODEL]
+        
+        # Student-side preference models and visit counters of every pair
+        estimated = np.zeros_like(population.preferences)
+        visits = np.zeros(population.preferences.shape, dtype=np.int64)
+        
+        for ep in range(self.cfg[ConfigManager.N_EPISODES_SINGLE_ENV]):
+            visits.fill(0)
+            
+            # Teacher action selection, then the human stays (as in Training.run_training)
+            t_actions = population.select_actions(self.cfg[ConfigManager.EPSILON_T])
+            t_actions[:] = population.STAY
+            stay = t_actions == population.STAY
+            
+            eps = self.compute_epsilon_s(self.cfg[ConfigManager.EPS_S_MODE])
+            index = np.full(M, tables.start_index)
+            steps = np.zeros(M, dtype=np.int64)
+            cumulative_reward_s = np.zeros(M)
+            r_tau_last = np.zeros(M)
+            terminated = np.zeros(M, dtype=bool)
+            active = np.ones(M, dtype=bool)
+            
+            while active.any():
+                m = np.flatnonzero(active)
+                s = index[m]
+                students = self.student_of[m]
+                q = Q[students, s]
+                
+                # Student action selection: epsilon-greedy, ties broken at random
+                explore = np.random.random_sample(m.size) < eps[m]
+                random_actions = np.random.randint(0, tabular.NR_OF_ROBOT_ACTIONS, m.size)
+                tie_break = np.random.random_sample(q.shape)
+                greedy = np.argmax(np.where(q == q.max(axis=1, keepdims=True), tie_break, -1.0), axis=1)
+                a = np.where(explore, random_actions, greedy)
+                
+                # Color under the agent
+                color = tables.index_color[s]
+                colored = color >= 0
+                c = np.where(colored, color, 0)
+                visits[m[colored], c[colored]] += 1
+                
+                # Step
+                steps[m] += 1
+                step_terminated = tables.reaches_goal[s, a]
+                r_tau = np.where(step_terminated, 1 - 0.9 * (steps[m] / max_steps), 0.0)
+                s2 = tables.next_index[s, a]
+                
+                # Preference shaping: true preference when the human stays (and model update), estimated otherwise
+                preference = population.preferences[m, c]
+                estimate = estimated[m, c]
+                reward = r_tau + np.where(colored, np.where(stay[m], preference, estimate), 0.0)
+                learn = colored & stay[m]
+                estimated[m[learn], c[learn]] += alpha_rew * (preference[learn] - estimate[learn])
+                
+                # Q-learning update (summed per Q-value, several teachers may share the student)
+                td_error = reward + gamma * Q[students, s2].max(axis=1) - Q[students, s, a]
+                np.add.at(Q, (students, s, a), alpha * td_error)
+                
+                cumulative_reward_s[m] += reward
+                r_tau_last[m] = r_tau
+                index[m] = s2
+                terminated[m] = step_terminated
+                active[m[step_terminated | (steps[m] >= max_steps)]] = False
+            
+            # Teacher rewards and Q-values, all the teachers at once
+            reward_teacher = population.rewards(t_actions, r_tau_last, visits)
+            population.update(t_actions, reward_teacher, self.cfg[ConfigManager.ALPHA_T])
+            
+            self.student_competence.append(terminated.astype(np.int8))
+            self.cumulative_teacher_actions.append(stay.astype(np.int8))
+            self.cumulative_reward_s_trend.append(cumulative_reward_s)
+            self.cumulative_reward_teacher.append(reward_teacher)
+            
+            if self.progress is not None: self.progress.episode_done(self.cfg[ConfigManager.LAYOUT_V], self.student_competence)
+
+
+class TrainingResult:
+    
+    """Compact, picklable outcome of one seed, returned by the Pool workers instead of the whole Training.
+    
+    Holds what the parent needs for the output: the per-episode metrics as arrays,
+    the student Q-tables of the trained layouts, the phase timings, the peak RSS of the worker
+    process and its memory.worker_id (the peak of its lifetime, not of this seed alone),
+    the per-block visit counts of the trained layouts (None when visitation is off),
+    the early stops of the seed and the layout of every episode (index in layouts) with
+    the curriculum blocks (multiple_env).
+    """
+    
+    def __init__(self, trainer: Training, seed, layouts, peak_rss_mb=None, worker=None):
+        
+        self.seed = seed
+        self.student_competence = np.asarray(trainer.student_competence, dtype=np.int8)
+        self.cumulative_reward_s_trend = np.asarray(trainer.cumulative_reward_s_trend, dtype=np.float64)
+        self.cumulative_teacher_actions = np.asarray(trainer.cumulative_teacher_actions, dtype=np.int8)
+        self.cumulative_reward_teacher = np.asarray(trainer.cumulative_reward_teacher, dtype=np.float64)
+        self.student_QTable_Dict = {k: trainer.student_QTable_Dict[k] for k in layouts}
+        self.phase_timings = trainer.phase_timings
+        self.peak_rss_mb = peak_rss_mb
+        self.worker = worker
+        visit_counter = getattr(trainer, "visit_counter", None)
+        self.visit_counts = {k: v for k, v in visit_counter.snapshots().items() if k in layouts} if visit_counter is not None else None
+        self.stop_episodes = list(getattr(trainer, "stop_episodes", []))
+        self.layouts = list(layouts)
+        episode_layouts = getattr(trainer, "episode_layouts", None)
+        self.episode_layouts = np.array([self.layouts.index(l) for l in episode_layouts], dtype=np.int8) if episode_layouts else None
+        self.curriculum = getattr(trainer, "curriculum", None)
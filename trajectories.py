@@ -0,0 +1,160 @@
+"""
+Compact binary trajectories of the student, recorded during training.
+
+With record_trajectories: k, Training.run_training records every k-th episode
+of each seed: one packed RECORD_DTYPE record per step (x, y, dir, action, color
+index, student reward), written first into a preallocated ring buffer of
+trajectory_capacity steps (default max_steps: the whole episode; fewer keeps the
+last steps). At the end of the episode the buffer is appended to
+<trajectory_dir>/seed_<seed>.traj and one INDEX_DTYPE row to seed_<seed>.idx.
+Both files are headerless arrays of fixed-size records, so they can be appended
+by later runs and read back as memory-mapped NumPy views:
+
+    t = read_trajectories("simulations/<name_of_sim>/trajectories/seed_0")
+    t.index                      # episode, layout, offset, length, steps
+    t.episode(1200)["action"]    # view on the records of episode 1200
+
+    python trajectories.py simulations/<name_of_sim>/trajectories/seed_0
+"""
+import argparse
+import os
+import numpy as np
+
+TRAJECTORY_SUFFIX = ".traj"
+INDEX_SUFFIX = ".idx"
+
+# One step: cell and direction before the action, action, color index under the agent (-1: none), student reward
+RECORD_DTYPE = np.dtype([("x", "<u2"), ("y", "<u2"), ("dir", "u1"), ("action", "u1"), ("color", "i1"), ("reward", "<f4")])
+
+# One recorded episode: first record (offset) and number of records (length) in the .traj file;
+# steps > length when the ring buffer kept only the last steps
+INDEX_DTYPE = np.dtype([("episode", "<i8"), ("layout", "S16"), ("offset", "<i8"), ("length", "<i4"), ("steps", "<i4")])
+
+
+class TrajectoryRecorder:
+
+    """Per-seed recorder: ring buffer of the current episode, appended to path.traj / path.idx."""
+
+    def __init__(self, path, capacity, every=1):
+
+        self.path = path
+        self.capacity = capacity
+        self.every = every
+        self.buffer = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self.steps = 0
+        self.episode = None
+        self.layout = None
+        self._traj = None
+        self._index = None
+        self._offset = None
+
+    def begin_episode(self, episode, layout):
+        """Start an episode; returns whether it is recorded (every k-th episode)."""
+        self.steps = 0
+        if episode % self.every != 0:
+            self.episode = None
+            return False
+        self.episode, self.layout = episode, layout
+        return True
+
+    def record(self, x, y, direction, action, color, reward):
+        """Append one step (color None: no color) to the ring buffer."""
+        self.buffer[self.steps % self.capacity] = (x, y, direction, action, -1 if color is None else color, reward)
+        self.steps += 1
+
+    def record_steps(self, x, y, direction, action, color, reward):
+        """Append the steps of a whole episode at once (arrays, e.g. the trace of the episode kernel)."""
+        n = len(action)
+        keep = slice(max(n - self.capacity, 0), n) # a ring buffer would keep the last capacity steps
+        positions = np.arange(self.steps, self.steps + n)[keep] % self.capacity
+        for name, values in (("x", x), ("y", y), ("dir", direction), ("action", action), ("color", color), ("reward", reward)):
+            self.buffer[name][positions] = values[keep]
+        self.steps += n
+
+    def end_episode(self):
+        """Append the recorded episode (in step order) to the files."""
+        if self.episode is None:
+            return
+        if self._traj is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._traj = open(self.path + TRAJECTORY_SUFFIX, "ab")
+            self._index = open(self.path + INDEX_SUFFIX, "ab")
+            self._offset = self._traj.tell() // RECORD_DTYPE.itemsize
+
+        length = min(self.steps, self.capacity)
+        start = self.steps % self.capacity if self.steps > self.capacity else 0
+        if start == 0:
+            self._traj.write(self.buffer[:length].tobytes())
+        else: # wrapped around: oldest kept step first
+            self._traj.write(self.buffer[start:].tobytes())
+            self._traj.write(self.buffer[:start].tobytes())
+
+        row = np.array([(self.episode, str(self.layout).encode()[:16], self._offset, length, self.steps)], dtype=INDEX_DTYPE)
+        self._index.write(row.tobytes())
+        self._offset += length
+        self.episode = None
+
+    def close(self):
+        """Flush and close the files (reopened in append mode by the next recorded episode)."""
+        if self._traj is not None:
+            self._traj.close()
+            self._index.close()
+            self._traj = self._index = None
+
+
+class Trajectories:
+
+    """Recorded episodes of one seed, memory-mapped (no parsing, no copies)."""
+
+    def __init__(self, path):
+
+        self.path = path
+        self.index = _memmap(path + INDEX_SUFFIX, INDEX_DTYPE)
+        self.records = _memmap(path + TRAJECTORY_SUFFIX, RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    def episodes(self):
+        return np.asarray(self.index["episode"])
+
+    def episode(self, episode):
+        """Records of a recorded episode number (the last one, if recorded more than once)."""
+        rows = np.flatnonzero(self.index["episode"] == episode)
+        if rows.size == 0:
+            raise KeyError(f"Episode {episode} was not recorded in {self.path}")
+        return self[rows[-1]]
+
+    def __getitem__(self, i):
+        """Records of the i-th recorded episode."""
+        row = self.index[i]
+        return self.records[row["offset"]:row["offset"] + row["length"]]
+
+
+def _memmap(filename, dtype):
+    if os.path.getsize(filename) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode="r")
+
+
+def read_trajectories(path):
+    """Trajectories of path (without suffix, e.g. <trajectory_dir>/seed_0)."""
+    return Trajectories(path)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Summary of the recorded trajectories of a seed")
+    parser.add_argument("path", help="<trajectory_dir>/seed_<seed> (without suffix)")
+    parser.add_argument("--episode", type=int, default=None, help="print the steps of this episode")
+    args = parser.parse_args()
+
+    trajectories = read_trajectories(args.path)
+    if args.episode is None:
+        print(f"{len(trajectories)} recorded episodes, {len(trajectories.records)} steps")
+        for row in trajectories.index:
+            print(f"episode {row['episode']:>7} {row['layout'].decode():>12} {row['steps']:>6} steps"
+                  + (f" (last {row['length']} kept)" if row["length"] < row["steps"] else ""))
+    else:
+        for step in trajectories.episode(args.episode):
+            print(step)
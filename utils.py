@@ -1,22 +1,49 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import csv
 import os
+import json
 import datetime
+import shutil
 
 
 WINDOW_SIZE = 10
 
-def create_output_directories_tree(s_name):
+# What create_output_directories_tree does when simulations/<name> already exists
+ON_EXISTS_ASK = "ask"             # interactive prompt
+ON_EXISTS_REUSE = "reuse"         # write into the existing directory
+ON_EXISTS_OVERWRITE = "overwrite" # delete it and start from an empty tree
+ON_EXISTS_INCREMENT = "increment" # use <name>_1, <name>_2, ... (first free name)
+ON_EXISTS_FAIL = "fail"           # raise FileExistsError
+ON_EXISTS_POLICIES = (ON_EXISTS_ASK, ON_EXISTS_REUSE, ON_EXISTS_OVERWRITE, ON_EXISTS_INCREMENT, ON_EXISTS_FAIL)
+
+def create_output_directories_tree(s_name, on_exists=ON_EXISTS_ASK):
+    
+    """Create simulations/<s_name> and its sub-directories; on_exists is one of ON_EXISTS_POLICIES."""
     
     print("\n" + "="*50)
     print("CREATING SIM DIRECTORIES TREE")
     print("="*50)
     
+    if on_exists not in ON_EXISTS_POLICIES:
+        raise ValueError(f"Unknown output directory policy: {on_exists}")
+    
     # Ensure the results directory exists
     sim_name = str(s_name)
     sim_dir = os.path.join(os.getcwd(), "simulations",sim_name)
-    if os.path.exists(sim_dir):
+    if os.path.exists(sim_dir) and on_exists == ON_EXISTS_FAIL:
+        raise FileExistsError(f"Directory {sim_dir} already exists")
+    elif os.path.exists(sim_dir) and on_exists == ON_EXISTS_REUSE:
+        print(f"Using the existing directory name: {sim_name}")
+    elif os.path.exists(sim_dir) and on_exists == ON_EXISTS_OVERWRITE:
+        print(f"Removing the existing directory {sim_dir}")
+        shutil.rmtree(sim_dir)
+    elif os.path.exists(sim_dir) and on_exists == ON_EXISTS_INCREMENT:
+        i = 1
+        while os.path.exists(f"{sim_dir}_{i}"):
+            i += 1
+        sim_name, sim_dir = f"{sim_name}_{i}", f"{sim_dir}_{i}"
+        print(f"Created output directory: {sim_name}")
+    elif os.path.exists(sim_dir):
         print(f"Directory{sim_dir} already exists")
         while True:
             response = input("Do you want to create a new directory? (y/n): ").lower().strip()
@@ -53,12 +80,15 @@ def create_output_directories_tree(s_name):
     
     return sim_dir
 
-def store_QTable(QTable, folder_path, seed = 0):
+def store_QTable(QTable, folder_path, seed = 0, layout = None):
     
     final_folder_path = folder_path + "/Q_Tables"
     
+    # One table per layout in multiple_env mode (Q_table_<layout>_<seed>.csv)
+    file_name = "Q_table_" + str(seed) + ".csv" if layout is None else "Q_table_" + str(layout) + "_" + str(seed) + ".csv"
+    
     # Save the Q-table to a CSV file
-    with open(final_folder_path + "/Q_table_" + str(seed) + ".csv", "w", newline="") as file:
+    with open(final_folder_path + "/" + file_name, "w", newline="") as file:
         writer = csv.writer(file)
         for row in QTable:
             row = [np.round(float(x), 7) for x in row]
@@ -67,20 +97,22 @@ def store_QTable(QTable, folder_path, seed = 0):
             
 def plot_data(data,output_dir, title="Data Trend"):
     
-    # Plot data
+    # Plot data (object-oriented API, no pyplot global state: safe to call from the OutputWriter thread)
     x_values = np.arange(0, len(data))
         
-    plt.figure(figsize=(10, 5))
-    plt.plot(x_values, data, color='green')
-    plt.xlabel('Episodes')
-    plt.ylabel(title)    
-    plt.title(title)
+    from matplotlib.figure import Figure # plotting happens in the parent only: keep matplotlib out of the workers
+    
+    fig = Figure(figsize=(10, 5))
+    ax = fig.add_subplot()
+    ax.plot(x_values, data, color='green')
+    ax.set_xlabel('Episodes')
+    ax.set_ylabel(title)    
+    ax.set_title(title)
     
     # mostra i numeri sull'asse x solo ogni n episodi
     total_episodes = len(data)
     major_ticks = np.arange(0, total_episodes, 1000)  # Numeri ogni n episodi
 
-    ax = plt.gca()  # Get current axis
     ax.set_xticks(major_ticks)  # Imposta le tacche principali
     ax.set_xticklabels([''] * len(major_ticks))  # Rimuove i numeri dalle tacche principali
 
@@ -93,14 +125,13 @@ def plot_data(data,output_dir, title="Data Trend"):
     ax.grid(which='major', alpha=0.8, axis='x')  # Griglia più marcata per le tacche principali
     
     # Limiti dell'asse x esattamente sui dati
-    plt.xlim(0, len(data) - 1)
+    ax.set_xlim(0, len(data) - 1)
     
     path_to_save_plots = os.path.join(output_dir, "plots")
     
     file_name = title + ".jpg"
     save_path = os.path.join(path_to_save_plots, file_name)
-    plt.savefig(save_path)
-    plt.close()
+    fig.savefig(save_path)
     
 def store_raw_data(data,output_dir,title="Data Trend"):
     
@@ -198,6 +229,35 @@ def save_statistics(data, output_dir, title="Data Statistics", nr_seeds=0):
     
     return stats
 
+def store_phase_timings(phase_timings, output_dir, title="Phase Timings"):
+    
+    """Save the per-block phase timings of every seed (list of lists of dicts) and their totals."""
+    
+    statistics_dir = os.path.join(output_dir, "statistics")
+    
+    totals = {}
+    for seed_blocks in phase_timings:
+        for block in seed_blocks:
+            for k, v in block.items():
+                if k != "first_episode":
+                    totals[k] = totals.get(k, 0) + v
+    
+    with open(os.path.join(statistics_dir, title + ".json"), "w") as f:
+        json.dump({"totals": totals, "per_seed": phase_timings}, f, indent=2)
+        
+    # Human readable summary: time share of each phase
+    phases = {k: v for k, v in totals.items() if k not in ("episodes", "steps")}
+    measured = sum(v for k, v in phases.items() if k != "minigrid_step") # minigrid_step is part of env_step
+    with open(os.path.join(statistics_dir, title + ".txt"), "w") as f:
+        f.write(f"Phase timings over {len(phase_timings)} seeds, {totals.get('episodes', 0)} episodes, {totals.get('steps', 0)} steps\n")
+        f.write("=" * 50 + "\n\n")
+        for k, v in sorted(phases.items(), key=lambda kv: -kv[1]):
+            share = 100 * v / measured if measured > 0 else 0.0
+            per_step = 1e6 * v / totals["steps"] if totals.get("steps") else 0.0
+            f.write(f"{k:<18} {v:10.3f} s {share:6.2f}% {per_step:9.2f} us/step\n")
+    
+    return totals
+
 def analyze_data(data,output_dir, title="Data",nr_seeds = 0):
     
     plot_data(data,output_dir, title)
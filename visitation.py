@@ -0,0 +1,99 @@
+"""
+Online state-visitation counts of the student, per layout.
+
+With visitation: true, Training.run_training increments an integer count of
+every visited state (x, y, dir) of the current layout, in place, and closes a
+snapshot every visitation_block episodes (VisitCounter). Each seed returns
+per layout the counts of every block, [blocks, width, height, 4]; the parent
+sums them over the seeds (memory.SeedAggregator) and store_visitation writes
+the raw arrays and renders:
+  - a heatmap of the visits per cell (all directions, log scale) for each layout
+  - the visits of each color per block, from the colors of the layout cells
+"""
+import os
+import numpy as np
+import tabular
+
+DEFAULT_BLOCK = 100 # episodes per snapshot
+
+
+class VisitCounter:
+
+    """Visit counts per layout, snapshotted every block_size episodes (over all the run_training calls)."""
+
+    def __init__(self, block_size=DEFAULT_BLOCK):
+
+        self.block_size = block_size
+        self.shapes = {} # layout -> (width, height, directions)
+        self.current = {} # layout -> flat counts [states] of the current block
+        self.blocks = {} # layout -> closed blocks (arrays [width, height, directions])
+        self.nr_of_blocks = 0
+        self.episodes = 0 # episodes of the current block
+
+    def counts(self, layout, width, height, directions):
+        """Flat counts of the current block for layout, indexed as Training.state_to_index (x * width + y) * dir + d."""
+        if layout not in self.current:
+            self.shapes[layout] = (width, height, directions)
+            self.current[layout] = np.zeros(width * height * directions, dtype=np.int64)
+            self.blocks[layout] = [np.zeros(self.shapes[layout], dtype=np.int32) for _ in range(self.nr_of_blocks)]
+        return self.current[layout]
+
+    def end_episode(self):
+        self.episodes += 1
+        if self.episodes == self.block_size:
+            self._close_block()
+
+    def skip_episodes(self, n):
+        """Episodes without visits (padded by early stopping): the blocks stay aligned with the episodes."""
+        for _ in range(n):
+            self.end_episode()
+
+    def _close_block(self):
+        for layout, counts in self.current.items():
+            self.blocks[layout].append(counts.reshape(self.shapes[layout]).astype(np.int32)) # < block_size * max_steps
+            counts.fill(0)
+        self.nr_of_blocks += 1
+        self.episodes = 0
+
+    def snapshots(self):
+        """Per layout, the counts of every block (the last one possibly partial), [blocks, width, height, directions]."""
+        if self.episodes > 0:
+            self._close_block()
+        return {layout: np.stack(blocks) for layout, blocks in self.blocks.items() if blocks}
+
+
+def store_visitation(visit_counts, params, output_dir, block_size=DEFAULT_BLOCK, title="Visits"):
+    """Save the visit counts summed over the seeds ({layout: [blocks, width, height, dir]}), with heatmaps and color visits."""
+    from matplotlib.figure import Figure # plotting happens in the parent only
+    from matplotlib.colors import LogNorm
+
+    for layout, blocks in visit_counts.items():
+        np.save(os.path.join(output_dir, "raw_data", f"{title} {layout}.npy"), blocks)
+
+        # Heatmap of the visits per cell over the whole training (y down, as in MiniGrid)
+        per_cell = blocks.sum(axis=(0, 3))
+        fig = Figure(figsize=(7, 6))
+        ax = fig.add_subplot()
+        image = ax.imshow(np.ma.masked_equal(per_cell.T, 0), cmap="viridis", norm=LogNorm(vmin=1, vmax=max(per_cell.max(), 1)))
+        fig.colorbar(image, ax=ax, label="visits")
+        ax.set_title(f"{title} {layout}")
+        ax.set_xlabel("x")
+        ax.set_ylabel("y")
+        fig.savefig(os.path.join(output_dir, "plots", f"{title} {layout}.jpg"))
+
+        # Visits of each color per block (colored floor only: MiniGrid walls are grey and the goal green)
+        tables = tabular.compile_layout(params, layout)
+        per_block = blocks.sum(axis=3)
+        fig = Figure(figsize=(10, 5))
+        ax = fig.add_subplot()
+        for index, color in enumerate(tabular.COLORS):
+            on_color = (tables.cell_color == index) & (tables.cell_type == tabular.CELL_EMPTY)
+            if on_color.any():
+                ax.plot(np.arange(len(blocks)) * block_size, per_block[:, on_color].sum(axis=1), color=color, label=color)
+        ax.set_xlabel("Episodes")
+        ax.set_ylabel("Visits")
+        ax.set_title(f"Color {title} {layout}")
+        ax.yaxis.grid(True, which='major', alpha=0.8)
+        if ax.lines:
+            ax.legend()
+        fig.savefig(os.path.join(output_dir, "plots", f"Color {title} {layout}.jpg"))